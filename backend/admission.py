@@ -0,0 +1,172 @@
+import asyncio
+import contextlib
+import time
+from collections import OrderedDict, deque
+
+from rate_limit import TokenBucket
+
+
+class OverloadedError(Exception):
+    """Raised when a call is shed instead of queued. `reason` is queue_full, user_limit or queue_timeout."""
+
+    def __init__(self, upstream: str, reason: str, retry_after: float):
+        super().__init__(f"{upstream} is overloaded ({reason}), retry in {retry_after:.0f}s")
+        self.upstream = upstream
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Admission control for one upstream (Gemini, Speech-to-Text, TTS, ...).
+    At most `max_concurrency` calls run at once, and at most `rate` start
+    per second (token bucket, unlimited if None). Calls beyond that wait in
+    a bounded queue served round-robin by user, so one busy user can't
+    starve the rest; a user may hold `per_user_limit` slots (running or
+    queued). Anything over a bound, or queued longer than `queue_timeout`,
+    is rejected right away with OverloadedError.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        max_queue: int = 64,
+        rate: float | None = None,
+        burst: float | None = None,
+        per_user_limit: int = 4,
+        queue_timeout: float = 5.0,
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.per_user_limit = per_user_limit
+        self.queue_timeout = queue_timeout
+        self._in_flight = 0
+        self._queued = 0
+        self._per_user: dict[str, int] = {}  # running + queued calls per user
+        self._waiters: OrderedDict[str, deque] = OrderedDict()  # user -> futures, in round-robin order
+        self._wakeup: asyncio.TimerHandle | None = None
+        self._hold_time = 0.0  # moving average of how long a slot is held
+        self._counters = {
+            "admitted": 0, "queued": 0, "shed_queue_full": 0, "shed_user_limit": 0, "shed_queue_timeout": 0,
+            "max_queue_depth": 0, "total_wait_ms": 0.0,
+        }
+
+    @contextlib.asynccontextmanager
+    async def admit(self, user_id):
+        """Holds one slot for the duration of the block. Raises OverloadedError if shed."""
+        user_id = str(user_id)
+        await self.acquire(user_id)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(user_id, time.monotonic() - started)
+
+    async def acquire(self, user_id: str) -> None:
+        """Waits for a slot; pair with release(). Raises OverloadedError if shed."""
+        if self._per_user.get(user_id, 0) >= self.per_user_limit:
+            self._shed("user_limit")
+        if not self._queued and self._in_flight < self.max_concurrency and self._take_token():
+            self._per_user[user_id] = self._per_user.get(user_id, 0) + 1
+            self._in_flight += 1
+            self._counters["admitted"] += 1
+            return
+        if self._queued >= self.max_queue:
+            self._shed("queue_full")
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(user_id, deque()).append(future)
+        self._per_user[user_id] = self._per_user.get(user_id, 0) + 1
+        self._queued += 1
+        self._counters["queued"] += 1
+        self._counters["max_queue_depth"] = max(self._counters["max_queue_depth"], self._queued)
+        self._dispatch()
+
+        started = time.monotonic()
+        try:
+            await asyncio.wait({future}, timeout=self.queue_timeout)
+        except BaseException:
+            # Cancelled while queued; give back a slot granted in the meantime
+            if future.done():
+                self.release(user_id, 0.0)
+            else:
+                self._remove_waiter(user_id, future)
+            raise
+        self._counters["total_wait_ms"] += (time.monotonic() - started) * 1000
+        if not future.done():
+            self._remove_waiter(user_id, future)
+            self._shed("queue_timeout")
+        self._counters["admitted"] += 1
+
+    def release(self, user_id: str, held: float) -> None:
+        self._in_flight -= 1
+        self._forget_user(user_id)
+        self._hold_time = held if not self._hold_time else 0.9 * self._hold_time + 0.1 * held
+        self._dispatch()
+
+    def stats(self) -> dict:
+        waited = self._counters["queued"] - self._counters["shed_queue_timeout"]
+        return {
+            **self._counters,
+            "in_flight": self._in_flight,
+            "queue_depth": self._queued,
+            "avg_wait_ms": self._counters["total_wait_ms"] / waited if waited else 0.0,
+            "avg_hold_ms": round(self._hold_time * 1000, 1),
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "rate_limiter": self.bucket.stats() if self.bucket else None,
+        }
+
+    def _take_token(self) -> bool:
+        # Check first so a missing token isn't counted as a rejection by the bucket
+        return self.bucket is None or (self.bucket.wait_time() <= 0 and self.bucket.try_acquire())
+
+    def _dispatch(self) -> None:
+        while self._queued and self._in_flight < self.max_concurrency:
+            if self.bucket is not None:
+                wait = self.bucket.wait_time()
+                if wait > 0:
+                    if self._wakeup is None:
+                        self._wakeup = asyncio.get_running_loop().call_later(wait, self._on_wakeup)
+                    return
+                self.bucket.try_acquire()
+            user_id, waiters = next(iter(self._waiters.items()))
+            future = waiters.popleft()
+            if waiters:
+                self._waiters.move_to_end(user_id)
+            else:
+                del self._waiters[user_id]
+            self._queued -= 1
+            self._in_flight += 1
+            future.set_result(None)
+
+    def _on_wakeup(self) -> None:
+        self._wakeup = None
+        self._dispatch()
+
+    def _remove_waiter(self, user_id: str, future: asyncio.Future) -> None:
+        waiters = self._waiters.get(user_id)
+        if waiters is not None and future in waiters:
+            waiters.remove(future)
+            if not waiters:
+                del self._waiters[user_id]
+            self._queued -= 1
+            self._forget_user(user_id)
+
+    def _forget_user(self, user_id: str) -> None:
+        count = self._per_user.get(user_id, 0) - 1
+        if count > 0:
+            self._per_user[user_id] = count
+        else:
+            self._per_user.pop(user_id, None)
+
+    def _shed(self, reason: str):
+        self._counters[f"shed_{reason}"] += 1
+        # Rough time for the backlog ahead of a new call to drain
+        retry_after = max(1.0, (self._hold_time or 1.0) * (self._queued + 1) / self.max_concurrency)
+        if self.bucket is not None:
+            retry_after = max(retry_after, (self._queued + 1) / self.bucket.rate)
+        raise OverloadedError(self.name, reason, round(retry_after))
@@ -0,0 +1,244 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable
+
+
+class AnalysisBatchRunner:
+    """
+    Runs longitudinal analyses for many users as one job.
+    At most `concurrency` users are analysed at a time. Each user's
+    progress is recorded in SQLite as it changes, so a job interrupted by a
+    crash or redeploy picks up its unfinished users on the next start.
+    Re-running a user is safe: analyses only cover pages since the last
+    saved insight. Workers sharing the job file lease the jobs they run for
+    `lease_seconds`, renewing while they run; a job whose lease expires
+    (its worker died) is taken over by another worker.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        analyze_user: Callable[[str], Awaitable[dict]],
+        concurrency: int = 8,
+        max_attempts: int = 2,
+        retry_delay: float = 5.0,
+        lease_seconds: float = 60.0,
+    ):
+        self.path = path
+        self.analyze_user = analyze_user
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lease_seconds = lease_seconds
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS analysis_jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                finished_at REAL,
+                owner TEXT,
+                lease_until REAL
+            )
+        """)
+        # Job files created before leases were added
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(analysis_jobs)")}
+        for column, kind in (("owner", "TEXT"), ("lease_until", "REAL")):
+            if column not in columns:
+                self._db.execute(f"ALTER TABLE analysis_jobs ADD COLUMN {column} {kind}")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS analysis_job_users (
+                job_id TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                detail TEXT,
+                updated_at REAL,
+                PRIMARY KEY (job_id, user_id)
+            )
+        """)
+        self._db_lock = threading.Lock()
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._keeper: asyncio.Task | None = None
+
+    async def submit(self, user_ids: list) -> str:
+        """Creates a job for the given users, starts it and returns its id."""
+        job_id = uuid.uuid4().hex
+        unique_ids = list(dict.fromkeys(str(user_id) for user_id in user_ids))
+        await asyncio.to_thread(self._create_job, job_id, unique_ids)
+        self._start(job_id)
+        return job_id
+
+    def resume(self) -> list:
+        """
+        Restarts unfinished jobs whose worker is gone (lease expired or released)
+        and keeps renewing leases and taking over orphaned jobs from then on.
+        Returns the ids of the jobs resumed now.
+        """
+        self._start_keeper()
+        return self._claim_orphans()
+
+    def _claim_orphans(self) -> list:
+        now = time.time()
+        candidates = self._query(
+            "SELECT id FROM analysis_jobs WHERE status = 'running' AND (lease_until IS NULL OR lease_until < ?)", (now,)
+        )
+        job_ids = []
+        for (job_id,) in candidates:
+            # Conditional update: only one worker wins each job
+            with self._db_lock:
+                claimed = self._db.execute(
+                    "UPDATE analysis_jobs SET owner = ?, lease_until = ? "
+                    "WHERE id = ? AND status = 'running' AND (lease_until IS NULL OR lease_until < ?)",
+                    (self.owner, now + self.lease_seconds, job_id, now),
+                ).rowcount
+            if claimed and job_id not in self._tasks:
+                print(f"Resuming analysis job {job_id}...")
+                self._start(job_id)
+                job_ids.append(job_id)
+        return job_ids
+
+    async def _keep_leases(self) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                if self._tasks:
+                    await asyncio.to_thread(
+                        self._execute,
+                        f"UPDATE analysis_jobs SET lease_until = ? WHERE owner = ? AND id IN ({','.join('?' * len(self._tasks))})",
+                        (time.time() + self.lease_seconds, self.owner, *self._tasks),
+                    )
+                self._claim_orphans()
+            except Exception as e:
+                print(f"Analysis jobs: lease renewal failed: {e}")
+
+    async def stop(self) -> None:
+        """Cancels running jobs; their unfinished users are resumed on the next start."""
+        if self._keeper is not None:
+            self._keeper.cancel()
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
+        with self._db_lock:
+            # Release our jobs so the next start (here or on another worker) resumes them at once
+            self._db.execute(
+                "UPDATE analysis_jobs SET owner = NULL, lease_until = NULL WHERE owner = ? AND status = 'running'",
+                (self.owner,),
+            )
+            self._db.close()
+
+    def status(self, job_id: str) -> dict | None:
+        """Progress of a job, with the failure detail for every failed user."""
+        job = self._query("SELECT status, created_at, finished_at FROM analysis_jobs WHERE id = ?", (job_id,))
+        if not job:
+            return None
+        status, created_at, finished_at = job[0]
+        users = self._query(
+            "SELECT user_id, status, attempts, detail FROM analysis_job_users WHERE job_id = ?", (job_id,)
+        )
+        counts = {"pending": 0, "running": 0, "done": 0, "failed": 0}
+        for _, user_status, _, _ in users:
+            counts[user_status] += 1
+        return {
+            "job_id": job_id,
+            "status": status,
+            "total": len(users),
+            **counts,
+            "progress": (counts["done"] + counts["failed"]) / len(users) if users else 1.0,
+            "elapsed_s": (finished_at or time.time()) - created_at,
+            "failures": [
+                {"user_id": user_id, "attempts": attempts, "detail": detail}
+                for user_id, user_status, attempts, detail in users if user_status == "failed"
+            ],
+        }
+
+    def _start_keeper(self) -> None:
+        if self._keeper is None:
+            self._keeper = asyncio.create_task(self._keep_leases())
+
+    def _start(self, job_id: str) -> None:
+        self._start_keeper()
+        if job_id not in self._tasks:
+            self._tasks[job_id] = asyncio.create_task(self._run_job(job_id))
+
+    async def _run_job(self, job_id: str) -> None:
+        # 'running' users were interrupted mid-analysis; run them again
+        user_ids = [row[0] for row in await asyncio.to_thread(
+            self._query,
+            "SELECT user_id FROM analysis_job_users WHERE job_id = ? AND status IN ('pending', 'running')",
+            (job_id,),
+        )]
+        started = time.monotonic()
+        print(f"Analysis job {job_id}: {len(user_ids)} users, concurrency {self.concurrency}")
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run_user(user_id: str) -> None:
+            async with semaphore:
+                await self._run_user(job_id, user_id)
+
+        await asyncio.gather(*(run_user(user_id) for user_id in user_ids))
+        await asyncio.to_thread(
+            self._execute, "UPDATE analysis_jobs SET status = 'finished', finished_at = ? WHERE id = ?",
+            (time.time(), job_id),
+        )
+        self._tasks.pop(job_id, None)
+        print(f"Analysis job {job_id} finished in {time.monotonic() - started:.1f}s: {self.status(job_id)}")
+
+    async def _run_user(self, job_id: str, user_id: str) -> None:
+        attempts = self._query(
+            "SELECT attempts FROM analysis_job_users WHERE job_id = ? AND user_id = ?", (job_id, user_id)
+        )[0][0]
+        while True:
+            attempts += 1
+            await asyncio.to_thread(self._set_user, job_id, user_id, "running", attempts, None)
+            try:
+                result = await self.analyze_user(user_id)
+                if result.get("status") == "success":
+                    await asyncio.to_thread(
+                        self._set_user, job_id, user_id, "done", attempts, result.get("detail") or result.get("insight_generated")
+                    )
+                    return
+                detail = result.get("detail", "Analysis failed")
+            except Exception as e:
+                detail = f"{type(e).__name__}: {e}"
+
+            if attempts >= self.max_attempts:
+                print(f"Analysis job {job_id}: user {user_id} failed after {attempts} attempts: {detail}")
+                await asyncio.to_thread(self._set_user, job_id, user_id, "failed", attempts, detail)
+                return
+            await asyncio.sleep(self.retry_delay * attempts)
+
+    def _create_job(self, job_id: str, user_ids: list) -> None:
+        with self._db_lock:
+            self._db.execute("BEGIN")
+            self._db.execute(
+                "INSERT INTO analysis_jobs (id, status, created_at, owner, lease_until) VALUES (?, 'running', ?, ?, ?)",
+                (job_id, time.time(), self.owner, time.time() + self.lease_seconds),
+            )
+            self._db.executemany(
+                "INSERT INTO analysis_job_users (job_id, user_id, updated_at) VALUES (?, ?, ?)",
+                [(job_id, user_id, time.time()) for user_id in user_ids],
+            )
+            self._db.execute("COMMIT")
+
+    def _set_user(self, job_id: str, user_id: str, status: str, attempts: int, detail: str | None) -> None:
+        self._execute(
+            "UPDATE analysis_job_users SET status = ?, attempts = ?, detail = ?, updated_at = ? WHERE job_id = ? AND user_id = ?",
+            (status, attempts, detail, time.time(), job_id, user_id),
+        )
+
+    def _execute(self, sql: str, params: tuple = ()) -> None:
+        with self._db_lock:
+            self._db.execute(sql, params)
+
+    def _query(self, sql: str, params: tuple = ()) -> list:
+        with self._db_lock:
+            return self._db.execute(sql, params).fetchall()
@@ -0,0 +1,29 @@
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+
+__all__ = ["AtRestCipher", "InvalidToken"]
+
+
+class AtRestCipher:
+    """
+    Fernet (AES-128-CBC + HMAC) encryption for local files that hold journal
+    text, such as the page outbox and cached weekly summaries. `keys` is a
+    comma-separated list of Fernet keys: the first encrypts, all of them
+    decrypt, so a key can be rotated by putting the new one first.
+    """
+
+    def __init__(self, keys: str):
+        parsed = [key.strip() for key in keys.split(",") if key.strip()]
+        if not parsed:
+            raise ValueError("At least one Fernet key is required")
+        self._fernet = MultiFernet([Fernet(key) for key in parsed])
+
+    @staticmethod
+    def generate_key() -> str:
+        return Fernet.generate_key().decode("ascii")
+
+    def encrypt(self, data: bytes) -> bytes:
+        return self._fernet.encrypt(data)
+
+    def decrypt(self, token: bytes) -> bytes:
+        """Raises InvalidToken if the data was tampered with or no key matches."""
+        return self._fernet.decrypt(token)
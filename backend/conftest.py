@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Backend modules import each other as top-level modules (see the Dockerfile), so
+# make them importable when pytest is run from the repository root too.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -0,0 +1,133 @@
+import asyncio
+from typing import List
+
+
+class EmbeddingGateway:
+    """
+    Micro-batching front for TextEmbeddingModel.get_embeddings.
+    Requests from every session are queued, collected for up to
+    max_wait_ms or max_batch_size texts, sent upstream as one batch,
+    and the vectors are handed back to each caller.
+    """
+
+    def __init__(self, model, max_batch_size: int = 32, max_wait_ms: float = 5.0, max_in_flight: int = 4, executor=None):
+        self.model = model
+        # Optional UpstreamExecutor for the blocking SDK call; defaults to asyncio.to_thread
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_in_flight = max_in_flight
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._in_flight: asyncio.Semaphore | None = None
+        self._counters = {"requests": 0, "batches": 0, "texts": 0, "max_fill": 0, "errors": 0}
+
+    def start(self) -> None:
+        """Starts the batching worker on the running event loop."""
+        if self._worker is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stops the batching worker. Requests still queued are cancelled."""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            future.cancel()
+        self._worker = None
+
+    async def embed(self, text: str) -> List[float]:
+        """Returns the embedding of one text, batched with concurrent callers."""
+        if self._worker is None:
+            self.start()
+        future = self._loop.create_future()
+        self._counters["requests"] += 1
+        await self._queue.put((text, future))
+        return await future
+
+    async def embed_many(self, texts: List[str]) -> List[List[float]]:
+        """Returns the embeddings of several texts, in order."""
+        return list(await asyncio.gather(*(self.embed(text) for text in texts)))
+
+    def embed_sync(self, text: str, timeout: float | None = 30) -> List[float]:
+        """
+        Blocking variant for code running in worker threads
+        (e.g. the RAG services under asyncio.to_thread).
+        Falls back to a direct model call if the gateway isn't running.
+        """
+        if self._loop is None or self._worker is None:
+            return self.model.get_embeddings([text])[0].values
+        future = asyncio.run_coroutine_threadsafe(self.embed(text), self._loop)
+        return future.result(timeout)
+
+    def embed_many_sync(self, texts: List[str], timeout: float | None = 30) -> List[List[float]]:
+        """Blocking variant of embed_many for worker threads."""
+        if self._loop is None or self._worker is None:
+            return [embedding.values for embedding in self.model.get_embeddings(texts)]
+        future = asyncio.run_coroutine_threadsafe(self.embed_many(texts), self._loop)
+        return future.result(timeout)
+
+    def stats(self) -> dict:
+        """Batch counters, including how full batches are on average."""
+        counters = dict(self._counters)
+        batches = counters["batches"]
+        counters["mean_fill"] = counters["texts"] / batches if batches else 0.0
+        counters["fill_ratio"] = counters["mean_fill"] / self.max_batch_size
+        counters["queued"] = self._queue.qsize() if self._queue else 0
+        return counters
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - self._loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._in_flight.acquire()
+            asyncio.create_task(self._flush(batch))
+
+    async def _flush(self, batch: list) -> None:
+        texts = [text for text, _ in batch]
+        self._counters["batches"] += 1
+        self._counters["texts"] += len(texts)
+        self._counters["max_fill"] = max(self._counters["max_fill"], len(texts))
+        try:
+            if self.executor is not None:
+                embeddings = await self.executor.run(self.model.get_embeddings, texts)
+            else:
+                embeddings = await asyncio.to_thread(self.model.get_embeddings, texts)
+        except Exception as e:
+            self._counters["errors"] += 1
+            print(f"Embedding batch of {len(texts)} failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._in_flight.release()
+
+        if len(embeddings) != len(batch):
+            self._counters["errors"] += 1
+            print(f"Embedding batch of {len(texts)} returned {len(embeddings)} embeddings")
+        for (_, future), embedding in zip(batch, embeddings):
+            if not future.done():
+                future.set_result(embedding.values)
+        # Never leave a caller waiting on a result the backend didn't return
+        for _, future in batch[len(embeddings):]:
+            if not future.done():
+                future.set_exception(RuntimeError(f"Embedding backend returned {len(embeddings)} results for {len(texts)} texts"))
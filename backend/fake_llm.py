@@ -0,0 +1,127 @@
+"""
+Fake Gemini model for exercising ResilientModel without Vertex AI.
+
+FakeGenerativeModel mimics GenerativeModel.generate_content_async
+(including stream=True) and injects latency, slow tail requests and
+transient errors. Run this module to see how deadlines, retries and hedging
+behave for a given latency profile:
+
+    python fake_llm.py --calls 200 --latency 0.3 --slow-rate 0.05 --slow-latency 5 --error-rate 0.05 --hedge
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from llm_client import LLMCallError, ResilientModel
+
+
+class FakeUpstreamError(Exception):
+    """Stands in for a google.api_core error; `code` is the HTTP status."""
+
+    def __init__(self, code: int):
+        super().__init__(f"fake upstream error {code}")
+        self.code = code
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """
+    Each request takes `latency` seconds (+/- `jitter`), or `slow_latency`
+    with probability `slow_rate`, and fails with `error_code` with
+    probability `error_rate`. Streamed replies send `text` word by word,
+    `chunk_delay` seconds apart.
+    """
+
+    def __init__(
+        self,
+        text: str = '{"route": "Guide"}',
+        latency: float = 0.2,
+        jitter: float = 0.05,
+        slow_rate: float = 0.0,
+        slow_latency: float = 5.0,
+        error_rate: float = 0.0,
+        error_code: int = 503,
+        chunk_delay: float = 0.01,
+        seed: int | None = None,
+    ):
+        self.text = text
+        self.latency = latency
+        self.jitter = jitter
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.error_rate = error_rate
+        self.error_code = error_code
+        self.chunk_delay = chunk_delay
+        self.requests = 0
+        self._random = random.Random(seed)
+
+    async def generate_content_async(self, contents, stream: bool = False, **kwargs):
+        self.requests += 1
+        if self._random.random() < self.slow_rate:
+            delay = self.slow_latency
+        else:
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+        await asyncio.sleep(delay)
+        if self._random.random() < self.error_rate:
+            raise FakeUpstreamError(self.error_code)
+        if stream:
+            return self._stream()
+        return FakeResponse(self.text)
+
+    async def _stream(self):
+        for word in self.text.split(" "):
+            yield FakeResponse(word + " ")
+            await asyncio.sleep(self.chunk_delay)
+
+
+async def run(args) -> None:
+    model = FakeGenerativeModel(
+        latency=args.latency,
+        slow_rate=args.slow_rate,
+        slow_latency=args.slow_latency,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    client = ResilientModel(model, timeout=args.timeout, max_retries=args.retries)
+    latencies, failures = [], 0
+    for _ in range(args.calls):
+        started = time.monotonic()
+        try:
+            await client.generate(["ping"], name="fake", attempt_timeout=args.attempt_timeout, hedge=args.hedge)
+            latencies.append(time.monotonic() - started)
+        except LLMCallError as e:
+            failures += 1
+            print(e)
+
+    latencies.sort()
+    if latencies:
+        print(f"p50={latencies[len(latencies) // 2] * 1000:.0f}ms "
+              f"p95={latencies[int(len(latencies) * 0.95)] * 1000:.0f}ms "
+              f"max={latencies[-1] * 1000:.0f}ms")
+    print(f"calls={args.calls} failures={failures} upstream_requests={model.requests}")
+    print(client.stats())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=100, help="Sequential calls to make")
+    parser.add_argument("--latency", type=float, default=0.2, help="Typical request latency (s)")
+    parser.add_argument("--slow-rate", type=float, default=0.05, help="Fraction of slow requests")
+    parser.add_argument("--slow-latency", type=float, default=3.0, help="Latency of slow requests (s)")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="Fraction of requests failing with 503")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Deadline per call, including retries (s)")
+    parser.add_argument("--attempt-timeout", type=float, default=None, help="Deadline per attempt (s)")
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--hedge", action="store_true", help="Hedge calls past their p95 latency")
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+import httpx
+
+
+class JournalDirectory:
+    """
+    user_id -> journal_id cache in front of the Azure journal lookup.
+    Hits are served from memory for `ttl` seconds. Lookups that fail for
+    good (bad user id, 4xx) are remembered for `negative_ttl` seconds and
+    re-raised. Concurrent lookups for the same user share one upstream call
+    (single-flight), so a new user's "Default Journal" is only created once.
+    """
+
+    def __init__(self, resolve: Callable[[str], Awaitable[int]], ttl: float = 3600.0, negative_ttl: float = 30.0):
+        self.resolve = resolve
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # user_id -> (expires_at, journal_id or exception)
+        self._entries: dict[str, tuple[float, int | Exception]] = {}
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self._counters = {"hits": 0, "negative_hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+
+    async def get(self, user_id: str) -> int:
+        """Returns the user's journal id, resolving it upstream at most once at a time."""
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            expires_at, value = entry
+            if time.monotonic() < expires_at:
+                if isinstance(value, Exception):
+                    self._counters["negative_hits"] += 1
+                    raise value
+                self._counters["hits"] += 1
+                return value
+            del self._entries[user_id]
+
+        future = self._in_flight.get(user_id)
+        if future is not None:
+            self._counters["coalesced"] += 1
+            return await asyncio.shield(future)
+
+        self._counters["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[user_id] = future
+        try:
+            journal_id = await self.resolve(user_id)
+        except Exception as e:
+            self._counters["errors"] += 1
+            if self._is_permanent(e):
+                self._entries[user_id] = (time.monotonic() + self.negative_ttl, e)
+            future.set_exception(e)
+            # Mark retrieved so waiter-less failures don't warn
+            future.exception()
+            raise
+        else:
+            self._entries[user_id] = (time.monotonic() + self.ttl, journal_id)
+            future.set_result(journal_id)
+            return journal_id
+        finally:
+            del self._in_flight[user_id]
+            if not future.done():
+                # The resolving caller was cancelled; let waiters fail instead of hanging
+                future.cancel()
+
+    def invalidate(self, user_id: str) -> None:
+        """Forgets the cached journal for a user (e.g. after it was deleted)."""
+        self._entries.pop(user_id, None)
+
+    def stats(self) -> dict:
+        counters = dict(self._counters)
+        counters["entries"] = len(self._entries)
+        counters["in_flight"] = len(self._in_flight)
+        return counters
+
+    @staticmethod
+    def _is_permanent(error: Exception) -> bool:
+        # Invalid user ids and client errors won't fix themselves; 5xx and network errors might
+        if isinstance(error, ValueError):
+            return True
+        if isinstance(error, httpx.HTTPStatusError):
+            return 400 <= error.response.status_code < 500
+        return False
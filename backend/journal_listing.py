@@ -0,0 +1,80 @@
+import base64
+import bisect
+import hashlib
+import json
+import time
+
+from rag.vector_codec import encode_vector
+
+# Fields a /v1/journal client can ask for; id and created_at are always returned
+JOURNAL_FIELDS = ("id", "created_at", "content", "text_vector")
+DEFAULT_JOURNAL_FIELDS = ("id", "created_at", "content")
+# What a cached listing keeps of each page; the pooled encoding and passage vectors are dropped
+LISTED_FIELDS = JOURNAL_FIELDS + ("updated_at",)
+
+
+class JournalListing:
+    """
+    One journal's pages, sorted once by (created_at, id) and kept until the
+    upstream listing changes. Pages are served newest first in pages of
+    `limit`, addressed by an opaque cursor (the sort key of the last page
+    seen), so browsing never re-sorts or re-validates the whole journal.
+    Only LISTED_FIELDS are kept, with text_vector in compact float32 form.
+    """
+
+    def __init__(self, pages: list, etag: str | None = None):
+        self.pages = sorted((self.compact(page) for page in pages), key=self.sort_key)
+        self.keys = [self.sort_key(page) for page in self.pages]
+        self.etag = etag
+        self.fetched_at = time.monotonic()
+        # Identifies this version of the listing in our own response ETags
+        self.version = etag or hashlib.sha256(json.dumps(
+            [(page.get("id"), str(page.get("updated_at") or page.get("created_at"))) for page in self.pages]
+        ).encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def compact(page: dict) -> dict:
+        kept = {field: page[field] for field in LISTED_FIELDS if field in page}
+        if isinstance(kept.get("text_vector"), list):
+            kept["text_vector"] = encode_vector(kept["text_vector"], "float32")
+        return kept
+
+    @staticmethod
+    def sort_key(page: dict) -> tuple:
+        return (str(page.get("created_at", "")), page.get("id") or 0)
+
+    def page(self, cursor: str | None, limit: int) -> tuple[list, str | None]:
+        """Returns up to `limit` pages older than the cursor, newest first, and the next cursor."""
+        end = len(self.pages) if cursor is None else bisect.bisect_left(self.keys, decode_cursor(cursor))
+        start = max(0, end - limit)
+        rows = self.pages[start:end][::-1]
+        next_cursor = encode_cursor(self.keys[start]) if start > 0 else None
+        return rows, next_cursor
+
+
+def parse_fields(fields: str | None) -> tuple:
+    """Parses a comma-separated field list; raises ValueError on unknown fields."""
+    if not fields:
+        return DEFAULT_JOURNAL_FIELDS
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested.difference(JOURNAL_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(field for field in JOURNAL_FIELDS if field in requested or field in ("id", "created_at"))
+
+
+def project(page: dict, fields: tuple) -> dict:
+    return {field: page[field] for field in fields if field in page}
+
+
+def encode_cursor(key: tuple) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """Raises ValueError if the cursor wasn't produced by encode_cursor."""
+    try:
+        created_at, page_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return (str(created_at), page_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
@@ -0,0 +1,226 @@
+import asyncio
+import random
+from collections import deque
+from typing import Any, Awaitable, Callable
+
+# HTTP statuses of transient upstream errors (google.api_core exceptions carry them as .code)
+RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class LLMCallError(Exception):
+    """Raised when a model call fails for good: a permanent error, or retries/deadline exhausted."""
+
+    def __init__(self, name: str, attempts: int, cause: BaseException):
+        super().__init__(f"{name} failed after {attempts} attempt(s): {type(cause).__name__}: {cause}")
+        self.name = name
+        self.attempts = attempts
+        self.cause = cause
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Timeouts, dropped connections and 408/429/5xx responses are worth retrying."""
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    code = getattr(error, "code", None)
+    try:
+        return int(code) in RETRYABLE_CODES
+    except (TypeError, ValueError):
+        return False
+
+
+class ResilientModel:
+    """
+    Wraps a model exposing generate_content_async (a Vertex AI
+    GenerativeModel, or FakeGenerativeModel in fake_llm.py) with a deadline
+    per call, retries with full-jitter exponential backoff for transient
+    errors, and optional hedging: if an attempt is still running after the
+    call's recent p95 latency, a second identical request is sent and the
+    first response wins. Latency and outcome counters are kept per call name.
+    """
+
+    def __init__(
+        self,
+        model,
+        timeout: float = 30.0,
+        max_retries: int = 2,
+        backoff_base: float = 0.25,
+        backoff_max: float = 4.0,
+        hedge_delay: float = 1.5,
+        hedge_min_samples: int = 20,
+        latency_window: int = 200,
+    ):
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # Used as the hedge delay until hedge_min_samples latencies are known
+        self.hedge_delay = hedge_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.latency_window = latency_window
+        self._latencies: dict[str, deque] = {}
+        self._counters: dict[str, dict] = {}
+
+    async def generate(
+        self,
+        contents: list,
+        name: str = "gemini",
+        timeout: float | None = None,
+        attempt_timeout: float | None = None,
+        retries: int | None = None,
+        hedge: bool = False,
+        **kwargs,
+    ):
+        """
+        Non-streaming generate_content_async. `timeout` bounds the whole call
+        including retries; `attempt_timeout` cuts off a single stuck attempt
+        so it can be retried. Raises LLMCallError.
+        """
+        return await self._call(
+            name,
+            lambda: self.model.generate_content_async(contents, **kwargs),
+            timeout, attempt_timeout, retries, hedge,
+        )
+
+    async def stream(
+        self,
+        contents: list,
+        name: str = "gemini",
+        timeout: float | None = None,
+        attempt_timeout: float | None = None,
+        retries: int | None = None,
+        idle_timeout: float = 15.0,
+        **kwargs,
+    ):
+        """
+        Streaming generate_content_async. The deadline and retries apply
+        until the first chunk arrives (nothing has been shown to the user
+        yet); after that every chunk must arrive within idle_timeout, or
+        the returned iterator raises LLMCallError.
+        """
+        async def open_stream():
+            iterator = (await self.model.generate_content_async(contents, stream=True, **kwargs)).__aiter__()
+            try:
+                return iterator, await iterator.__anext__()
+            except StopAsyncIteration:
+                return iterator, None
+
+        iterator, first = await self._call(name, open_stream, timeout, attempt_timeout, retries, False)
+        return self._relay(name, iterator, first, idle_timeout)
+
+    def stats(self) -> dict:
+        stats = {}
+        for name, counters in self._counters.items():
+            latencies = sorted(self._latencies.get(name, ()))
+            stats[name] = {
+                **counters,
+                "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1) if latencies else None,
+                "p95_ms": round(self._percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+            }
+        return stats
+
+    async def _call(
+        self,
+        name: str,
+        start: Callable[[], Awaitable[Any]],
+        timeout: float | None,
+        attempt_timeout: float | None,
+        retries: int | None,
+        hedge: bool,
+    ):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.timeout)
+        retries = self.max_retries if retries is None else retries
+        counters = self._counters.setdefault(name, {
+            "calls": 0, "retries": 0, "timeouts": 0, "hedges": 0, "hedge_wins": 0, "failures": 0,
+            "stream_stalls": 0, "stream_failures": 0,
+        })
+        counters["calls"] += 1
+        attempt = 0
+        while True:
+            started = loop.time()
+            limit = deadline - started
+            if attempt_timeout:
+                limit = min(limit, attempt_timeout)
+            try:
+                result = await self._attempt(name, start, limit, hedge)
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    counters["timeouts"] += 1
+                attempt += 1
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                if not is_retryable(e) or attempt > retries or loop.time() + delay >= deadline:
+                    counters["failures"] += 1
+                    raise LLMCallError(name, attempt, e) from e
+                counters["retries"] += 1
+                print(f"{name}: attempt {attempt} failed ({type(e).__name__}: {e}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            self._latencies.setdefault(name, deque(maxlen=self.latency_window)).append(loop.time() - started)
+            return result
+
+    async def _attempt(self, name: str, start: Callable[[], Awaitable[Any]], limit: float, hedge: bool):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + limit
+        primary = asyncio.ensure_future(start())
+        pending = {primary}
+        error: BaseException = asyncio.TimeoutError(f"no response within {limit:.1f}s")
+        try:
+            hedge_after = self._hedge_after(name) if hedge else None
+            if hedge_after is not None and hedge_after < limit:
+                await asyncio.wait(pending, timeout=hedge_after)
+                if not primary.done():
+                    self._counters[name]["hedges"] += 1
+                    pending.add(asyncio.ensure_future(start()))
+
+            while pending:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break
+                # Check every finished task so no exception goes unretrieved
+                winner = None
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                    elif winner is None:
+                        winner = task
+                if winner is not None:
+                    if winner is not primary:
+                        self._counters[name]["hedge_wins"] += 1
+                    return winner.result()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _relay(self, name: str, iterator, first, idle_timeout: float):
+        if first is None:
+            return
+        yield first
+        while True:
+            try:
+                chunk = await asyncio.wait_for(iterator.__anext__(), idle_timeout)
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                self._counters[name]["stream_stalls"] += 1
+                raise LLMCallError(name, 1, asyncio.TimeoutError(f"stream stalled for {idle_timeout:.1f}s"))
+            except Exception as e:
+                # Upstream errors after the first chunk can't be retried; surface them like a stall
+                self._counters[name]["stream_failures"] += 1
+                raise LLMCallError(name, 1, e) from e
+            yield chunk
+
+    def _hedge_after(self, name: str) -> float:
+        latencies = self._latencies.get(name)
+        if not latencies or len(latencies) < self.hedge_min_samples:
+            return self.hedge_delay
+        return self._percentile(sorted(latencies), 0.95)
+
+    @staticmethod
+    def _percentile(ordered: list, fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
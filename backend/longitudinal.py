@@ -0,0 +1,266 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable
+
+from agent_hub import PROMPT_SUMMARIZER
+from at_rest import AtRestCipher, InvalidToken
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for English)."""
+    return len(text) // 4 + 1
+
+
+def parse_timestamp(value) -> datetime:
+    """Parses an API timestamp; naive values are taken as UTC."""
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def week_key(moment: datetime) -> str:
+    year, week, _ = moment.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def format_entry(page: dict) -> str:
+    return f"[{parse_timestamp(page['created_at']).date().isoformat()}] {page.get('content', '')}"
+
+
+class LongitudinalSummarizer:
+    """
+    Builds a bounded <history> for the longitudinal Analyst.
+    Entries are grouped by ISO week. Every week except the newest is
+    replaced by a summary that is generated once and cached (keyed by the
+    week's content, so edits invalidate it). Up to `context_weeks` weeks
+    before the new entries are included as cached summaries too, so each
+    run sees the earlier context while only new weeks cost summary calls.
+    Any text over the token budget is summarized map-reduce style: chunks
+    are summarized in parallel, then the partial summaries are combined.
+    Summaries are kept in memory; with both cache_dir and cipher set they
+    are also stored encrypted in a SQLite file shared by all workers, one
+    row per week (an edited week replaces its old summary) and at most
+    max_cached rows, least recently used evicted first.
+    """
+
+    def __init__(
+        self,
+        generate: Callable[[str], Awaitable[str]],
+        token_budget: int = 6000,
+        chunk_tokens: int = 3000,
+        summary_words: int = 250,
+        cache_dir: str | None = None,
+        cipher: AtRestCipher | None = None,
+        max_cached: int = 4096,
+        context_weeks: int = 8,
+    ):
+        self.generate = generate
+        self.token_budget = token_budget
+        self.chunk_tokens = chunk_tokens
+        self.summary_words = summary_words
+        self.cache_dir = cache_dir
+        self.cipher = cipher
+        self.max_cached = max_cached
+        self.context_weeks = context_weeks
+        self._summaries: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._counters = {"summary_calls": 0, "cache_hits": 0, "tokens_in": 0, "tokens_out": 0}
+        self._db: sqlite3.Connection | None = None
+        if cache_dir and cipher is None:
+            print("Warning: weekly summaries are only cached in memory; set a cipher to store them on disk.")
+        elif cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._db = sqlite3.connect(
+                os.path.join(cache_dir, "weekly_summaries.sqlite3"), check_same_thread=False, isolation_level=None
+            )
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS summaries (
+                    cache_key TEXT PRIMARY KEY,
+                    journal_id INTEGER NOT NULL,
+                    week TEXT NOT NULL,
+                    summary BLOB NOT NULL,
+                    used_at REAL NOT NULL
+                )
+            """)
+            self._db.execute("CREATE INDEX IF NOT EXISTS summaries_week ON summaries (journal_id, week)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS summaries_used ON summaries (used_at)")
+
+    async def build_history(self, journal_id: int, pages: list, since: datetime | None = None) -> tuple[str, dict]:
+        """
+        Returns the history text for the given pages and a dict describing how it was built.
+        Pages up to `since` (the last insight) are only used as earlier context, including
+        those in the newest week, which is otherwise sent verbatim.
+        """
+        weeks: dict[str, list] = {}
+        for page in sorted(pages, key=lambda page: parse_timestamp(page["created_at"])):
+            weeks.setdefault(week_key(parse_timestamp(page["created_at"])), []).append(page)
+
+        def is_new(page: dict) -> bool:
+            return since is None or parse_timestamp(page["created_at"]) > since
+
+        new_pages = [page for page in pages if is_new(page)]
+        new_weeks = {week_key(parse_timestamp(page["created_at"])) for page in new_pages}
+        keys = [key for key in weeks if key in new_weeks]
+        earlier = [key for key in weeks if key not in new_weeks and (not keys or key < keys[0])]
+        earlier = earlier[-self.context_weeks:] if self.context_weeks > 0 else []
+
+        calls_before = self._counters["summary_calls"]
+        hits_before = self._counters["cache_hits"]
+        summarized = earlier + keys[:-1]
+        summaries = await asyncio.gather(*(
+            self._week_summary(journal_id, key, weeks[key]) for key in summarized
+        ))
+        sections = [
+            f"<week {key} ({'earlier summary' if key in earlier else 'summary'})>\n{summary}"
+            for key, summary in zip(summarized, summaries)
+        ]
+        if keys:
+            latest_new = [page for page in weeks[keys[-1]] if is_new(page)]
+            latest_seen = [page for page in weeks[keys[-1]] if not is_new(page)]
+            if latest_seen:
+                summary = await self._week_summary(journal_id, f"{keys[-1]}-seen", latest_seen)
+                sections.append(f"<week {keys[-1]} (earlier summary)>\n{summary}")
+            latest = "\n".join(format_entry(page) for page in latest_new)
+            sections.append(f"<week {keys[-1]}>\n{latest}")
+
+        history = "\n---\n".join(sections)
+        raw_tokens = estimate_tokens("\n".join(format_entry(page) for page in new_pages))
+        if estimate_tokens(history) > self.token_budget:
+            history = await self.summarize(history)
+
+        report = {
+            "pages": len(new_pages),
+            "weeks": len(keys),
+            "context_weeks": len(earlier),
+            "summary_calls": self._counters["summary_calls"] - calls_before,
+            "cached_weeks": self._counters["cache_hits"] - hits_before,
+            "raw_tokens": raw_tokens,
+            "history_tokens": estimate_tokens(history),
+        }
+        return history, report
+
+    async def summarize(self, text: str) -> str:
+        """Summarizes text; text longer than chunk_tokens is split, summarized in parallel and combined."""
+        if estimate_tokens(text) <= self.chunk_tokens:
+            return await self._summarize_once(text)
+
+        chunks = self._split(text)
+        partials = await asyncio.gather(*(self._summarize_once(chunk) for chunk in chunks))
+        combined = "\n---\n".join(partials)
+        if len(chunks) > 1 and estimate_tokens(combined) > self.chunk_tokens:
+            return await self.summarize(combined)
+        return await self._summarize_once(combined)
+
+    def stats(self) -> dict:
+        counters = dict(self._counters)
+        counters["cached_summaries"] = len(self._summaries)
+        return counters
+
+    async def _week_summary(self, journal_id: int, key: str, pages: list) -> str:
+        text = "\n".join(format_entry(page) for page in pages)
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+        cache_key = f"{journal_id}:{key}:{digest}:{self.summary_words}"
+
+        summary = self._summaries.get(cache_key) or await asyncio.to_thread(self._read_cached, journal_id, cache_key)
+        if summary is not None:
+            self._counters["cache_hits"] += 1
+            self._remember(cache_key, summary)
+            return summary
+
+        summary = await self.summarize(text)
+        self._remember(cache_key, summary)
+        await asyncio.to_thread(self._write_cached, journal_id, cache_key, summary)
+        return summary
+
+    def _remember(self, cache_key: str, summary: str) -> None:
+        self._summaries[cache_key] = summary
+        while len(self._summaries) > self.max_cached:
+            del self._summaries[next(iter(self._summaries))]
+
+    async def _summarize_once(self, text: str) -> str:
+        prompt = f"""
+    <system_instructions>{PROMPT_SUMMARIZER.format(max_words=self.summary_words)}</system_instructions>
+    <entries>{text}</entries>
+    Provide your summary:
+    """
+        self._counters["summary_calls"] += 1
+        self._counters["tokens_in"] += estimate_tokens(prompt)
+        summary = await self.generate(prompt)
+        self._counters["tokens_out"] += estimate_tokens(summary)
+        return summary
+
+    def _split(self, text: str) -> list:
+        # Split on entry/section boundaries, never inside one unless it alone is too long
+        limit = self.chunk_tokens * 4
+        chunks, current = [], ""
+        for line in text.split("\n"):
+            while len(line) > limit:
+                if current:
+                    chunks.append(current)
+                    current = ""
+                chunks.append(line[:limit])
+                line = line[limit:]
+            if current and len(current) + len(line) + 1 > limit:
+                chunks.append(current)
+                current = ""
+            current = f"{current}\n{line}" if current else line
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _read_cached(self, journal_id: int, cache_key: str) -> str | None:
+        if self._db is None:
+            return None
+        with self._lock:
+            try:
+                rows = self._db.execute("SELECT summary FROM summaries WHERE cache_key = ?", (cache_key,)).fetchall()
+                if rows:
+                    self._db.execute("UPDATE summaries SET used_at = ? WHERE cache_key = ?", (time.time(), cache_key))
+            except sqlite3.Error as e:
+                print(f"Warning: Could not read cached weekly summary: {e}")
+                return None
+        if not rows:
+            return None
+        try:
+            return self.cipher.decrypt(rows[0][0]).decode("utf-8")
+        except InvalidToken:
+            # Written with a key that has since been dropped; it will be regenerated
+            return None
+
+    def _write_cached(self, journal_id: int, cache_key: str, summary: str) -> None:
+        if self._db is None:
+            return
+        week = cache_key.split(":")[1]
+        token = self.cipher.encrypt(summary.encode("utf-8"))
+        with self._lock:
+            try:
+                self._db.execute("BEGIN IMMEDIATE")
+                try:
+                    # An edited week gets a new content digest; its old summary is dead weight
+                    self._db.execute(
+                        "DELETE FROM summaries WHERE journal_id = ? AND week = ? AND cache_key != ?",
+                        (journal_id, week, cache_key),
+                    )
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO summaries (cache_key, journal_id, week, summary, used_at) VALUES (?, ?, ?, ?, ?)",
+                        (cache_key, journal_id, week, token, time.time()),
+                    )
+                    self._db.execute(
+                        "DELETE FROM summaries WHERE cache_key IN "
+                        "(SELECT cache_key FROM summaries ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                        (self.max_cached,),
+                    )
+                    self._db.execute("COMMIT")
+                except BaseException:
+                    self._db.execute("ROLLBACK")
+                    raise
+            except sqlite3.Error as e:
+                print(f"Warning: Could not cache weekly summary: {e}")
@@ -4,11 +4,15 @@ import base64
 import json
 import httpx 
 import asyncio
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Request, UploadFile, File
+import hashlib
+import time
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Request, Response, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, ConfigDict
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ConfigDict, field_validator
 from typing import List
-from datetime import datetime
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 load_dotenv()
 # GCP Imports
@@ -22,8 +26,27 @@ from agent_hub import (
     PROMPT_GUIDE, PROMPT_STRATEGIST, PROMPT_ARCHIVIST
 )
 
-from tts_service import generate_tts_bytes
+from tts_service import generate_tts_bytes, tts_cache
+from tts_stream import SentenceAudioStream
+from token_stream import TokenCoalescer
+from ws_protocol import AUDIO_MODES, pack_frame, pack_multipart
+from embedding_gateway import EmbeddingGateway
+from upstream_executors import UpstreamExecutor
+from journal_directory import JournalDirectory
+from page_outbox import PageOutbox
+from journal_listing import JournalListing, parse_fields, project
+from longitudinal import LongitudinalSummarizer, parse_timestamp
+from at_rest import AtRestCipher
+from analysis_batch import AnalysisBatchRunner
+from rate_limit import TokenBucket
+from admission import AdmissionController, OverloadedError
+from llm_client import LLMCallError, ResilientModel
+from stage_graph import StageGraph
+from route_classifier import FastRouteClassifier
 from rag.rag_retrieval_service import RAGRetrievalService
+from rag.vector_codec import encode_vector, decode_vector
+from rag.chunking import chunk_spans, pool_passage_vectors
+from rag.context_packer import pack_context
 
 # --- GCP Configuration ---
 PROJECT_ID = os.environ.get("GCP_PROJECT_ID")
@@ -31,6 +54,107 @@ REGION = os.environ.get("GCP_REGION")
 AZURE_API_BASE_URL = os.environ.get("AZURE_API_BASE_URL", "https://proxy-clarity.gentleocean-eb3ee6eb.westus2.azurecontainerapps.io/api")
 SCHEDULER_TOKEN = os.environ.get("SCHEDULER_TOKEN") 
 AZURE_API_KEY = os.environ.get("BDD_API_KEY")
+EMBEDDING_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", 32))
+EMBEDDING_BATCH_WAIT_MS = float(os.environ.get("EMBEDDING_BATCH_WAIT_MS", 5))
+# "json" (list of floats), "float32" or "float16" (compact base64)
+VECTOR_ENCODING = os.environ.get("VECTOR_ENCODING", "json")
+# Long entries are embedded as overlapping passages instead of being truncated
+ENTRY_CHUNK_CHARS = int(os.environ.get("ENTRY_CHUNK_CHARS", 1500))
+ENTRY_CHUNK_OVERLAP = int(os.environ.get("ENTRY_CHUNK_OVERLAP", 200))
+# Thread pool size per blocking upstream SDK
+UPSTREAM_POOL_SIZES = {
+    "embedding": int(os.environ.get("EMBEDDING_POOL_SIZE", 4)),
+    "stt": int(os.environ.get("STT_POOL_SIZE", 4)),
+    "tts": int(os.environ.get("TTS_POOL_SIZE", 4)),
+}
+# Streamed replies are spoken sentence by sentence; shorter sentences are merged
+TTS_MIN_SENTENCE_CHARS = int(os.environ.get("TTS_MIN_SENTENCE_CHARS", 40))
+# Sentences of one reply synthesized at once (kept below ADMISSION_PER_USER, or the rest would be shed)
+TTS_SENTENCE_CONCURRENCY = int(os.environ.get("TTS_SENTENCE_CONCURRENCY", 2))
+# user_id -> journal_id cache lifetime; failed lookups (bad ids, 4xx) are cached briefly
+JOURNAL_CACHE_TTL = float(os.environ.get("JOURNAL_CACHE_TTL", 3600))
+JOURNAL_NEGATIVE_TTL = float(os.environ.get("JOURNAL_NEGATIVE_TTL", 30))
+# Streamed tokens are sent in batches: every TOKEN_FLUSH_MS or TOKEN_FLUSH_CHARS, whichever comes first
+TOKEN_FLUSH_MS = float(os.environ.get("TOKEN_FLUSH_MS", 40))
+TOKEN_FLUSH_CHARS = int(os.environ.get("TOKEN_FLUSH_CHARS", 48))
+# Local pre-classifier for the Orchestrator: "off", "shadow" (log agreement, still call the LLM)
+# or "on" (skip the LLM for confident NONE/Guide entries)
+ROUTE_CLASSIFIER_MODE = os.environ.get("ROUTE_CLASSIFIER_MODE", "shadow")
+# Local write-ahead log for page saves (required; put it on a private persistent volume, payloads are
+# encrypted with AT_REST_KEYS); enqueue blocks once PAGE_OUTBOX_MAX_PENDING pages are undelivered, and
+# pages the API rejected are kept PAGE_OUTBOX_DEAD_RETENTION seconds (at most PAGE_OUTBOX_MAX_DEAD) for replay
+PAGE_OUTBOX_PATH = os.environ.get("PAGE_OUTBOX_PATH")
+PAGE_OUTBOX_MAX_PENDING = int(os.environ.get("PAGE_OUTBOX_MAX_PENDING", 1000))
+PAGE_OUTBOX_DEAD_RETENTION = float(os.environ.get("PAGE_OUTBOX_DEAD_RETENTION", 7 * 24 * 3600))
+PAGE_OUTBOX_MAX_DEAD = int(os.environ.get("PAGE_OUTBOX_MAX_DEAD", 1000))
+# /v1/journal pagination: default and maximum page size (unpaginated without limit/cursor),
+# how many sorted listings to keep, and how long cursor requests reuse one without revalidating
+JOURNAL_PAGE_SIZE = int(os.environ.get("JOURNAL_PAGE_SIZE", 50))
+JOURNAL_PAGE_MAX = int(os.environ.get("JOURNAL_PAGE_MAX", 200))
+JOURNAL_LISTING_CACHE_SIZE = int(os.environ.get("JOURNAL_LISTING_CACHE_SIZE", 256))
+JOURNAL_LISTING_TTL = float(os.environ.get("JOURNAL_LISTING_TTL", 60))
+# Fernet keys (comma-separated, newest first) for local files holding journal text;
+# generate one with: python -c "from at_rest import AtRestCipher; print(AtRestCipher.generate_key())"
+AT_REST_KEYS = os.environ.get("AT_REST_KEYS")
+# Longitudinal analysis: token budget for the Analyst's history, map-reduce chunk size,
+# weeks before the last insight sent as earlier context, and where weekly summaries are
+# cached encrypted (memory only unless both this and AT_REST_KEYS are set)
+ANALYSIS_TOKEN_BUDGET = int(os.environ.get("ANALYSIS_TOKEN_BUDGET", 6000))
+ANALYSIS_CHUNK_TOKENS = int(os.environ.get("ANALYSIS_CHUNK_TOKENS", 3000))
+ANALYSIS_CONTEXT_WEEKS = int(os.environ.get("ANALYSIS_CONTEXT_WEEKS", 8))
+ANALYSIS_SUMMARY_DIR = os.environ.get("ANALYSIS_SUMMARY_DIR")
+# Batch analysis jobs: users analysed at once, Gemini request rate for analyses, job state file
+ANALYSIS_BATCH_CONCURRENCY = int(os.environ.get("ANALYSIS_BATCH_CONCURRENCY", 8))
+ANALYSIS_GEMINI_RPM = float(os.environ.get("ANALYSIS_GEMINI_RPM", 120))
+ANALYSIS_JOB_DB = os.environ.get("ANALYSIS_JOB_DB", "analysis_jobs.sqlite3")
+# Token budget for each specialist's <history>: the Archivist needs breadth, the Guide a few techniques
+CONTEXT_TOKEN_BUDGETS = {
+    "Analyst": int(os.environ.get("CONTEXT_BUDGET_ANALYST", 1500)),
+    "Strategist": int(os.environ.get("CONTEXT_BUDGET_STRATEGIST", 1000)),
+    "Archivist": int(os.environ.get("CONTEXT_BUDGET_ARCHIVIST", 2000)),
+    "Guide": int(os.environ.get("CONTEXT_BUDGET_GUIDE", 600)),
+}
+# MMR relevance/diversity trade-off and the cosine above which entries count as duplicates
+CONTEXT_MMR_LAMBDA = float(os.environ.get("CONTEXT_MMR_LAMBDA", 0.7))
+CONTEXT_DUPLICATE_THRESHOLD = float(os.environ.get("CONTEXT_DUPLICATE_THRESHOLD", 0.92))
+# Gemini call deadlines in seconds (including retries), retries for transient errors, and the
+# gap allowed between streamed chunks. The Orchestrator call is small: it gets a short per-attempt
+# deadline and is hedged (sent twice) once it runs past its recent p95 latency.
+GEMINI_TIMEOUT = float(os.environ.get("GEMINI_TIMEOUT", 60))
+GEMINI_MAX_RETRIES = int(os.environ.get("GEMINI_MAX_RETRIES", 2))
+GEMINI_STREAM_IDLE_TIMEOUT = float(os.environ.get("GEMINI_STREAM_IDLE_TIMEOUT", 15))
+ORCHESTRATOR_TIMEOUT = float(os.environ.get("ORCHESTRATOR_TIMEOUT", 10))
+ORCHESTRATOR_ATTEMPT_TIMEOUT = float(os.environ.get("ORCHESTRATOR_ATTEMPT_TIMEOUT", 4))
+ORCHESTRATOR_HEDGE = os.environ.get("ORCHESTRATOR_HEDGE", "1") == "1"
+# Admission control per upstream: calls running at once, calls allowed to queue beyond that,
+# and calls started per second (0 = no rate limit). Calls over a bound are rejected right away.
+ADMISSION_LIMITS = {
+    "gemini": {
+        "max_concurrency": int(os.environ.get("GEMINI_MAX_CONCURRENCY", 16)),
+        "max_queue": int(os.environ.get("GEMINI_MAX_QUEUE", 64)),
+        "rate": float(os.environ.get("GEMINI_RPS", 10)),
+    },
+    "embedding": {
+        "max_concurrency": int(os.environ.get("EMBEDDING_MAX_CONCURRENCY", 64)),
+        "max_queue": int(os.environ.get("EMBEDDING_MAX_QUEUE", 256)),
+        "rate": float(os.environ.get("EMBEDDING_RPS", 0)),
+    },
+    "stt": {
+        "max_concurrency": int(os.environ.get("STT_MAX_CONCURRENCY", UPSTREAM_POOL_SIZES["stt"])),
+        "max_queue": int(os.environ.get("STT_MAX_QUEUE", 16)),
+        "rate": float(os.environ.get("STT_RPS", 0)),
+    },
+    "tts": {
+        "max_concurrency": int(os.environ.get("TTS_MAX_CONCURRENCY", UPSTREAM_POOL_SIZES["tts"])),
+        "max_queue": int(os.environ.get("TTS_MAX_QUEUE", 64)),
+        "rate": float(os.environ.get("TTS_RPS", 0)),
+    },
+}
+# Calls one user may have running or queued per upstream, and the longest a call may queue (seconds)
+ADMISSION_PER_USER = int(os.environ.get("ADMISSION_PER_USER", 4))
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", 5))
+# Memory-mapped retrieval index snapshots, shared by all workers (disabled if unset)
+RAG_SNAPSHOT_DIR = os.environ.get("RAG_SNAPSHOT_DIR")
 print(f"DEBUG: Project ID={PROJECT_ID}, AZURE_KEY_PRESENT={bool(AZURE_API_KEY)}")
 # --- Global Clients ---
 app = FastAPI()
@@ -48,22 +172,71 @@ app.add_middleware(
     allow_methods=["*"],  # Allow all methods
     allow_headers=["*"],  # Allow all headers
 )
+
+@app.exception_handler(OverloadedError)
+async def overloaded_handler(request: Request, error: OverloadedError):
+    # 429 when this user is over their share, 503 when the upstream itself is saturated
+    return JSONResponse(
+        status_code=429 if error.reason == "user_limit" else 503,
+        content={"detail": str(error), "upstream": error.upstream, "retry_after": error.retry_after},
+        headers={"Retry-After": str(int(error.retry_after))}
+    )
 gemini_flash = None
+gemini: ResilientModel = None
 embedding_model = None
+embedding_gateway: EmbeddingGateway = None
+upstream: dict[str, UpstreamExecutor] = {}
 speech_client = None 
 api_client: httpx.AsyncClient = None 
 retrieval_service: RAGRetrievalService = None
+journal_directory: JournalDirectory = None
+page_outbox: PageOutbox = None
+journal_listings: OrderedDict[int, JournalListing] = OrderedDict()
+longitudinal_summarizer: LongitudinalSummarizer = None
+analysis_runner: AnalysisBatchRunner = None
+# Shared by every analysis Gemini call, so batch jobs stay within quota
+analysis_rate_limiter = TokenBucket(rate=ANALYSIS_GEMINI_RPM / 60, capacity=max(1.0, ANALYSIS_GEMINI_RPM / 60 * 5))
+token_stream_counters = {"replies": 0, "frames": 0, "tokens": 0}
+context_packing_counters: dict[str, dict] = {}
+route_classifier = FastRouteClassifier()
+admission = {
+    name: AdmissionController(
+        name,
+        max_concurrency=limits["max_concurrency"],
+        max_queue=limits["max_queue"],
+        rate=limits["rate"] or None,
+        per_user_limit=ADMISSION_PER_USER,
+        queue_timeout=ADMISSION_QUEUE_TIMEOUT
+    )
+    for name, limits in ADMISSION_LIMITS.items()
+}
 
 # --- Pydantic Models for Journal ---
 class JournalEntry(BaseModel):
     model_config = ConfigDict(from_attributes=True) 
     id: int
     created_at: datetime
-    content: str 
+    content: str | None = None  # Left out when a /v1/journal projection doesn't ask for it
     text_vector: List[float] | None = None 
 
+    @field_validator("text_vector", mode="before")
+    @classmethod
+    def decode_text_vector(cls, value):
+        # Pages may store the vector as a JSON list or as compact base64
+        if value is None or isinstance(value, list):
+            return value
+        vector = decode_vector(value)
+        return vector.tolist() if vector is not None else None
+
 class JournalResponse(BaseModel):
     entries: List[JournalEntry]
+    next_cursor: str | None = None
+
+class AnalysisBatchRequest(BaseModel):
+    user_ids: List[int | str]
+
+class OutboxReplayRequest(BaseModel):
+    ids: List[int] | None = None
 
 class InsightCreate(BaseModel):
     journal_id: int
@@ -80,17 +253,38 @@ async def startup_event():
     Initialize all GCP clients, the RAG service,
     and the authenticated Azure API client.
     """
-    global gemini_flash, embedding_model, api_client, retrieval_service, speech_client
+    global gemini_flash, embedding_model, embedding_gateway, api_client, retrieval_service, speech_client, journal_directory, page_outbox
+    global longitudinal_summarizer, analysis_runner, gemini
     
     vertexai.init(project=PROJECT_ID, location=REGION)
     gemini_flash = GenerativeModel("gemini-2.5-flash") 
+    gemini = ResilientModel(gemini_flash, timeout=GEMINI_TIMEOUT, max_retries=GEMINI_MAX_RETRIES)
     embedding_model = TextEmbeddingModel.from_pretrained("text-embedding-005")
+    for name, pool_size in UPSTREAM_POOL_SIZES.items():
+        upstream[name] = UpstreamExecutor(name, max_workers=pool_size)
+    embedding_gateway = EmbeddingGateway(
+        embedding_model,
+        max_batch_size=EMBEDDING_BATCH_SIZE,
+        max_wait_ms=EMBEDDING_BATCH_WAIT_MS,
+        executor=upstream["embedding"]
+    )
+    embedding_gateway.start()
     speech_client = speech.SpeechClient()
+    longitudinal_summarizer = LongitudinalSummarizer(
+        generate_text,
+        token_budget=ANALYSIS_TOKEN_BUDGET,
+        chunk_tokens=ANALYSIS_CHUNK_TOKENS,
+        cache_dir=ANALYSIS_SUMMARY_DIR,
+        cipher=AtRestCipher(AT_REST_KEYS) if AT_REST_KEYS else None,
+        context_weeks=ANALYSIS_CONTEXT_WEEKS
+    )
 
     try:
         # 1. Get the secret key
         if not AZURE_API_KEY:
             raise ValueError("CRITICAL ERROR: BDD_API_KEY environment variable is not set.")
+        if not PAGE_OUTBOX_PATH or not AT_REST_KEYS:
+            raise ValueError("CRITICAL ERROR: PAGE_OUTBOX_PATH and AT_REST_KEYS environment variables must be set.")
             
         # 2. Create the headers our teammate requires
         headers = {
@@ -100,13 +294,31 @@ async def startup_event():
         
         # 3. Initialize the api_client 
         api_client = httpx.AsyncClient(base_url=AZURE_API_BASE_URL, headers=headers)
+        journal_directory = JournalDirectory(
+            resolve_default_journal, ttl=JOURNAL_CACHE_TTL, negative_ttl=JOURNAL_NEGATIVE_TTL
+        )
+        page_outbox = PageOutbox(
+            PAGE_OUTBOX_PATH,
+            save_journal_page,
+            max_pending=PAGE_OUTBOX_MAX_PENDING,
+            cipher=AtRestCipher(AT_REST_KEYS),
+            dead_retention=PAGE_OUTBOX_DEAD_RETENTION,
+            max_dead=PAGE_OUTBOX_MAX_DEAD
+        )
+        page_outbox.start()
+        analysis_runner = AnalysisBatchRunner(
+            ANALYSIS_JOB_DB, analyze_user, concurrency=ANALYSIS_BATCH_CONCURRENCY
+        )
+        analysis_runner.resume()
         
         # 4. Initialize RAG service 
         retrieval_service = RAGRetrievalService(
             api_base_url=AZURE_API_BASE_URL,
             api_key=AZURE_API_KEY,
             project_id=PROJECT_ID,
-            location=REGION
+            location=REGION,
+            embedding_gateway=embedding_gateway,
+            snapshot_dir=RAG_SNAPSHOT_DIR
         )
 
         print("GCP clients, Azure API client, and RAG Service initialized successfully.")
@@ -117,17 +329,30 @@ async def startup_event():
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    """Clean up the httpx client."""
+    """Clean up the httpx client, the embedding gateway, the page outbox and the RAG service's connection pool."""
+    if embedding_gateway:
+        await embedding_gateway.stop()
+    if page_outbox:
+        await page_outbox.stop()
+    if analysis_runner:
+        await analysis_runner.stop()
     if api_client:
         await api_client.aclose()
+    if retrieval_service:
+        retrieval_service.close()
+    for executor in upstream.values():
+        executor.shutdown()
     print("Azure API client closed.")
 
 @app.post("/v1/transcribe/{user_id}")
-async def transcribe_audio(user_id: str, file: UploadFile = File(...)):
+async def transcribe_audio(user_id: str, file: UploadFile = File(...), audio: str = "json"):
     """
     Accepts an audio file, transcribes it, and then runs the
     full agent loop. This is a non-streaming endpoint for voice.
     It will return the FINAL text and audio response.
+    With ?audio=binary the reply is multipart/mixed: a JSON part with
+    type and text, then the raw MP3 as an audio/mpeg part, instead of
+    base64 inside JSON.
     """
     print(f"Received audio file from user {user_id}...")
     
@@ -139,7 +364,7 @@ async def transcribe_audio(user_id: str, file: UploadFile = File(...)):
     # 1. Transcribe the Audio
     try:
         audio_content = await file.read()
-        audio = speech.RecognitionAudio(content=audio_content)
+        recognition_audio = speech.RecognitionAudio(content=audio_content)
         
         config = speech.RecognitionConfig(
             encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16, 
@@ -148,7 +373,8 @@ async def transcribe_audio(user_id: str, file: UploadFile = File(...)):
         )
 
         print("Task 0: Calling Speech-to-Text API...")
-        response = speech_client.recognize(config=config, audio=audio)
+        async with admission["stt"].admit(user_id):
+            response = await upstream["stt"].run(speech_client.recognize, config=config, audio=recognition_audio)
         
         if not response.results or not response.results[0].alternatives:
             raise HTTPException(status_code=400, detail="Could not transcribe audio.")
@@ -156,56 +382,22 @@ async def transcribe_audio(user_id: str, file: UploadFile = File(...)):
         raw_text = response.results[0].alternatives[0].transcript
         print(f"Transcription complete: '{raw_text}'")
 
+    except OverloadedError:
+        raise
     except Exception as e:
         print(f"Speech-to-Text failed: {e}")
         raise HTTPException(status_code=500, detail="Speech-to-Text failed.")    
-    # 2. EMBED
-    print("Task 1: Generating vector...")
-    embeddings = embedding_model.get_embeddings([raw_text])
-    vector = embeddings[0].values
-
-    # 3. STORE
-    print("Task 2: Storing in journal_pages via API...")
-    page_payload = { 
-        "journal_id": journal_id, 
-        "content": raw_text, 
-        "encoding": "utf-8", 
-        "entry_type": "voice", 
-        "text_vector": vector 
-    }
-    try:
-        # We don't wait for this, just fire it off
-        asyncio.create_task(
-            api_client.post(f"/journals/{journal_id}/pages", json=page_payload)
-        )
-    except httpx.HTTPStatusError as e:
-        print(f"Warning: Failed to save journal page to Azure: {e}")
-    
-    # 4. ORCHESTRATE
-    print("Task 3: Calling Orchestrator...")
-    orchestrator_prompt = f"{PROMPT_ORCHESTRATOR}\n<new_entry>{raw_text}</new_entry>"
-    orchestrator_response = await gemini_flash.generate_content_async([orchestrator_prompt])
-    try:
-        decision = json.loads(orchestrator_response.text)
-        route = decision.get("route", "NONE")
-    except Exception:
-        route = "NONE"
-    print(f"Orchestrator decision: {route}")
+    # 2-4. EMBED + STORE, ORCHESTRATE and prefetch RAG concurrently
+    pipeline = start_entry_pipeline(user_id, journal_id, raw_text, "voice")
+    route, history = await resolve_entry_route(pipeline)
 
     # 5. ROUTE (Handle "NONE" case)
     if route == "NONE":
+        print(pipeline.report())
         # We still return the transcribed text so the app can show it
         return {"type": "ACK", "status": "saved_and_processed", "text": raw_text}
 
-    # 6. RAG
-    print("Task 4: Running RAG (calling Azure API)...")
-    history = "No relevant history found."
-    if route in ["Analyst", "Strategist", "Archivist", "Guide"]:
-        plaintext_context = await get_relevant_entries_from_db(journal_id, raw_text) 
-        if plaintext_context:
-            history = "\n---\n".join(plaintext_context)
-    
-    # 7. SPECIALIST AGENT
+    # 6. SPECIALIST AGENT
     print(f"Task 5: Calling Specialist Agent: {route}")
     specialist_prompt_template = AGENT_PROMPTS.get(route)
     full_prompt = f"""
@@ -215,21 +407,35 @@ async def transcribe_audio(user_id: str, file: UploadFile = File(...)):
     Provide your agentic response:
     """
     
-    # 8. GET FULL (NON-STREAMING) RESPONSE
+    # 7. GET FULL (NON-STREAMING) RESPONSE
     print("Task 6: Getting full response...")
-    response = await gemini_flash.generate_content_async([full_prompt])
+    try:
+        async with admission["gemini"].admit(user_id):
+            response = await gemini.generate([full_prompt], name="specialist")
+    except LLMCallError as e:
+        print(f"Specialist call failed: {e}")
+        raise HTTPException(status_code=503, detail="The assistant is not responding right now. Your entry was saved.")
     full_text_response = response.text
+    print(pipeline.report())
     
-    # 9. TTS
+    # 8. TTS
     print("Task 7: Generating TTS...")
-    audio_bytes = generate_tts_bytes(full_text_response)
+    try:
+        async with admission["tts"].admit(user_id):
+            audio_bytes = await upstream["tts"].run(generate_tts_bytes, full_text_response)
+    except OverloadedError as e:
+        print(f"TTS shed: {e}")
+        audio_bytes = None
+    if audio_bytes and audio == "binary":
+        body, media_type = pack_multipart({"type": "AGENT_RESPONSE", "text": full_text_response}, audio_bytes)
+        return Response(content=body, media_type=media_type)
     audio_base64 = None
     if audio_bytes:
         audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
     else:
         print("TTS generation failed.")
 
-    # 10. RETURN EVERYTHING AT ONCE
+    # 9. RETURN EVERYTHING AT ONCE
     return {
         "type": "AGENT_RESPONSE",
         "text": full_text_response,
@@ -237,6 +443,13 @@ async def transcribe_audio(user_id: str, file: UploadFile = File(...)):
     }
 
 async def get_or_create_default_journal(user_id: str) -> int:
+    """
+    Returns the user's 'Default Journal' id. Lookups are cached and
+    concurrent calls for the same user share one Azure round trip.
+    """
+    return await journal_directory.get(user_id)
+
+async def resolve_default_journal(user_id: str) -> int:
     """
     Finds the user's 'Default Journal' by CALLING THE AZURE API.
     If it doesn't exist, this creates it.
@@ -268,34 +481,230 @@ async def get_or_create_default_journal(user_id: str) -> int:
         print(f"ERROR: The user_id '{user_id}' is not a valid integer. Cannot create journal.")
         raise
     except Exception as e:
-        print(f"An unknown error occurred in get_or_create_default_journal: {e}")
+        print(f"An unknown error occurred in resolve_default_journal: {e}")
         raise
 
+async def embed_entry(raw_text: str) -> tuple[List[float], list | None]:
+    """
+    Embeds a new entry. Short entries get one vector. Long entries are
+    split into overlapping passages embedded in one batch: the page vector
+    is their pooled mean, and the encoded passage vectors are returned
+    for storage as chunk_vectors (None for short entries).
+    """
+    spans = chunk_spans(raw_text, max_chars=ENTRY_CHUNK_CHARS, overlap=ENTRY_CHUNK_OVERLAP)
+    if len(spans) == 1:
+        return await embedding_gateway.embed(raw_text), None
+
+    passage_vectors = await embedding_gateway.embed_many([raw_text[start:end] for start, end in spans])
+    chunk_vectors = [
+        {"start": start, "end": end, "vector": encode_vector(passage_vector, VECTOR_ENCODING)}
+        for (start, end), passage_vector in zip(spans, passage_vectors)
+    ]
+    return pool_passage_vectors(passage_vectors), chunk_vectors
+
+async def save_journal_page(journal_id: int, page_payload: dict, vector: List[float]) -> None:
+    """
+    Saves a journal page via the Azure API, then appends its vector to the
+    cached retrieval index so the next search doesn't reload the journal.
+    Called by the page outbox, which retries when this raises.
+    """
+    response = await api_client.post(f"/journals/{journal_id}/pages", json=page_payload)
+    response.raise_for_status()
+
+    # The page is saved from here on: never raise, or the outbox would post it twice
+    try:
+        saved_page = response.json()
+    except ValueError:
+        saved_page = {}
+    if not isinstance(saved_page, dict):
+        saved_page = {}
+    page = {
+        **saved_page,
+        "journal_id": journal_id,
+        "content": page_payload["content"],
+        "entry_type": page_payload["entry_type"],
+        "chunk_vectors": page_payload.get("chunk_vectors"),
+    }
+    if page.get("id") is None:
+        print(f"Warning: Saved page of journal {journal_id} came back without an id; it is indexed on the next revalidation")
+    try:
+        # Off the event loop: the insert may wait on the ANN index while a search retrains it
+        # (pages without an id only invalidate the cached index, see add_page_to_index)
+        await asyncio.to_thread(retrieval_service.add_page_to_index, journal_id, page, vector)
+    except Exception as e:
+        print(f"Warning: Failed to add saved page to the retrieval index: {e}")
+
+# --- NEW ENTRY PIPELINE ---
+RAG_ROUTES = ["Analyst", "Strategist", "Archivist", "Guide"]
+NO_HISTORY = "No relevant history found."
+
+def start_entry_pipeline(user_id: str, journal_id: int, raw_text: str, entry_type: str) -> StageGraph:
+    """
+    Starts the stages of a new entry as a DAG:
+
+        embed ──> store
+          └────> history (speculative RAG prefetch)
+        route (orchestrator, independent of the embedding)
+
+    The orchestrator runs alongside embedding/storage, and retrieval context
+    is prefetched while it decides. Use resolve_entry_route() to collect
+    the route and its history.
+    """
+    async def embed():
+        print("Task 1: Generating vector...")
+        async with admission["embedding"].admit(user_id):
+            return await embed_entry(raw_text)
+
+    async def store(embedded):
+        print("Task 2: Storing in journal_pages via API...")
+        vector, chunk_vectors = embedded
+        page_payload = {
+            "journal_id": journal_id,
+            "content": raw_text,
+            "encoding": "utf-8",
+            "entry_type": entry_type,
+            "text_vector": encode_vector(vector, VECTOR_ENCODING)
+        }
+        if chunk_vectors:
+            page_payload["chunk_vectors"] = chunk_vectors
+        # Durable once queued; the outbox delivers it to Azure in the background
+        await page_outbox.enqueue(journal_id, page_payload, vector)
+
+    async def route():
+        local_route = route_classifier.classify(raw_text) if ROUTE_CLASSIFIER_MODE != "off" else None
+        if local_route and ROUTE_CLASSIFIER_MODE == "on":
+            print(f"Task 3: Fast-path route {local_route} (Orchestrator skipped)")
+            return local_route
+
+        print("Task 3: Calling Orchestrator...")
+        orchestrator_prompt = f"{PROMPT_ORCHESTRATOR}\n<new_entry>{raw_text}</new_entry>"
+        try:
+            async with admission["gemini"].admit(user_id):
+                orchestrator_response = await gemini.generate(
+                    [orchestrator_prompt],
+                    name="orchestrator",
+                    timeout=ORCHESTRATOR_TIMEOUT,
+                    attempt_timeout=ORCHESTRATOR_ATTEMPT_TIMEOUT,
+                    hedge=ORCHESTRATOR_HEDGE
+                )
+        except (LLMCallError, OverloadedError) as e:
+            # The entry is still saved; fall back to the local classifier's guess
+            print(f"Orchestrator call failed, routing to {local_route or 'NONE'}: {e}")
+            return local_route or "NONE"
+        try:
+            decision = json.loads(orchestrator_response.text)
+            llm_route = decision.get("route", "NONE")
+        except Exception:
+            llm_route = "NONE"
+        if local_route and not route_classifier.record_shadow(local_route, llm_route):
+            print(f"Route classifier shadow mismatch: local={local_route} llm={llm_route}")
+        return llm_route
+
+    async def history(embedded):
+        print("Task 4: Prefetching RAG context (calling Azure API)...")
+        vector, _ = embedded
+        return await get_relevant_entries_from_db(journal_id, raw_text, vector)
+
+    graph = StageGraph(f"entry[{entry_type}]")
+    graph.add("embed", embed)
+    graph.add("store", store, "embed")
+    graph.add("route", route)
+    graph.add("history", history, "embed")
+    # Storage only waits for the local outbox write, not for Azure
+    return graph.start("store", "route", "history")
+
+async def resolve_entry_route(graph: StageGraph) -> tuple[str, str]:
+    """
+    Waits for the orchestrator's route, then returns it with the prefetched
+    history. The prefetch is dropped when the route doesn't use it ("NONE").
+    Embedding and outbox failures are raised here, so an entry is only
+    acknowledged once it has been durably queued.
+    """
+    route = await graph.result("route")
+    print(f"Orchestrator decision: {route}")
+    await graph.result("store")
+
+    if route not in RAG_ROUTES:
+        graph.cancel("history")
+        return route, NO_HISTORY
+    return route, pack_history(route, *await graph.result("history"))
+
+def pack_history(route: str, results: list, vectors: list) -> str:
+    """
+    Packs retrieved entries into the route's token budget, dropping
+    near-duplicates (MMR over the entry vectors), and records the tokens saved.
+    """
+    packed, report = pack_context(
+        results,
+        vectors,
+        token_budget=CONTEXT_TOKEN_BUDGETS.get(route, 1000),
+        mmr_lambda=CONTEXT_MMR_LAMBDA,
+        duplicate_threshold=CONTEXT_DUPLICATE_THRESHOLD
+    )
+    print(f"Context packing for {route}: {report}")
+    counters = context_packing_counters.setdefault(route, {"calls": 0, "tokens_in": 0, "tokens_out": 0, "duplicates": 0})
+    counters["calls"] += 1
+    counters["tokens_in"] += report["tokens_in"]
+    counters["tokens_out"] += report["tokens_out"]
+    counters["duplicates"] += report["duplicates"]
+    if not packed:
+        return NO_HISTORY
+    # Long entries contribute only their best-matching passage
+    return "\n---\n".join(result['passage'] for result in packed)
+
 # --- RAG FUNCTION ---
-async def get_relevant_entries_from_db(journal_id: int, query_text: str) -> List[str]:
+async def get_relevant_entries_from_db(journal_id: int, query_text: str, query_vector: List[float] | None = None) -> tuple[list, list]:
     """
     Performs a server-side RAG query using the RAGRetrievalService.
     Wraps the synchronous search_similar_entries in an async executor
-    to prevent blocking the server.
+    to prevent blocking the server. Pass the entry's embedding as
+    query_vector to skip embedding the same text a second time.
+    Returns the results and their passage vectors (for pack_history).
     """
-    try:
-        results = await asyncio.to_thread(
-            retrieval_service.search_similar_entries,
+    def search():
+        results = retrieval_service.search_similar_entries(
             query=query_text,
             journal_id=journal_id,
             top_k=10, 		
-            min_similarity=0.3 
+            min_similarity=0.3,
+            query_vector=query_vector
         )
-        return [result['content'] for result in results]
+        return results, retrieval_service.get_result_vectors(results, journal_id)
+
+    try:
+        return await asyncio.to_thread(search)
     
     except Exception as e:
         print(f"RAG search failed: {e}")
-        return []
+        return [], []
+
+async def send_overloaded(websocket: WebSocket, error: OverloadedError, saved: bool = False) -> None:
+    """Tells the client a request was shed, and whether the entry itself was saved."""
+    await websocket.send_json({
+        "type": "ERROR",
+        "code": "OVERLOADED",
+        "upstream": error.upstream,
+        "retry_after": error.retry_after,
+        "saved": saved,
+        "detail": str(error),
+    })
+
+async def send_audio(websocket: WebSocket, audio_mode: str, message_type: str, seq: int, audio_bytes: bytes) -> None:
+    """Sends audio as a binary frame, or as base64 in JSON for clients that didn't opt in."""
+    if audio_mode == "binary":
+        await websocket.send_bytes(pack_frame(message_type, seq, audio_bytes))
+    else:
+        audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
+        await websocket.send_json({"type": message_type, "seq": seq, "payload": audio_base64})
 
 # --- WEBSOCKET ENDPOINT 	---
 @app.websocket("/ws/{user_id}")
 async def websocket_endpoint(websocket: WebSocket, user_id: str):
     await websocket.accept()
+    # Clients opt into binary audio frames with ?audio=binary (see ws_protocol)
+    audio_mode = websocket.query_params.get("audio", "json")
+    if audio_mode not in AUDIO_MODES:
+        audio_mode = "json"
     
     try:
         journal_id = await get_or_create_default_journal(user_id)
@@ -305,6 +714,9 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str):
         await websocket.close(code=1011)
         return
 
+    if audio_mode == "binary":
+        await websocket.send_json({"type": "PROTOCOL", "audio": "binary"})
+
     try:
         while True:
             data_json = await websocket.receive_json()
@@ -313,47 +725,37 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str):
                 payload = data_json["payload"]
                 raw_text = payload["raw_text"]
 
-                print("Task 1: Generating vector...")
-                embeddings = embedding_model.get_embeddings([raw_text])
-                vector = embeddings[0].values
-
-                print("Task 2: Storing in journal_pages via API...")
-                page_payload = {
-                    "journal_id": journal_id,
-                    "content": raw_text,
-                    "encoding": "utf-8",
-                    "entry_type": "text",
-                    "text_vector": vector 
-                }
-                try:
-                    # Fire-and-forget save
-                    asyncio.create_task(
-                        api_client.post(f"/journals/{journal_id}/pages", json=page_payload)
-                    )
-                except httpx.HTTPStatusError as e:
-                    print(f"Warning: Failed to save journal page to Azure: {e}")
-                
-                print("Task 3: Calling Orchestrator...")
-                orchestrator_prompt = f"{PROMPT_ORCHESTRATOR}\n<new_entry>{raw_text}</new_entry>"
-                orchestrator_response = await gemini_flash.generate_content_async([orchestrator_prompt])
+                # Embed/store, orchestrator and RAG prefetch run concurrently
+                pipeline = start_entry_pipeline(user_id, journal_id, raw_text, "text")
                 try:
-                    decision = json.loads(orchestrator_response.text)
-                    route = decision.get("route", "NONE")
-                except Exception:
-                    route = "NONE"
-                print(f"Orchestrator decision: {route}")
+                    route, history = await resolve_entry_route(pipeline)
+                except OverloadedError as e:
+                    # Shed before the entry was queued for storage; the client can resend it
+                    print(f"Entry from {user_id} shed: {e}")
+                    await send_overloaded(websocket, e)
+                    continue
+                except Exception as e:
+                    # Embedding or the outbox write failed (e.g. OutboxFullError); keep the socket open
+                    try:
+                        await pipeline.result("store")
+                        saved = True
+                    except Exception:
+                        saved = False
+                    print(f"Entry from {user_id} failed (saved={saved}): {type(e).__name__}: {e}")
+                    await websocket.send_json({
+                        "type": "ERROR",
+                        "code": "ENTRY_FAILED",
+                        "saved": saved,
+                        "detail": "Your entry could not be saved, please try again." if not saved
+                        else "Your entry was saved, but the assistant could not process it.",
+                    })
+                    continue
 
                 if route == "NONE":
+                    print(pipeline.report())
                     await websocket.send_json({"type": "ACK", "status": "saved_and_processed"})
                     continue 
 
-                print("Task 4: Running RAG (calling Azure API)...")
-                history = "No relevant history found."
-                if route in ["Analyst", "Strategist", "Archivist", "Guide"]:
-                    plaintext_context = await get_relevant_entries_from_db(journal_id, raw_text) 
-                    if plaintext_context:
-                        history = "\n---\n".join(plaintext_context)
-                
                 print(f"Task 5: Calling Specialist Agent: {route}")
                 specialist_prompt_template = AGENT_PROMPTS.get(route)
                 full_prompt = f"""
@@ -363,22 +765,74 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str):
                 Provide your agentic response:
                 """
                 
+                async def synthesize(sentence: str):
+                    try:
+                        async with admission["tts"].admit(user_id):
+                            return await upstream["tts"].run(generate_tts_bytes, sentence)
+                    except OverloadedError as e:
+                        print(f"TTS shed: {e}")
+                        return None
+
+                async def send_audio_chunk(seq: int, sentence: str, audio_bytes: bytes | None):
+                    if not audio_bytes:
+                        print(f"TTS generation failed for sentence {seq}.")
+                        return
+                    if seq == 0:
+                        pipeline.mark("first_audio")
+                    await send_audio(websocket, audio_mode, "AUDIO_CHUNK", seq, audio_bytes)
+
+                # Task 7 (TTS) runs alongside the stream, one sentence at a time
+                audio_stream = SentenceAudioStream(
+                    synthesize,
+                    send_audio_chunk,
+                    min_chars=TTS_MIN_SENTENCE_CHARS,
+                    max_concurrency=max(1, min(TTS_SENTENCE_CONCURRENCY, ADMISSION_PER_USER - 1))
+                )
+
+                async def send_tokens(text: str):
+                    if not token_batcher.frames:
+                        pipeline.mark("first_token")
+                    await websocket.send_json({"type": "TOKEN", "payload": text})
+
+                token_batcher = TokenCoalescer(send_tokens, flush_ms=TOKEN_FLUSH_MS, flush_chars=TOKEN_FLUSH_CHARS)
+
                 print("Task 6: Streaming response...")
-                stream = await gemini_flash.generate_content_async([full_prompt], stream=True)
-                full_text_response = ""
-                async for chunk in stream:
-                    token = chunk.text
-                    full_text_response += token
-                    await websocket.send_json({"type": "TOKEN", "payload": token})
-                
-                print("Task 7: Generating TTS...")
-                audio_bytes = generate_tts_bytes(full_text_response)
-                
-                if audio_bytes:
-                    audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
-                    await websocket.send_json({"type": "AUDIO", "payload": audio_base64})
-                else:
-                    print("TTS generation failed.")
+                try:
+                    # The Gemini slot is held while tokens stream, not while the last sentences are spoken
+                    async with admission["gemini"].admit(user_id):
+                        stream = await gemini.stream(
+                            [full_prompt], name="specialist_stream", idle_timeout=GEMINI_STREAM_IDLE_TIMEOUT
+                        )
+                        async for chunk in stream:
+                            token = chunk.text
+                            await token_batcher.add(token)
+                            audio_stream.feed(token)
+                    full_text_response = await token_batcher.close()
+
+                    print("Task 7: Finishing TTS...")
+                    chunk_count = await audio_stream.finish()
+                except OverloadedError as e:
+                    token_batcher.cancel()
+                    audio_stream.cancel()
+                    print(f"Specialist call shed: {e}")
+                    await send_overloaded(websocket, e, saved=True)
+                    continue
+                except LLMCallError as e:
+                    # Failed or stalled mid-stream; keep the connection open for the next entry
+                    token_batcher.cancel()
+                    audio_stream.cancel()
+                    print(f"Specialist stream failed: {e}")
+                    await websocket.send_json({"type": "ERROR", "detail": "The assistant is not responding right now. Your entry was saved."})
+                    continue
+                except BaseException:
+                    token_batcher.cancel()
+                    audio_stream.cancel()
+                    raise
+                await websocket.send_json({"type": "AUDIO_END", "chunks": chunk_count})
+                token_stream_counters["replies"] += 1
+                token_stream_counters["frames"] += token_batcher.frames
+                token_stream_counters["tokens"] += token_batcher.tokens
+                print(f"{pipeline.report()} token_frames={token_batcher.frames}/{token_batcher.tokens} chars={len(full_text_response)}")
 
     except WebSocketDisconnect:
         print(f"Client {user_id} disconnected.")
@@ -398,30 +852,95 @@ async def run_longitudinal_analysis(user_id: str, request: Request):
         return {"status": "error", "detail": f"Could not find user/journal: {e}"}
 
     print(f"Task 1: Starting longitudinal analysis for user {user_id} (journal_id {journal_id})...")
-    
+    return await analyze_journal(journal_id)
+
+@app.post("/run-longitudinal-analysis")
+async def run_longitudinal_analysis_batch(batch: AnalysisBatchRequest, request: Request):
+    """
+    Starts a background job analysing many users, ANALYSIS_BATCH_CONCURRENCY
+    at a time. Poll /run-longitudinal-analysis/jobs/{job_id} for progress.
+    """
+    token = request.headers.get("X-Scheduler-Token")
+    if token != SCHEDULER_TOKEN:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    job_id = await analysis_runner.submit(batch.user_ids)
+    print(f"Started analysis job {job_id} for {len(batch.user_ids)} users.")
+    return {"status": "accepted", "job_id": job_id}
+
+@app.get("/run-longitudinal-analysis/jobs/{job_id}")
+async def get_longitudinal_analysis_job(job_id: str, request: Request):
+    token = request.headers.get("X-Scheduler-Token")
+    if token != SCHEDULER_TOKEN:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    status = analysis_runner.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return status
+
+async def analyze_user(user_id: str) -> dict:
+    """Resolves a user's journal and runs analyze_journal on it (used by batch jobs)."""
+    try:
+        journal_id = await get_or_create_default_journal(user_id)
+    except Exception as e:
+        return {"status": "error", "detail": f"Could not find user/journal: {e}"}
+    return await analyze_journal(journal_id)
+
+async def generate_text(prompt: str) -> str:
+    """One non-streaming Gemini call, paced by analysis_rate_limiter."""
+    await analysis_rate_limiter.acquire()
+    response = await gemini.generate([prompt], name="analysis")
+    return response.text
+
+async def get_last_insight_time(journal_id: int) -> datetime | None:
+    """
+    Returns when the journal's latest insight was saved, or None if it has
+    none. If insights can't be listed, falls back to one week ago.
+    """
+    try:
+        response = await api_client.get(f"/journals/{journal_id}/insights")
+        response.raise_for_status()
+        insights = response.json()
+    except httpx.HTTPError as e:
+        print(f"Warning: Could not list insights, analyzing the past week: {e}")
+        return datetime.now(timezone.utc) - timedelta(days=7)
+
+    stamps = [parse_timestamp(insight["created_at"]) for insight in insights if insight.get("created_at")]
+    return max(stamps) if stamps else None
+
+async def analyze_journal(journal_id: int) -> dict:
+    """
+    Generates and saves one longitudinal insight from the pages written
+    since the journal's last insight. Older weeks in that window, and up
+    to ANALYSIS_CONTEXT_WEEKS weeks before it, are sent as cached weekly
+    summaries, and the history is kept under ANALYSIS_TOKEN_BUDGET by
+    map-reduce summarization.
+    """
     try:
         response = await api_client.get(f"/journals/{journal_id}/pages")
         response.raise_for_status()
         pages = response.json()
-        entries = [page['content'] for page in pages]
     except httpx.HTTPStatusError as e:
         return {"status": "error", "detail": f"Failed to fetch history: {e}"}
 
-    if not entries:
+    last_insight_at = await get_last_insight_time(journal_id)
+    if not any(last_insight_at is None or parse_timestamp(page["created_at"]) > last_insight_at for page in pages):
         return {"status": "success", "detail": "No new entries"}
 
-    full_transcript = "\n---\n".join(entries)
+    # Earlier weeks come from the summary cache, so only new weeks cost summary calls
+    history, report = await longitudinal_summarizer.build_history(journal_id, pages, since=last_insight_at)
+    print(f"Analysis history for journal {journal_id}: {report}")
 
     print("Task 2: Calling Analyst agent...")
-    analysis_request = "Please analyze my entries from the past week and provide one single, profound insight..."
+    analysis_request = "Please analyze my entries since your last insight and provide one single, profound insight..."
     full_prompt = f"""
     <system_instructions>{PROMPT_ANALYST}</system_instructions>
-    <history>{full_transcript}</history>
+    <history>{history}</history>
     <new_entry>{analysis_request}</new_entry>
     Provide your agentic response:
     """
-    response = await gemini_flash.generate_content_async([full_prompt])
-    insight_text = response.text
+    insight_text = await generate_text(full_prompt)
 
     print("Task 3: Saving new insight to database via API...")
     insight_payload: InsightCreate = {
@@ -435,11 +954,109 @@ async def run_longitudinal_analysis(user_id: str, request: Request):
     except httpx.HTTPStatusError as e:
         return {"status": "error", "detail": f"Failed to save insight: {e}"}
     
-    return {"status": "success", "insight_generated": insight_text[:50] + "..."}
+    return {"status": "success", "insight_generated": insight_text[:50] + "...", "history": report}
+
+# --- PAGE OUTBOX ENDPOINTS ---
+@app.get("/v1/outbox/dead")
+async def list_dead_pages(request: Request, limit: int = 100):
+    """Pages the API rejected, newest first (ids and errors only, no content)."""
+    token = request.headers.get("X-Scheduler-Token")
+    if token != SCHEDULER_TOKEN:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    return {"pages": await page_outbox.dead_pages(limit)}
+
+@app.post("/v1/outbox/replay")
+async def replay_dead_pages(replay: OutboxReplayRequest, request: Request):
+    """Re-queues rejected pages for delivery, e.g. after the API was fixed. No ids replays all of them."""
+    token = request.headers.get("X-Scheduler-Token")
+    if token != SCHEDULER_TOKEN:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    replayed = await page_outbox.replay_dead(replay.ids)
+    return {"status": "accepted", "replayed": replayed}
+
+# --- METRICS ENDPOINT ---
+@app.get("/v1/metrics")
+async def get_metrics(request: Request):
+    token = request.headers.get("X-Scheduler-Token")
+    if token != SCHEDULER_TOKEN:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    return {
+        "embedding_gateway": embedding_gateway.stats() if embedding_gateway else {},
+        "upstream_pools": {name: executor.stats() for name, executor in upstream.items()},
+        "tts_cache": tts_cache.stats(),
+        "journal_directory": journal_directory.stats() if journal_directory else {},
+        "route_classifier": {"mode": ROUTE_CLASSIFIER_MODE, **route_classifier.stats()},
+        "page_outbox": await page_outbox.stats() if page_outbox else {},
+        "longitudinal": longitudinal_summarizer.stats() if longitudinal_summarizer else {},
+        "analysis_rate_limiter": analysis_rate_limiter.stats(),
+        "gemini": gemini.stats() if gemini else {},
+        "admission": {name: controller.stats() for name, controller in admission.items()},
+        "context_packing": {
+            route: {**counters, "tokens_saved": counters["tokens_in"] - counters["tokens_out"]}
+            for route, counters in context_packing_counters.items()
+        },
+        "token_stream": {
+            **token_stream_counters,
+            "frames_per_reply": token_stream_counters["frames"] / token_stream_counters["replies"] if token_stream_counters["replies"] else 0.0,
+            "tokens_per_frame": token_stream_counters["tokens"] / token_stream_counters["frames"] if token_stream_counters["frames"] else 0.0,
+        },
+    }
 
 # --- JOURNAL BROWSER ENDPOINT ---
-@app.get("/v1/journal/{user_id}", response_model=JournalResponse)
-async def get_journal_entries(user_id: str):
+async def load_journal_listing(journal_id: int, revalidate: bool = True) -> JournalListing:
+    """
+    Returns the journal's sorted page listing. A cached listing is
+    revalidated with If-None-Match, so an unchanged journal costs a 304
+    instead of a full download and re-sort. With revalidate=False (paging
+    on with a cursor) a listing younger than JOURNAL_LISTING_TTL is reused
+    without asking the API at all.
+    """
+    listing = journal_listings.get(journal_id)
+    if listing and not revalidate and time.monotonic() - listing.fetched_at < JOURNAL_LISTING_TTL:
+        journal_listings.move_to_end(journal_id)
+        return listing
+    headers = {"If-None-Match": listing.etag} if listing and listing.etag else None
+    response = await api_client.get(f"/journals/{journal_id}/pages", headers=headers)
+    if response.status_code == 304 and listing:
+        listing.fetched_at = time.monotonic()
+        journal_listings.move_to_end(journal_id)
+        return listing
+    response.raise_for_status()
+
+    listing = JournalListing(response.json(), etag=response.headers.get("ETag"))
+    journal_listings[journal_id] = listing
+    journal_listings.move_to_end(journal_id)
+    while len(journal_listings) > JOURNAL_LISTING_CACHE_SIZE:
+        journal_listings.popitem(last=False)
+    return listing
+
+@app.get("/v1/journal/{user_id}", response_model=JournalResponse, response_model_exclude_unset=True)
+async def get_journal_entries(
+    user_id: str,
+    request: Request,
+    limit: int | None = None,
+    cursor: str | None = None,
+    fields: str | None = None
+):
+    """
+    Returns the journal newest first, `limit` entries at a time; pass
+    next_cursor back as `cursor` for the next page. Without `limit` or
+    `cursor` the whole journal is returned, as before pagination (a cursor
+    alone pages by JOURNAL_PAGE_SIZE). Entries carry id,
+    created_at and content unless `fields` asks otherwise (e.g.
+    fields=content,text_vector). Responses have an ETag and honour
+    If-None-Match.
+    """
+    paginated = limit is not None or cursor is not None
+    limit = max(1, min(limit or JOURNAL_PAGE_SIZE, JOURNAL_PAGE_MAX))
+    try:
+        selected_fields = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     try:
         journal_id = await get_or_create_default_journal(user_id)
     except Exception:
@@ -448,15 +1065,32 @@ async def get_journal_entries(user_id: str):
     print(f"Fetching journal history for user {user_id} (journal_id {journal_id})...")
     
     try:
-        response = await api_client.get(f"/journals/{journal_id}/pages")
-        response.raise_for_status()
-        pages = response.json()
-        
-        sorted_pages = sorted(pages, key=lambda x: x['created_at'], reverse=True)
-        entries = [JournalEntry(**row) for row in sorted_pages]
-        return JournalResponse(entries=entries)
+        # The first page always revalidates; following a cursor reuses the listing it came from
+        listing = await load_journal_listing(journal_id, revalidate=cursor is None)
     except httpx.HTTPStatusError as e:
         return JournalResponse(entries=[])
 
+    if not paginated:
+        limit = max(1, len(listing.pages))
+    etag_source = f"{listing.version}|{limit if paginated else 'all'}|{cursor or ''}|{','.join(selected_fields)}"
+    etag = f'W/"{hashlib.sha256(etag_source.encode("utf-8")).hexdigest()[:32]}"'
+    cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("If-None-Match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=cache_headers)
+
+    try:
+        rows, next_cursor = listing.page(cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    entries = [JournalEntry(**project(row, selected_fields)) for row in rows]
+    body = JournalResponse(entries=entries, next_cursor=next_cursor)
+    return Response(
+        content=body.model_dump_json(exclude_unset=True),
+        media_type="application/json",
+        headers=cache_headers
+    )
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", 8080)))
\ No newline at end of file
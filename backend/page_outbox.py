@@ -0,0 +1,353 @@
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, List
+
+import httpx
+
+from at_rest import AtRestCipher, InvalidToken
+
+
+class OutboxFullError(Exception):
+    """Raised when the outbox stays full for longer than the enqueue timeout."""
+
+
+class PageOutbox:
+    """
+    Durable write-behind queue for journal page saves.
+    enqueue() commits the page to a local SQLite write-ahead log and returns,
+    so the entry is acknowledged without waiting on the Azure API. A
+    background flusher delivers pages in order per journal (journals in
+    parallel), retries failures with jittered exponential backoff, and parks
+    pages the API rejects outright as "dead". When too many pages are
+    pending, enqueue() waits for the flusher (backpressure).
+    Several processes may share one outbox file: a worker leases the
+    journal heads it delivers for `lease_seconds` (expired leases are
+    reclaimed), so a page is never posted by two workers at once. Keep
+    the lease longer than a delivery can take.
+    Payloads (entry text and vectors) are encrypted with `cipher`. Dead
+    pages are kept for `dead_retention` seconds (at most `max_dead` of
+    them) so they can be inspected with dead_pages() and re-queued with
+    replay_dead().
+    """
+
+    def __init__(
+        self,
+        path: str,
+        deliver: Callable[[int, dict, List[float] | None], Awaitable[None]],
+        batch_size: int = 16,
+        max_pending: int = 1000,
+        enqueue_timeout: float = 10.0,
+        base_backoff: float = 0.5,
+        max_backoff: float = 60.0,
+        poll_interval: float = 1.0,
+        lease_seconds: float = 60.0,
+        cipher: AtRestCipher | None = None,
+        dead_retention: float = 7 * 24 * 3600,
+        max_dead: int = 1000,
+    ):
+        self.path = path
+        self.deliver = deliver
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.enqueue_timeout = enqueue_timeout
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.cipher = cipher
+        self.dead_retention = dead_retention
+        self.max_dead = max_dead
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                journal_id INTEGER NOT NULL,
+                payload TEXT NOT NULL,
+                vector TEXT,
+                enqueued_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                last_error TEXT,
+                owner TEXT,
+                lease_until REAL,
+                sealed INTEGER NOT NULL DEFAULT 0,
+                dead_at REAL
+            )
+        """)
+        # Outbox files created before leases, encryption or dead-page retention were added
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(outbox)")}
+        for column, kind in (
+            ("owner", "TEXT"), ("lease_until", "REAL"), ("sealed", "INTEGER NOT NULL DEFAULT 0"), ("dead_at", "REAL")
+        ):
+            if column not in columns:
+                self._db.execute(f"ALTER TABLE outbox ADD COLUMN {column} {kind}")
+        self._db.execute("CREATE INDEX IF NOT EXISTS outbox_pending ON outbox (status, journal_id, id)")
+        self._db_lock = threading.Lock()
+        self._pending = self._query("SELECT COUNT(*) FROM outbox WHERE status = 'pending'")[0][0]
+        self._wakeup: asyncio.Event | None = None
+        self._space: asyncio.Condition | None = None
+        self._flusher: asyncio.Task | None = None
+        self._purged_at = 0.0
+        self._counters = {
+            "enqueued": 0, "delivered": 0, "failures": 0, "dead": 0, "replayed": 0, "purged": 0,
+            "total_lag_ms": 0.0, "max_lag_ms": 0.0,
+        }
+
+    def start(self) -> None:
+        """Starts the background flusher; pages left over from a previous run are delivered first."""
+        if self._flusher is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Condition()
+        self._flusher = asyncio.create_task(self._run())
+        if self._pending:
+            print(f"Page outbox: resuming {self._pending} undelivered pages.")
+
+    async def stop(self, drain_timeout: float = 5.0) -> None:
+        """Gives the flusher a moment to drain, then stops it. Undelivered pages stay on disk."""
+        if self._flusher is None:
+            return
+        deadline = time.monotonic() + drain_timeout
+        while self._pending and time.monotonic() < deadline and self._has_due_pages():
+            self._wakeup.set()
+            await asyncio.sleep(0.05)
+        self._flusher.cancel()
+        try:
+            await self._flusher
+        except asyncio.CancelledError:
+            pass
+        self._flusher = None
+        with self._db_lock:
+            # Hand our leases back so another worker (or our restart) can deliver right away
+            self._db.execute("UPDATE outbox SET owner = NULL, lease_until = NULL WHERE owner = ?", (self.owner,))
+            self._db.close()
+
+    async def enqueue(self, journal_id: int, page_payload: dict, vector: List[float] | None = None) -> int:
+        """Durably queues a page for delivery and returns its outbox id."""
+        if self._flusher is None:
+            self.start()
+        if self._pending >= self.max_pending:
+            async with self._space:
+                try:
+                    await asyncio.wait_for(
+                        self._space.wait_for(lambda: self._pending < self.max_pending), self.enqueue_timeout
+                    )
+                except asyncio.TimeoutError:
+                    raise OutboxFullError(f"Page outbox is full ({self._pending} pages pending)")
+
+        now = time.time()
+        self._pending += 1
+        try:
+            row_id = await asyncio.to_thread(
+                self._execute,
+                "INSERT INTO outbox (journal_id, payload, vector, enqueued_at, next_attempt_at, sealed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    journal_id,
+                    self._seal(json.dumps(page_payload)),
+                    self._seal(json.dumps(vector)) if vector is not None else None,
+                    now,
+                    now,
+                    int(self.cipher is not None),
+                ),
+            )
+        except Exception:
+            self._pending -= 1
+            raise
+        self._counters["enqueued"] += 1
+        self._wakeup.set()
+        return row_id
+
+    async def stats(self) -> dict:
+        """Queue depth, delivery lag and failure counters."""
+        counters = dict(self._counters)
+        delivered = counters["delivered"]
+        (pending, oldest, dead), = await asyncio.to_thread(
+            self._query,
+            "SELECT COUNT(*) FILTER (WHERE status = 'pending'), MIN(enqueued_at) FILTER (WHERE status = 'pending'), "
+            "COUNT(*) FILTER (WHERE status = 'dead') FROM outbox",
+        )
+        counters["pending"] = pending
+        counters["dead_parked"] = dead
+        counters["mean_lag_ms"] = counters.pop("total_lag_ms") / delivered if delivered else 0.0
+        counters["oldest_pending_age_s"] = time.time() - oldest if oldest else 0.0
+        return counters
+
+    async def dead_pages(self, limit: int = 100) -> list:
+        """Parked pages, newest first, without their content."""
+        rows = await asyncio.to_thread(
+            self._query,
+            "SELECT id, journal_id, attempts, last_error, enqueued_at, dead_at FROM outbox "
+            "WHERE status = 'dead' ORDER BY id DESC LIMIT ?",
+            (limit,),
+        )
+        columns = ("id", "journal_id", "attempts", "last_error", "enqueued_at", "dead_at")
+        return [dict(zip(columns, row)) for row in rows]
+
+    async def replay_dead(self, ids: List[int] | None = None) -> int:
+        """Re-queues parked pages (all of them, or just `ids`) for delivery; returns how many."""
+        sql = (
+            "UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = ?, last_error = NULL, "
+            "dead_at = NULL WHERE status = 'dead'"
+        )
+        params: tuple = (time.time(),)
+        if ids is not None:
+            if not ids:
+                return 0
+            sql += f" AND id IN ({', '.join('?' * len(ids))})"
+            params += tuple(ids)
+        replayed = await asyncio.to_thread(self._update, sql, params)
+        if replayed:
+            self._pending += replayed
+            self._counters["replayed"] += replayed
+            print(f"Page outbox: re-queued {replayed} dead pages.")
+            if self._wakeup is not None:
+                self._wakeup.set()
+        return replayed
+
+    async def _run(self) -> None:
+        while True:
+            heads = await asyncio.to_thread(self._claim_heads)
+            if not heads:
+                if time.monotonic() - self._purged_at > 60:
+                    self._purged_at = time.monotonic()
+                    await asyncio.to_thread(self._purge_dead)
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), await asyncio.to_thread(self._idle_timeout))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await asyncio.gather(*(self._deliver_row(row) for row in heads))
+
+    # Oldest pending page of each journal, if it is due and not leased: keeps per-journal order
+    _DUE_HEADS = """
+        SELECT id, journal_id, payload, vector, enqueued_at, attempts, sealed FROM outbox
+        WHERE id IN (SELECT MIN(id) FROM outbox WHERE status = 'pending' GROUP BY journal_id)
+        AND next_attempt_at <= ? AND (lease_until IS NULL OR lease_until < ?) ORDER BY id LIMIT ?
+    """
+
+    def _claim_heads(self) -> list:
+        # Select and lease in one write transaction, so two workers never claim the same head
+        now = time.time()
+        with self._db_lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._db.execute(self._DUE_HEADS, (now, now, self.batch_size)).fetchall()
+                self._db.executemany(
+                    "UPDATE outbox SET owner = ?, lease_until = ? WHERE id = ?",
+                    [(self.owner, now + self.lease_seconds, row[0]) for row in rows],
+                )
+                # Other workers deliver pages too; resync the backpressure count
+                self._pending = self._db.execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()[0]
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return rows
+
+    def _idle_timeout(self) -> float:
+        # Sleep until the next retry is due, polling at least every poll_interval
+        next_attempt = self._query(
+            "SELECT MIN(MAX(next_attempt_at, COALESCE(lease_until, 0))) FROM outbox WHERE status = 'pending'"
+        )[0][0]
+        if next_attempt is None:
+            return self.poll_interval
+        return min(self.poll_interval, max(0.01, next_attempt - time.time()))
+
+    def _has_due_pages(self) -> bool:
+        now = time.time()
+        return bool(self._query(self._DUE_HEADS, (now, now, 1)))
+
+    async def _deliver_row(self, row: tuple) -> None:
+        row_id, journal_id, payload, vector, enqueued_at, attempts, sealed = row
+        try:
+            if sealed:
+                payload = self._open(payload)
+                vector = self._open(vector) if vector else None
+            await self.deliver(journal_id, json.loads(payload), json.loads(vector) if vector else None)
+        except Exception as e:
+            self._counters["failures"] += 1
+            if self._is_permanent(e):
+                self._counters["dead"] += 1
+                print(f"Page outbox: page {row_id} rejected, parking it: {e}")
+                await asyncio.to_thread(
+                    self._execute,
+                    "UPDATE outbox SET status = 'dead', attempts = ?, last_error = ?, dead_at = ?, owner = NULL, "
+                    "lease_until = NULL WHERE id = ? AND owner = ?",
+                    (attempts + 1, str(e), time.time(), row_id, self.owner),
+                )
+                await self._release()
+                return
+            delay = min(self.max_backoff, self.base_backoff * 2 ** attempts) * random.uniform(0.5, 1.5)
+            print(f"Page outbox: delivery of page {row_id} failed (attempt {attempts + 1}), retrying in {delay:.1f}s: {e}")
+            await asyncio.to_thread(
+                self._execute,
+                "UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ?, owner = NULL, lease_until = NULL "
+                "WHERE id = ? AND owner = ?",
+                (attempts + 1, time.time() + delay, str(e), row_id, self.owner),
+            )
+            return
+
+        await asyncio.to_thread(self._execute, "DELETE FROM outbox WHERE id = ? AND owner = ?", (row_id, self.owner))
+        lag_ms = (time.time() - enqueued_at) * 1000
+        self._counters["delivered"] += 1
+        self._counters["total_lag_ms"] += lag_ms
+        self._counters["max_lag_ms"] = max(self._counters["max_lag_ms"], lag_ms)
+        await self._release()
+
+    async def _release(self) -> None:
+        self._pending = max(0, self._pending - 1)
+        async with self._space:
+            self._space.notify_all()
+
+    def _purge_dead(self) -> None:
+        # Dead pages past their retention, and the oldest beyond max_dead, are dropped for good
+        purged = self._update(
+            "DELETE FROM outbox WHERE status = 'dead' AND (dead_at < ? OR id IN "
+            "(SELECT id FROM outbox WHERE status = 'dead' ORDER BY id DESC LIMIT -1 OFFSET ?))",
+            (time.time() - self.dead_retention, self.max_dead),
+        )
+        if purged:
+            self._counters["purged"] += purged
+            print(f"Page outbox: purged {purged} dead pages.")
+
+    def _seal(self, text: str) -> str:
+        if self.cipher is None:
+            return text
+        return self.cipher.encrypt(text.encode("utf-8")).decode("ascii")
+
+    def _open(self, token: str) -> str:
+        if self.cipher is None:
+            raise ValueError("Outbox page is encrypted but no cipher is configured")
+        return self.cipher.decrypt(token.encode("ascii")).decode("utf-8")
+
+    @staticmethod
+    def _is_permanent(error: Exception) -> bool:
+        # 4xx (other than timeouts and throttling) won't succeed on retry
+        if isinstance(error, httpx.HTTPStatusError):
+            status = error.response.status_code
+            return 400 <= status < 500 and status not in (408, 429)
+        # InvalidToken: sealed with a key that is no longer configured; replay once it is back
+        return isinstance(error, (ValueError, TypeError, InvalidToken))
+
+    def _execute(self, sql: str, params: tuple = ()) -> int:
+        with self._db_lock:
+            return self._db.execute(sql, params).lastrowid
+
+    def _update(self, sql: str, params: tuple = ()) -> int:
+        with self._db_lock:
+            return self._db.execute(sql, params).rowcount
+
+    def _query(self, sql: str, params: tuple = ()) -> list:
+        with self._db_lock:
+            return self._db.execute(sql, params).fetchall()
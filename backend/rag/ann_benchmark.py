@@ -0,0 +1,54 @@
+"""
+ANN Recall Benchmark
+
+Compares IVFIndex against exact brute-force search on synthetic clustered
+embeddings and prints recall@k and latency for a range of n_probe values,
+so safe defaults can be picked for RAGRetrievalService.
+
+Usage example:
+    python -m rag.ann_benchmark --pages 50000 --dimension 768 --n-probe 1 4 8 16 32
+"""
+
+import argparse
+import numpy as np
+
+from rag.ann_index import IVFIndex, evaluate_recall
+
+
+def make_embeddings(count: int, dimension: int, topics: int, noise: float, seed: int) -> np.ndarray:
+    """Generate clustered vectors that roughly mimic journal embeddings."""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(topics, dimension)).astype(np.float32)
+    labels = rng.integers(0, topics, size=count)
+    noise = rng.normal(scale=noise, size=(count, dimension)).astype(np.float32)
+    return centres[labels] + noise
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=20000, help="Number of indexed vectors")
+    parser.add_argument("--dimension", type=int, default=768, help="Embedding dimension")
+    parser.add_argument("--topics", type=int, default=200, help="Number of synthetic clusters")
+    parser.add_argument("--noise", type=float, default=1.5, help="Spread of vectors around their cluster")
+    parser.add_argument("--queries", type=int, default=200, help="Number of benchmark queries")
+    parser.add_argument("--top-k", type=int, default=10, help="Neighbours compared per query")
+    parser.add_argument("--n-lists", type=int, default=None, help="IVF lists (default: sqrt(pages))")
+    parser.add_argument("--n-probe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    vectors = make_embeddings(args.pages + args.queries, args.dimension, args.topics, args.noise, args.seed)
+    corpus, queries = vectors[:args.pages], vectors[args.pages:]
+
+    index = IVFIndex(n_lists=args.n_lists, min_train_size=0, seed=args.seed)
+    index.add(corpus, list(range(args.pages)))
+    index.train()
+
+    print(f"{'n_probe':>8} {'recall@' + str(args.top_k):>10} {'ann_ms':>8} {'exact_ms':>9}")
+    for n_probe in args.n_probe:
+        stats = evaluate_recall(index, queries, top_k=args.top_k, n_probe=n_probe)
+        print(f"{n_probe:>8} {stats['recall']:>10.3f} {stats['ann_ms']:>8.2f} {stats['exact_ms']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
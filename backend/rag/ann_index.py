@@ -0,0 +1,314 @@
+"""
+Approximate Nearest-Neighbour Index Module
+
+This module provides an inverted-file (IVF) index over normalized page
+encodings, used by RAGRetrievalService for cross-journal search. Vectors are
+clustered with spherical k-means; a query only scores the pages in the
+`n_probe` clusters whose centroids are closest to it.
+
+Recall/latency knobs:
+    n_lists: Number of clusters (default: sqrt of the number of vectors)
+    n_probe: Clusters scanned per query; higher is slower but more accurate
+    min_train_size: Below this many vectors the index stays exact (one list)
+
+Usage example:
+    from rag.ann_index import IVFIndex
+
+    index = IVFIndex(n_probe=8)
+    index.add(vectors, payloads)
+    for payload, score in index.search(query_vector, top_k=5):
+        print(payload, score)
+"""
+
+import threading
+import time
+import numpy as np
+from typing import List, Dict, Any, Optional, Tuple
+import logging
+
+from rag.vector_index import JournalVectorIndex
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class IVFIndex:
+    """Inverted-file approximate nearest-neighbour index (pure NumPy)."""
+
+    def __init__(
+        self,
+        n_lists: Optional[int] = None,
+        n_probe: int = 8,
+        min_train_size: int = 1024,
+        retrain_growth: float = 4.0,
+        kmeans_iterations: int = 10,
+        max_train_samples: int = 65536,
+        seed: int = 0
+    ):
+        """
+        Initialize an empty index.
+
+        Args:
+            n_lists: Number of clusters (default: None, sqrt of the index size at training time)
+            n_probe: Number of clusters scanned per query (default: 8)
+            min_train_size: Vectors needed before clustering; smaller indexes are searched exactly (default: 1024)
+            retrain_growth: Re-cluster once the index grows by this factor since the last training (default: 4.0)
+            kmeans_iterations: Number of k-means iterations per training (default: 10)
+            max_train_samples: Maximum number of vectors sampled for k-means (default: 65536)
+            seed: Random seed for sampling and centroid initialization (default: 0)
+        """
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.min_train_size = min_train_size
+        self.retrain_growth = retrain_growth
+        self.kmeans_iterations = kmeans_iterations
+        self.max_train_samples = max_train_samples
+        self.dimension: Optional[int] = None
+        self.payloads: List[Any] = []
+        self._rng = np.random.default_rng(seed)
+        self._vectors: Optional[np.ndarray] = None
+        self._size = 0
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[List[int]] = [[]]
+        self._list_arrays: List[Optional[np.ndarray]] = [None]
+        self._trained_size = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def is_trained(self) -> bool:
+        """Whether the index has been clustered (otherwise searches are exact)."""
+        return self._centroids is not None
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """All normalized vectors in insertion order."""
+        if self._vectors is None:
+            return np.empty((0, self.dimension or 0), dtype=np.float32)
+        return self._vectors[:self._size]
+
+    def _reserve(self, rows: int) -> None:
+        """Grow the backing buffer geometrically so inserts stay amortized O(1)."""
+        needed = self._size + rows
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        if needed <= capacity:
+            return
+        new_vectors = np.empty((max(needed, capacity * 2, 64), self.dimension), dtype=np.float32)
+        if self._size:
+            new_vectors[:self._size] = self._vectors[:self._size]
+        self._vectors = new_vectors
+
+    def _assign(self, vectors: np.ndarray, chunk_size: int = 8192) -> np.ndarray:
+        """Return the nearest centroid of each vector."""
+        assignments = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), chunk_size):
+            chunk = vectors[start:start + chunk_size]
+            assignments[start:start + chunk_size] = np.argmax(chunk @ self._centroids.T, axis=1)
+        return assignments
+
+    def add(self, vectors: Any, payloads: List[Any]) -> int:
+        """
+        Insert vectors into the index.
+
+        New vectors are appended to the inverted list of their nearest
+        centroid. Re-clustering, when the index has grown enough to need it,
+        is deferred to the next search.
+
+        Args:
+            vectors: 2D array-like of embeddings (normalized on insert)
+            payloads: One payload per vector, returned by `search`
+
+        Returns:
+            Number of vectors inserted
+
+        Raises:
+            ValueError: If vectors and payloads differ in length or dimension
+        """
+        rows = JournalVectorIndex.normalize(np.asarray(vectors, dtype=np.float32))
+        if rows.ndim != 2 or len(rows) == 0:
+            return 0
+        if len(rows) != len(payloads):
+            raise ValueError("vectors and payloads must have the same length")
+
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = rows.shape[1]
+            elif rows.shape[1] != self.dimension:
+                raise ValueError(f"Expected vectors of dimension {self.dimension}, got {rows.shape[1]}")
+
+            start = self._size
+            self._reserve(len(rows))
+            self._vectors[start:start + len(rows)] = rows
+            self.payloads.extend(payloads)
+            self._size += len(rows)
+
+            new_rows = range(start, start + len(rows))
+            if self.is_trained:
+                for row, list_id in zip(new_rows, self._assign(rows)):
+                    self._lists[list_id].append(row)
+                    self._list_arrays[list_id] = None
+            else:
+                self._lists[0].extend(new_rows)
+                self._list_arrays[0] = None
+        return len(rows)
+
+    def _needs_training(self) -> bool:
+        if self._size < self.min_train_size:
+            return False
+        if not self.is_trained:
+            return True
+        return self._size >= self._trained_size * self.retrain_growth
+
+    def train(self) -> None:
+        """Cluster the current vectors with spherical k-means and rebuild the inverted lists."""
+        with self._lock:
+            if self._size == 0:
+                return
+            started = time.perf_counter()
+            vectors = self.vectors
+            n_lists = self.n_lists or max(1, int(np.sqrt(self._size)))
+            n_lists = min(n_lists, self._size)
+
+            sample_size = min(self._size, self.max_train_samples)
+            sample = vectors[self._rng.choice(self._size, size=sample_size, replace=False)]
+            centroids = sample[self._rng.choice(sample_size, size=n_lists, replace=False)].copy()
+
+            for _ in range(self.kmeans_iterations):
+                labels = np.argmax(sample @ centroids.T, axis=1)
+                order = np.argsort(labels, kind='stable')
+                counts = np.bincount(labels, minlength=n_lists)
+                starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+                empty = counts == 0
+                sums = np.zeros_like(centroids)
+                sums[~empty] = np.add.reduceat(sample[order], starts[~empty], axis=0)
+                # Re-seed empty clusters from random samples
+                sums[empty] = sample[self._rng.choice(sample_size, size=int(empty.sum()))]
+                centroids = JournalVectorIndex.normalize(sums)
+
+            self._centroids = centroids
+            assignments = self._assign(vectors)
+            order = np.argsort(assignments, kind='stable')
+            bounds = np.searchsorted(assignments[order], np.arange(n_lists + 1))
+            self._lists = [order[bounds[i]:bounds[i + 1]].tolist() for i in range(n_lists)]
+            self._list_arrays = [None] * n_lists
+            self._trained_size = self._size
+            logger.info(
+                f"Trained IVF index: {self._size} vectors, {n_lists} lists "
+                f"in {(time.perf_counter() - started) * 1000:.1f}ms"
+            )
+
+    def _list_rows(self, list_id: int) -> np.ndarray:
+        rows = self._list_arrays[list_id]
+        if rows is None:
+            rows = np.asarray(self._lists[list_id], dtype=np.int64)
+            self._list_arrays[list_id] = rows
+        return rows
+
+    def search(
+        self,
+        query_vector: np.ndarray,
+        top_k: int = 5,
+        min_similarity: float = 0.0,
+        n_probe: Optional[int] = None
+    ) -> List[Tuple[Any, float]]:
+        """
+        Find the approximate top_k most similar vectors.
+
+        Args:
+            query_vector: Unit-length float32 query vector
+            top_k: Number of top results to return (default: 5)
+            min_similarity: Minimum similarity threshold (default: 0.0)
+            n_probe: Override the number of clusters scanned (default: None, uses self.n_probe)
+
+        Returns:
+            List of (payload, similarity) tuples sorted by similarity, highest first
+        """
+        with self._lock:
+            if self._needs_training():
+                self.train()
+            if self._size == 0 or top_k <= 0:
+                return []
+            if query_vector.shape[-1] != self.dimension:
+                logger.warning(
+                    f"Query dimension {query_vector.shape[-1]} does not match "
+                    f"ANN index dimension {self.dimension}"
+                )
+                return []
+
+            if self.is_trained:
+                probes = min(n_probe or self.n_probe, len(self._lists))
+                centroid_scores = self._centroids @ query_vector
+                if probes < len(self._lists):
+                    probed = np.argpartition(-centroid_scores, probes - 1)[:probes]
+                else:
+                    probed = np.arange(len(self._lists))
+                candidates = np.concatenate([self._list_rows(list_id) for list_id in probed])
+            else:
+                candidates = self._list_rows(0)
+            if len(candidates) == 0:
+                return []
+
+            scores = self._vectors[candidates] @ query_vector
+            k = min(top_k, len(candidates))
+            if k < len(candidates):
+                best = np.argpartition(-scores, k - 1)[:k]
+            else:
+                best = np.arange(len(candidates))
+            best = best[np.argsort(-scores[best], kind='stable')]
+
+            return [
+                (self.payloads[candidates[i]], float(scores[i]))
+                for i in best
+                if scores[i] >= min_similarity
+            ]
+
+
+def evaluate_recall(
+    index: IVFIndex,
+    queries: np.ndarray,
+    top_k: int = 10,
+    n_probe: Optional[int] = None
+) -> Dict[str, float]:
+    """
+    Measure recall@k of an IVF index against exact brute-force search.
+
+    Payloads must be hashable, since hits are matched by payload.
+
+    Args:
+        index: A populated IVFIndex
+        queries: 2D array of query vectors
+        top_k: Number of neighbours compared per query (default: 10)
+        n_probe: Number of clusters scanned (default: None, uses index.n_probe)
+
+    Returns:
+        Dictionary with recall and mean per-query latency of both searches
+    """
+    queries = JournalVectorIndex.normalize(queries)
+    index.search(queries[0], top_k, n_probe=n_probe)  # trigger any pending training
+    vectors = index.vectors
+    hits = 0
+    exact_seconds = 0.0
+    ann_seconds = 0.0
+
+    for query in queries:
+        started = time.perf_counter()
+        scores = vectors @ query
+        k = min(top_k, len(scores))
+        exact = set(np.argpartition(-scores, k - 1)[:k].tolist())
+        exact_seconds += time.perf_counter() - started
+
+        started = time.perf_counter()
+        approximate = index.search(query, top_k, min_similarity=-1.0, n_probe=n_probe)
+        ann_seconds += time.perf_counter() - started
+
+        exact_payloads = {index.payloads[row] for row in exact}
+        hits += sum(1 for payload, _ in approximate if payload in exact_payloads)
+
+    return {
+        'recall': hits / (len(queries) * min(top_k, len(vectors))),
+        'exact_ms': exact_seconds / len(queries) * 1000,
+        'ann_ms': ann_seconds / len(queries) * 1000
+    }
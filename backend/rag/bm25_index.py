@@ -0,0 +1,141 @@
+"""
+BM25 Index Module
+
+This module provides an incrementally maintained inverted index with Okapi
+BM25 scoring over journal page content. It sits next to the embedding matrix
+in JournalVectorIndex so exact names and terms ("when did I start at Acme?")
+can be matched lexically and fused with dense results.
+
+Usage example:
+    from rag.bm25_index import BM25Index
+
+    index = BM25Index()
+    index.add_document(0, "Started my new job at Acme today")
+    for doc_id, score in index.search("Acme job", top_k=5):
+        print(doc_id, score)
+"""
+
+import math
+import re
+import threading
+from collections import Counter
+from typing import List, Dict, Set, Tuple
+
+_TOKEN = re.compile(r"\w+")
+
+STOPWORDS = frozenset("""
+a about after again all am an and any are as at be been before being but by can could did do does
+doing down during each few for from had has have having he her here hers him his how i if in into is
+it its itself just me more most my myself no nor not now of off on once only or other our ours out
+over own same she should so some such than that the their theirs them then there these they this
+those through to too under until up very was we were what when where which while who whom why will
+with would you your yours
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase text and split it into word tokens, dropping stopwords.
+
+    Args:
+        text: Input text
+
+    Returns:
+        List of tokens
+    """
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """Inverted index with BM25 scoring; documents can only be appended."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """
+        Initialize an empty index.
+
+        Args:
+            k1: Term-frequency saturation (default: 1.5)
+            b: Document-length normalization (default: 0.75)
+        """
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._lengths: Dict[int, int] = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def add_document(self, doc_id: int, text: str) -> None:
+        """
+        Index a document. Re-adding an existing doc_id is ignored.
+
+        Args:
+            doc_id: Caller-defined document identifier
+            text: Document text
+        """
+        tokens = tokenize(text or "")
+        with self._lock:
+            if doc_id in self._lengths:
+                return
+            for term, frequency in Counter(tokens).items():
+                self._postings.setdefault(term, {})[doc_id] = frequency
+            self._lengths[doc_id] = len(tokens)
+            self._total_length += len(tokens)
+
+    def match_all(self, query: str) -> Set[int]:
+        """
+        Return the documents containing every query term.
+
+        Args:
+            query: Query text
+
+        Returns:
+            Set of matching doc_ids (empty if the query has no indexable terms)
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return set()
+        with self._lock:
+            postings = sorted((self._postings.get(term, {}) for term in terms), key=len)
+            matches = set(postings[0])
+            for posting in postings[1:]:
+                matches.intersection_update(posting)
+                if not matches:
+                    break
+            return matches
+
+    def search(self, query: str, top_k: int = 10, max_terms: int = 0) -> List[Tuple[int, float]]:
+        """
+        Rank documents against a query with BM25.
+
+        Args:
+            query: Query text
+            top_k: Number of top results to return (default: 10)
+            max_terms: Score only this many distinct query terms, the rarest (highest IDF) first;
+                common terms of long queries touch most postings but barely move the ranking (default: 0, all)
+
+        Returns:
+            List of (doc_id, score) tuples sorted by score, highest first
+        """
+        terms = Counter(tokenize(query))
+        scores: Dict[int, float] = {}
+        with self._lock:
+            count = len(self._lengths)
+            if not count or not terms:
+                return []
+            average_length = self._total_length / count or 1.0
+            matched = [(term, self._postings[term]) for term in terms if term in self._postings]
+            if 0 < max_terms < len(matched):
+                matched = sorted(matched, key=lambda item: len(item[1]))[:max_terms]
+            for term, posting in matched:
+                query_frequency = terms[term]
+                idf = math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+                for doc_id, frequency in posting.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / average_length)
+                    weight = idf * frequency * (self.k1 + 1) / (frequency + norm)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + weight * query_frequency
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:top_k]
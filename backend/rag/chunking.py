@@ -0,0 +1,105 @@
+"""
+Text Chunking Module
+
+This module splits long journal entries into overlapping passages so each
+passage can be embedded separately instead of truncating the entry. Cuts are
+made at sentence ends when possible, otherwise at whitespace.
+
+Usage example:
+    from rag.chunking import chunk_spans
+
+    for start, end in chunk_spans(transcript, max_chars=1500, overlap=200):
+        passage = transcript[start:end]
+"""
+
+import re
+import numpy as np
+from typing import List, Any, Tuple
+
+_SENTENCE_END = re.compile(r'[.!?\n]+["\')\]]*\s')
+_WHITESPACE = re.compile(r'\s')
+
+
+def _last_match_end(pattern: re.Pattern, text: str, start: int, end: int) -> int:
+    """Return the end offset of the last match of pattern in text[start:end], or -1."""
+    last = -1
+    for match in pattern.finditer(text, start, end):
+        last = match.end()
+    return last
+
+
+def chunk_spans(text: str, max_chars: int = 1500, overlap: int = 200) -> List[Tuple[int, int]]:
+    """
+    Split text into overlapping passages.
+
+    Args:
+        text: The text to split
+        max_chars: Maximum passage length in characters (default: 1500)
+        overlap: Approximate number of characters shared by consecutive passages (default: 200)
+
+    Returns:
+        List of (start, end) character offsets; a single span for short texts
+
+    Raises:
+        ValueError: If max_chars is not positive or overlap is not smaller than max_chars
+    """
+    if max_chars <= 0:
+        raise ValueError("max_chars must be greater than 0")
+    if not 0 <= overlap < max_chars:
+        raise ValueError("overlap must be between 0 and max_chars")
+
+    length = len(text)
+    if length <= max_chars:
+        return [(0, length)]
+
+    spans = []
+    start = 0
+    while start < length:
+        end = min(start + max_chars, length)
+        if end < length:
+            # Prefer a sentence end in the second half of the window, then whitespace
+            floor = start + max_chars // 2
+            cut = _last_match_end(_SENTENCE_END, text, floor, end)
+            if cut <= floor:
+                cut = _last_match_end(_WHITESPACE, text, floor, end)
+            if cut > floor:
+                end = cut
+        spans.append((start, end))
+        if end >= length:
+            break
+
+        # Start the next passage `overlap` characters back, on a word boundary
+        next_start = max(end - overlap, start + 1)
+        boundary = _WHITESPACE.search(text, next_start, end)
+        start = boundary.end() if overlap and boundary else next_start
+    return spans
+
+
+def chunk_text(text: str, max_chars: int = 1500, overlap: int = 200) -> List[str]:
+    """
+    Split text into overlapping passages (see chunk_spans).
+
+    Args:
+        text: The text to split
+        max_chars: Maximum passage length in characters (default: 1500)
+        overlap: Approximate number of characters shared by consecutive passages (default: 200)
+
+    Returns:
+        List of passage strings
+    """
+    return [text[start:end] for start, end in chunk_spans(text, max_chars, overlap)]
+
+
+def pool_passage_vectors(vectors: List[Any]) -> List[float]:
+    """
+    Combine passage embeddings into one whole-entry vector (normalized mean).
+
+    Args:
+        vectors: One embedding per passage
+
+    Returns:
+        The pooled embedding as a list of floats
+    """
+    mean = np.mean(np.asarray(vectors, dtype=np.float32), axis=0)
+    norm = np.linalg.norm(mean)
+    return (mean / norm if norm > 0 else mean).tolist()
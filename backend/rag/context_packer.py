@@ -0,0 +1,114 @@
+"""
+Context Packer Module
+
+This module turns ranked search results into the history passed to an
+agent. Passages are picked with maximal marginal relevance (MMR) over their
+embeddings, so near-identical entries (the same daily check-in written
+many times) are sent once, and selection stops at a token budget instead
+of a fixed number of results.
+
+Usage example:
+    from rag.context_packer import pack_context
+
+    packed, report = pack_context(results, vectors, token_budget=1500)
+    history = "\n---\n".join(result['passage'] for result in packed)
+    print(report['tokens_saved'])
+"""
+
+import numpy as np
+from typing import List, Dict, Any, Optional, Tuple
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the token count of text (about 4 characters per token).
+
+    Args:
+        text: Input text
+
+    Returns:
+        Estimated number of tokens
+    """
+    return len(text) // 4 + 1 if text else 0
+
+
+def pack_context(
+    results: List[Dict[str, Any]],
+    vectors: List[Optional[np.ndarray]],
+    token_budget: int,
+    mmr_lambda: float = 0.7,
+    duplicate_threshold: float = 0.92
+) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """
+    Select a diverse subset of search results that fits a token budget.
+
+    Each step picks the result maximizing
+    mmr_lambda * similarity_score - (1 - mmr_lambda) * (max cosine to the
+    results already picked). Results at least duplicate_threshold similar
+    to a picked one, or with identical text, are dropped as near-duplicates.
+    Results that no longer fit the remaining budget are skipped.
+
+    Args:
+        results: Search results with 'passage' and 'similarity_score', best first
+        vectors: Normalized embedding of each result's passage (None if unknown)
+        token_budget: Maximum estimated tokens of the selected passages
+        mmr_lambda: Relevance vs. diversity trade-off, 1.0 ignores diversity (default: 0.7)
+        duplicate_threshold: Cosine similarity above which a result is a near-duplicate (default: 0.92)
+
+    Returns:
+        Tuple of (selected results in pick order, report dictionary with
+        candidates, selected, duplicates, over_budget, tokens_in, tokens_out and tokens_saved)
+    """
+    candidates = [
+        (result, vector) for result, vector in zip(results, vectors)
+        if result.get('passage')
+    ]
+    report = {
+        'candidates': len(candidates),
+        'selected': 0,
+        'duplicates': 0,
+        'over_budget': 0,
+        'tokens_in': sum(estimate_tokens(result['passage']) for result, _ in candidates),
+        'tokens_out': 0,
+    }
+
+    selected: List[Dict[str, Any]] = []
+    seen_text = set()
+    remaining = token_budget
+    # Redundancy of each candidate against everything picked so far
+    redundancy = np.zeros(len(candidates), dtype=np.float32)
+    open_positions = list(range(len(candidates)))
+
+    while open_positions and remaining > 0:
+        scores = [
+            mmr_lambda * candidates[i][0].get('similarity_score', 0.0) - (1 - mmr_lambda) * redundancy[i]
+            for i in open_positions
+        ]
+        best = open_positions.pop(int(np.argmax(scores)))
+        result, vector = candidates[best]
+        passage = result['passage']
+
+        text_key = " ".join(passage.split()).lower()
+        if redundancy[best] >= duplicate_threshold or text_key in seen_text:
+            report['duplicates'] += 1
+            continue
+        tokens = estimate_tokens(passage)
+        if tokens > remaining:
+            report['over_budget'] += 1
+            continue
+
+        selected.append(result)
+        seen_text.add(text_key)
+        remaining -= tokens
+        report['tokens_out'] += tokens
+        if vector is not None:
+            for i in open_positions:
+                other = candidates[i][1]
+                if other is not None:
+                    redundancy[i] = max(redundancy[i], float(np.dot(vector, other)))
+
+    # Whatever was never considered because the budget ran out counts as over budget
+    report['over_budget'] += len(open_positions)
+    report['selected'] = len(selected)
+    report['tokens_saved'] = report['tokens_in'] - report['tokens_out']
+    return selected, report
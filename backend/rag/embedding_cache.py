@@ -0,0 +1,103 @@
+"""
+Query Embedding Cache Module
+
+This module provides a thread-safe LRU cache with a time-to-live for query
+embeddings, keyed on whitespace- and Unicode-normalized text, so repeated
+searches for the same text skip the embedding round trip.
+
+Usage example:
+    from rag.embedding_cache import QueryEmbeddingCache
+
+    cache = QueryEmbeddingCache(max_size=1024, ttl=600)
+    vector = cache.get("What did I write about my trip?")
+    if vector is None:
+        vector = model.get_embeddings([text])[0].values
+        cache.put(text, vector)
+"""
+
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import List, Dict, Optional
+
+
+class QueryEmbeddingCache:
+    """LRU + TTL cache mapping normalized query text to its embedding."""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 600.0):
+        """
+        Initialize the cache.
+
+        Args:
+            max_size: Maximum number of cached embeddings; 0 disables caching (default: 1024)
+            ttl: Seconds an embedding stays valid (default: 600)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize_key(text: str) -> str:
+        """
+        Normalize text into a cache key (NFC, collapsed whitespace).
+
+        Args:
+            text: Query text
+
+        Returns:
+            Normalized key
+        """
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    def get(self, text: str) -> Optional[List[float]]:
+        """
+        Look up the embedding for a query.
+
+        Args:
+            text: Query text
+
+        Returns:
+            The cached embedding, or None on a miss or expired entry
+        """
+        key = self.normalize_key(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, text: str, embedding: List[float]) -> None:
+        """
+        Store the embedding for a query, evicting the least recently used entry if full.
+
+        Args:
+            text: Query text
+            embedding: Its embedding vector
+        """
+        if self.max_size <= 0:
+            return
+        key = self.normalize_key(text)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return hit/miss counters and the current size.
+
+        Returns:
+            Dictionary with hits, misses and size
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
@@ -18,6 +18,9 @@ import os
 from typing import List, Dict, Any, Optional
 import logging
 
+from rag.vector_codec import encode_vector
+from rag.chunking import chunk_spans, pool_passage_vectors
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -32,7 +35,12 @@ class RAGIngestionService:
         location: Optional[str] = None,
         model_name: Optional[str] = None,
         max_text_length: int = 8000,
-        api_key: Optional[str] = None
+        api_key: Optional[str] = None,
+        embedding_gateway: Optional[Any] = None,
+        vector_format: str = "json",
+        chunk_size: int = 1500,
+        chunk_overlap: int = 200,
+        embedding_batch_size: int = 16
     ):
         """
         Initialize the RAG Ingestion Service.
@@ -43,12 +51,22 @@ class RAGIngestionService:
             model_name: Embedding model name (defaults to 'textembedding-gecko@003')
             max_text_length: Maximum text length for embedding generation (default: 8000 chars)
             api_key: API key for authentication (defaults to API_KEY env var)
+            embedding_gateway: Optional shared EmbeddingGateway that batches embedding calls across callers
+            vector_format: Stored vector format: 'json', 'float32' or 'float16' (default: 'json')
+            chunk_size: Entries longer than this are split into passages of at most this many chars (default: 1500)
+            chunk_overlap: Characters shared by consecutive passages (default: 200)
+            embedding_batch_size: Passages sent per embedding request (default: 16)
         """
         self.project_id = project_id or os.environ.get('GCP_PROJECT_ID', 'your-project-id')
         self.location = location or os.environ.get('GCP_LOCATION', 'us-central1')
         self.model_name = model_name or "textembedding-gecko@003"
         self.max_text_length = max_text_length
         self.api_key = api_key or os.environ.get('API_KEY')
+        self.embedding_gateway = embedding_gateway
+        self.vector_format = vector_format
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.embedding_batch_size = embedding_batch_size
         
         # Initialize Vertex AI
         try:
@@ -77,7 +95,8 @@ class RAGIngestionService:
     def generate_embedding(self, text: str) -> List[float]:
         """
         Generate embedding for the given text using Vertex AI.
-        Automatically truncates text if it exceeds max_text_length.
+        Long text is split into passages and their embeddings are pooled,
+        so nothing past max_text_length is lost.
         
         Args:
             text: The text content to generate an embedding for
@@ -85,6 +104,26 @@ class RAGIngestionService:
         Returns:
             List of float values representing the embedding vector
             
+        Raises:
+            ValueError: If text is empty or None
+            Exception: If embedding generation fails
+        """
+        chunks = self.generate_chunk_embeddings(text)
+        if len(chunks) == 1:
+            return chunks[0]['vector']
+        return pool_passage_vectors([chunk['vector'] for chunk in chunks])
+    
+    def generate_chunk_embeddings(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Split text into overlapping passages and embed them in batches.
+        
+        Args:
+            text: The text content to embed
+            
+        Returns:
+            List of {"start", "end", "vector"} dictionaries, one per passage
+            (a single passage covering the whole text for short entries)
+            
         Raises:
             ValueError: If text is empty or None
             Exception: If embedding generation fails
@@ -92,17 +131,26 @@ class RAGIngestionService:
         if not text or not text.strip():
             raise ValueError("Text cannot be empty or None")
         
+        spans = chunk_spans(text, max_chars=self.chunk_size, overlap=self.chunk_overlap)
+        passages = [self._truncate_text(text[start:end]) for start, end in spans]
+        
         try:
-            # Truncate text if necessary
-            truncated_text = self._truncate_text(text)
-            
-            embeddings = self.model.get_embeddings([truncated_text])
-            embedding_values = embeddings[0].values
-            logger.info(f"Generated embedding with dimension: {len(embedding_values)}")
-            return embedding_values
+            vectors = []
+            for batch_start in range(0, len(passages), self.embedding_batch_size):
+                batch = passages[batch_start:batch_start + self.embedding_batch_size]
+                if self.embedding_gateway is not None:
+                    vectors.extend(self.embedding_gateway.embed_many_sync(batch))
+                else:
+                    vectors.extend(embedding.values for embedding in self.model.get_embeddings(batch))
+            logger.info(f"Generated {len(vectors)} passage embeddings with dimension: {len(vectors[0])}")
         except Exception as e:
             logger.error(f"Embedding generation failed: {str(e)}")
             raise Exception(f"Embedding generation failed: {str(e)}")
+        
+        return [
+            {"start": start, "end": end, "vector": vector}
+            for (start, end), vector in zip(spans, vectors)
+        ]
     
     def prepare_journal_data(
         self,
@@ -140,16 +188,25 @@ class RAGIngestionService:
         if not entry_type or not entry_type.strip():
             raise ValueError("entry_type cannot be empty")
         
-        # Generate embedding
-        embedding = self.generate_embedding(content)
+        # Generate embeddings, one per passage for long entries
+        chunks = self.generate_chunk_embeddings(content)
+        if len(chunks) == 1:
+            embedding = chunks[0]['vector']
+        else:
+            embedding = pool_passage_vectors([chunk['vector'] for chunk in chunks])
         
         # Prepare complete data package
         journal_data = {
             "content": content,
             "mood": mood,
             "entry_type": entry_type,
-            "encoding": embedding
+            "encoding": encode_vector(embedding, self.vector_format)
         }
+        if len(chunks) > 1:
+            journal_data["chunk_vectors"] = [
+                {**chunk, "vector": encode_vector(chunk['vector'], self.vector_format)}
+                for chunk in chunks
+            ]
         
         logger.info(f"Prepared journal data for page_id: {page_id}")
         return journal_data
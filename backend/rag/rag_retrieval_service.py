@@ -12,6 +12,10 @@ Usage example:
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from google.cloud import aiplatform
 from vertexai.language_models import TextEmbeddingModel
@@ -19,6 +23,11 @@ import os
 from typing import List, Dict, Any, Optional, Tuple
 import logging
 
+from rag.vector_index import JournalVectorIndex
+from rag.ann_index import IVFIndex
+from rag.bm25_index import tokenize
+from rag.embedding_cache import QueryEmbeddingCache
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -34,7 +43,21 @@ class RAGRetrievalService:
         project_id: Optional[str] = None,
         location: Optional[str] = None,
         model_name: Optional[str] = None,
-        max_text_length: int = 8000
+        max_text_length: int = 8000,
+        index_ttl: float = 300.0,
+        ann_n_lists: Optional[int] = None,
+        ann_n_probe: int = 8,
+        ann_min_train_size: int = 1024,
+        fetch_concurrency: int = 8,
+        query_cache_size: int = 1024,
+        query_cache_ttl: float = 600.0,
+        embedding_gateway: Optional[Any] = None,
+        snapshot_dir: Optional[str] = None,
+        hybrid_search: bool = True,
+        rrf_k: int = 60,
+        lexical_prefilter_limit: int = 32,
+        keyword_query_max_terms: int = 4,
+        lexical_max_query_terms: int = 32
     ):
         """
         Initialize the RAG Retrieval Service.
@@ -45,14 +68,63 @@ class RAGRetrievalService:
             location: GCP location (defaults to GCP_LOCATION env var or 'us-central1')
             model_name: Embedding model name (defaults to 'textembedding-gecko@003')
             max_text_length: Maximum text length for embedding generation (default: 8000 chars)
+            index_ttl: Seconds before a cached journal vector index is revalidated against the API (default: 300)
+            ann_n_lists: Clusters in the cross-journal ANN index (default: None, sqrt of the page count)
+            ann_n_probe: Clusters scanned per cross-journal query; raise for recall, lower for latency (default: 8)
+            ann_min_train_size: Pages needed before cross-journal search becomes approximate (default: 1024)
+            fetch_concurrency: Maximum concurrent page fetches and pooled keep-alive connections (default: 8)
+            query_cache_size: Query embeddings kept in the LRU cache; 0 disables it (default: 1024)
+            query_cache_ttl: Seconds a cached query embedding stays valid (default: 600)
+            embedding_gateway: Optional shared EmbeddingGateway that batches embedding calls across callers
+            snapshot_dir: Directory for memory-mapped per-journal index snapshots shared by all workers (default: None, disabled)
+            hybrid_search: Fuse BM25 and embedding rankings for single-journal searches (default: True)
+            rrf_k: Reciprocal-rank-fusion constant; larger values flatten rank differences (default: 60)
+            lexical_prefilter_limit: If at most this many pages contain every query term, only those pages
+                are scored densely (default: 32, 0 disables the prefilter)
+            keyword_query_max_terms: Queries with at most this many terms count as keyword searches, whose
+                lexical hits are kept below min_similarity; longer queries apply it to every result (default: 4)
+            lexical_max_query_terms: BM25 scores at most this many distinct query terms, the rarest first,
+                so a whole-entry query doesn't walk the postings of every common word (default: 32, 0 for all)
         """
         self.api_base_url = api_base_url.rstrip('/')
         self.api_key = api_key
         self.headers = {"X-API-Key": self.api_key}
+        self.fetch_concurrency = max(1, fetch_concurrency)
+        
+        # Pooled keep-alive transport shared by all fetches
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.fetch_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._fetch_executor = ThreadPoolExecutor(
+            max_workers=self.fetch_concurrency,
+            thread_name_prefix="rag-fetch"
+        )
+        self._fetch_stats = {'requests': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+        self._fetch_stats_lock = threading.Lock()
         self.project_id = project_id or os.environ.get('GCP_PROJECT_ID', 'your-project-id')
         self.location = location or os.environ.get('GCP_LOCATION', 'us-central1')
         self.model_name = model_name or "text-embedding-005"
         self.max_text_length = max_text_length
+        self.embedding_gateway = embedding_gateway
+        self.index_ttl = index_ttl
+        self.snapshot_dir = snapshot_dir
+        self.hybrid_search = hybrid_search
+        self.rrf_k = rrf_k
+        self.lexical_prefilter_limit = lexical_prefilter_limit
+        self.keyword_query_max_terms = keyword_query_max_terms
+        self.lexical_max_query_terms = lexical_max_query_terms
+        self._journal_indexes: Dict[int, JournalVectorIndex] = {}
+        self._index_lock = threading.Lock()
+        self.ann_n_lists = ann_n_lists
+        self.ann_n_probe = ann_n_probe
+        self.ann_min_train_size = ann_min_train_size
+        self._ann_index: Optional[IVFIndex] = None
+        self._ann_pages: Dict[Tuple[int, Any], Dict[str, Any]] = {}
+        self._ann_checked_at = 0.0
+        self._ann_lock = threading.Lock()
+        self.query_cache = QueryEmbeddingCache(max_size=query_cache_size, ttl=query_cache_ttl)
         
         # Initialize Vertex AI
         try:
@@ -82,6 +154,9 @@ class RAGRetrievalService:
         """
         Generate embedding for a search query.
         
+        Embeddings are served from the query cache when the same
+        (normalized) text was embedded recently.
+        
         Args:
             query: The search query text
             
@@ -95,18 +170,67 @@ class RAGRetrievalService:
         if not query or not query.strip():
             raise ValueError("Query cannot be empty")
         
+        cached = self.query_cache.get(query)
+        if cached is not None:
+            return cached
+        
         try:
             # Truncate if necessary
             truncated_query = self._truncate_text(query)
             
-            embeddings = self.model.get_embeddings([truncated_query])
-            embedding_values = embeddings[0].values
+            if self.embedding_gateway is not None:
+                embedding_values = self.embedding_gateway.embed_sync(truncated_query)
+            else:
+                embeddings = self.model.get_embeddings([truncated_query])
+                embedding_values = embeddings[0].values
             logger.info(f"Generated query embedding with dimension: {len(embedding_values)}")
+            self.query_cache.put(query, embedding_values)
             return embedding_values
         except Exception as e:
             logger.error(f"Query embedding generation failed: {str(e)}")
             raise Exception(f"Query embedding generation failed: {str(e)}")
     
+    def _get(self, url: str, timeout: int, headers: Optional[Dict[str, str]] = None) -> requests.Response:
+        """
+        Issue a GET on the pooled session and record its latency.
+        
+        Args:
+            url: Absolute URL to fetch
+            timeout: Request timeout in seconds
+            headers: Extra headers for this request (default: None)
+            
+        Returns:
+            The HTTP response
+        """
+        started = time.perf_counter()
+        try:
+            return self.session.get(url, timeout=timeout, headers=headers)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._fetch_stats_lock:
+                self._fetch_stats['requests'] += 1
+                self._fetch_stats['total_ms'] += elapsed_ms
+                self._fetch_stats['max_ms'] = max(self._fetch_stats['max_ms'], elapsed_ms)
+            logger.info(f"GET {url} took {elapsed_ms:.1f}ms")
+    
+    def close(self) -> None:
+        """Flush index snapshots and release pooled connections and fetch worker threads."""
+        self.flush_snapshots()
+        self._fetch_executor.shutdown(wait=False)
+        self.session.close()
+    
+    def get_fetch_stats(self) -> Dict[str, float]:
+        """
+        Return cumulative HTTP fetch statistics.
+        
+        Returns:
+            Dictionary with request count, total/mean/max latency in milliseconds
+        """
+        with self._fetch_stats_lock:
+            stats = dict(self._fetch_stats)
+        stats['mean_ms'] = stats['total_ms'] / stats['requests'] if stats['requests'] else 0.0
+        return stats
+    
     def get_all_journal_pages(self, journal_id: int, timeout: int = 30) -> List[Dict[str, Any]]:
         """
         Retrieve all pages from a specific journal.
@@ -124,7 +248,7 @@ class RAGRetrievalService:
         url = f"{self.api_base_url}/journals/{journal_id}/pages"
         
         try:
-            response = requests.get(url, timeout=timeout, headers=self.headers)
+            response = self._get(url, timeout)
             response.raise_for_status()
             
             pages = response.json()
@@ -135,6 +259,101 @@ class RAGRetrievalService:
             logger.error(f"Failed to retrieve pages for journal {journal_id}: {str(e)}")
             raise Exception(f"Failed to retrieve journal pages: {str(e)}")
     
+    def get_journal_page(self, page_id: Any, timeout: int = 30) -> Dict[str, Any]:
+        """
+        Retrieve a single journal page.
+        
+        Args:
+            page_id: The ID of the page
+            timeout: Request timeout in seconds (default: 30)
+            
+        Returns:
+            Journal page dictionary
+            
+        Raises:
+            Exception: If API request fails
+        """
+        url = f"{self.api_base_url}/journal_pages/{page_id}"
+        
+        try:
+            response = self._get(url, timeout)
+            response.raise_for_status()
+            return response.json()
+            
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Failed to retrieve page {page_id}: {str(e)}")
+            raise Exception(f"Failed to retrieve journal page: {str(e)}")
+    
+    def _fill_content(self, pages: List[Dict[str, Any]]) -> None:
+        """
+        Fetch the content of snapshot-loaded pages that don't have it yet, in place.
+        
+        Only search hits go through here, so a warm-started index costs
+        top_k page requests instead of the full journal listing. Pages that
+        can't be fetched are left without content.
+        
+        Args:
+            pages: Page dictionaries of the results about to be returned
+        """
+        missing = [page for page in pages if 'content' not in page and page.get('id') is not None]
+        if not missing:
+            return
+        
+        def fetch(page: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            try:
+                return self.get_journal_page(page['id'])
+            except Exception:
+                return None
+        
+        for page, fetched in zip(missing, self._fetch_executor.map(fetch, missing)):
+            if fetched:
+                page.update({
+                    key: value for key, value in fetched.items()
+                    if key not in ('encoding', 'text_vector', 'chunk_vectors')
+                })
+        logger.info(f"Fetched content of {len(missing)} snapshot pages")
+    
+    def get_journal_pages_if_changed(
+        self,
+        journal_id: int,
+        etag: Optional[str] = None,
+        timeout: int = 30
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+        """
+        Conditionally retrieve the pages of a journal.
+        
+        Sends If-None-Match when an ETag is known, so an unchanged journal
+        costs a 304 instead of the full page listing.
+        
+        Args:
+            journal_id: The ID of the journal
+            etag: ETag from a previous response (default: None)
+            timeout: Request timeout in seconds (default: 30)
+            
+        Returns:
+            Tuple of (pages, etag); pages is None if the journal is unchanged
+            
+        Raises:
+            Exception: If API request fails
+        """
+        url = f"{self.api_base_url}/journals/{journal_id}/pages"
+        headers = {"If-None-Match": etag} if etag else None
+        
+        try:
+            response = self._get(url, timeout, headers=headers)
+            if response.status_code == 304:
+                logger.info(f"Journal {journal_id} unchanged (ETag match)")
+                return None, etag
+            response.raise_for_status()
+            
+            pages = response.json()
+            logger.info(f"Retrieved {len(pages)} pages from journal {journal_id}")
+            return pages, response.headers.get("ETag")
+            
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Failed to retrieve pages for journal {journal_id}: {str(e)}")
+            raise Exception(f"Failed to retrieve journal pages: {str(e)}")
+    
     def get_all_journals(self, timeout: int = 30) -> List[Dict[str, Any]]:
         """
         Retrieve all journals.
@@ -151,7 +370,7 @@ class RAGRetrievalService:
         url = f"{self.api_base_url}/journals"
         
         try:
-            response = requests.get(url, timeout=timeout, headers=self.headers)
+            response = self._get(url, timeout)
             response.raise_for_status()
             
             journals = response.json()
@@ -185,84 +404,488 @@ class RAGRetrievalService:
         
         return float(dot_product / (norm1 * norm2))
     
+    def get_journal_index(self, journal_id: int, refresh: bool = False) -> JournalVectorIndex:
+        """
+        Return the cached vector index for a journal, building it if needed.
+        
+        Once an index is older than index_ttl it is revalidated with a
+        conditional page request: unchanged journals are kept, journals that
+        only gained pages are appended to, and anything else is rebuilt.
+        With snapshot_dir set, a journal not yet in memory is first opened
+        from its on-disk snapshot and revalidated immediately with its
+        ETag. Snapshot pages have no content: search hits fetch theirs one
+        by one, and the first full listing (a changed journal) hydrates the
+        whole index, BM25 included.
+        
+        Args:
+            journal_id: The ID of the journal
+            refresh: Force a rebuild from the API (default: False)
+            
+        Returns:
+            The journal's JournalVectorIndex
+            
+        Raises:
+            Exception: If the pages cannot be retrieved
+        """
+        with self._index_lock:
+            index = self._journal_indexes.get(journal_id)
+        
+        if index is None and not refresh and self.snapshot_dir:
+            index = JournalVectorIndex.load(self.snapshot_dir, journal_id)
+            if index is not None:
+                # Snapshots may be stale; force a check against the API below
+                index.checked_at = float('-inf')
+                with self._index_lock:
+                    index = self._journal_indexes.setdefault(journal_id, index)
+        
+        if index is not None and not refresh:
+            if time.monotonic() - index.checked_at < self.index_ttl:
+                return index
+            
+            pages, etag = self.get_journal_pages_if_changed(journal_id, etag=index.etag)
+            if pages is not None and not index.hydrated:
+                index.hydrate(pages)
+            missing = [] if pages is None else index.is_current(pages)
+            if missing is not None:
+                added = index.add_pages(missing)
+                if added:
+                    logger.info(f"Appended {added} new pages to journal {journal_id} index")
+                index.etag = etag
+                index.checked_at = time.monotonic()
+                if index.dirty:
+                    self._save_snapshot(index)
+                return index
+            logger.info(f"Journal {journal_id} changed remotely, rebuilding index")
+        else:
+            pages, etag = self.get_journal_pages_if_changed(journal_id)
+        
+        # Passage vectors may not round-trip through the API; carry them over from the old index
+        index = JournalVectorIndex.from_pages(journal_id, pages, previous=index)
+        index.etag = etag
+        with self._index_lock:
+            self._journal_indexes[journal_id] = index
+        self._save_snapshot(index)
+        return index
+    
+    def _save_snapshot(self, index: JournalVectorIndex) -> None:
+        """
+        Write a journal index snapshot if snapshots are enabled; failures are logged, not raised.
+        
+        Args:
+            index: The index to persist
+        """
+        if not self.snapshot_dir:
+            return
+        try:
+            index.save(self.snapshot_dir)
+        except Exception as e:
+            logger.warning(f"Failed to save snapshot of journal {index.journal_id}: {str(e)}")
+    
+    def flush_snapshots(self) -> int:
+        """
+        Persist every cached index that changed since its last snapshot.
+        
+        Returns:
+            Number of snapshots written
+        """
+        if not self.snapshot_dir:
+            return 0
+        with self._index_lock:
+            dirty = [index for index in self._journal_indexes.values() if index.dirty]
+        for index in dirty:
+            self._save_snapshot(index)
+        return len(dirty)
+    
+    def get_journal_indexes(self, journal_ids: List[int]) -> List[JournalVectorIndex]:
+        """
+        Fetch or revalidate several journal indexes concurrently.
+        
+        At most fetch_concurrency requests are in flight at once, so the
+        wall time is close to the slowest fetches instead of their sum.
+        
+        Args:
+            journal_ids: IDs of the journals to load
+            
+        Returns:
+            Journal indexes in the same order as journal_ids
+            
+        Raises:
+            Exception: If any journal's pages cannot be retrieved
+        """
+        if not journal_ids:
+            return []
+        
+        before = self.get_fetch_stats()
+        started = time.perf_counter()
+        indexes = list(self._fetch_executor.map(self.get_journal_index, journal_ids))
+        wall_ms = (time.perf_counter() - started) * 1000
+        after = self.get_fetch_stats()
+        
+        logger.info(
+            f"Loaded {len(indexes)} journal indexes with {after['requests'] - before['requests']} fetches: "
+            f"{wall_ms:.1f}ms wall vs {after['total_ms'] - before['total_ms']:.1f}ms summed fetch time"
+        )
+        return indexes
+    
+    def add_page_to_index(
+        self,
+        journal_id: int,
+        page: Dict[str, Any],
+        vector: List[float]
+    ) -> bool:
+        """
+        Append a freshly saved page to the cached index of its journal.
+        
+        Lets callers that already hold the page's vector keep the index warm
+        without re-downloading the journal. Does nothing if the journal has
+        no cached index yet; the next search builds it from the API. A page
+        without an 'id' is not appended (revalidation couldn't match it to
+        its upstream copy); the index ETag is cleared so the next
+        revalidation picks the page up instead.
+        
+        Args:
+            journal_id: The ID of the journal the page was saved to
+            page: Journal page dictionary (as returned by the API on creation);
+                passage vectors in 'chunk_vectors' are indexed instead of `vector`
+            vector: The page's embedding vector
+            
+        Returns:
+            True if the page was added to a cached index
+        """
+        with self._index_lock:
+            index = self._journal_indexes.get(journal_id)
+        if index is None:
+            return False
+        if page.get('id') is None:
+            index.etag = None
+            return False
+        
+        added = index.add_pages([{**page, 'encoding': vector}])
+        if added:
+            # Our own write changes the listing's ETag; force the next check to compare page IDs
+            index.etag = None
+            logger.info(f"Added page {page.get('id')} to journal {journal_id} index")
+            metadata, rows, spans = index.page_rows(page.get('id'))
+            self._add_to_ann_index(journal_id, [metadata], rows, np.zeros(len(rows), dtype=np.int64), spans)
+        return bool(added)
+    
+    def _add_to_ann_index(
+        self,
+        journal_id: int,
+        pages: List[Dict[str, Any]],
+        matrix: np.ndarray,
+        row_pages: np.ndarray,
+        spans: List[Optional[Tuple[int, int]]]
+    ) -> None:
+        """
+        Insert pages into the cross-journal ANN index, if it has been built.
+        
+        Args:
+            journal_id: The ID of the journal the pages belong to
+            pages: Journal page dictionaries (without encodings)
+            matrix: Page vectors, one or more rows per page
+            row_pages: Index in `pages` of each matrix row
+            spans: Passage span of each matrix row (None for whole-entry vectors)
+        """
+        with self._ann_lock:
+            if self._ann_index is None:
+                return
+            is_new = np.zeros(len(pages), dtype=bool)
+            for position, page in enumerate(pages):
+                key = (journal_id, page.get('id'))
+                if page.get('id') is None or key in self._ann_pages:
+                    continue
+                self._ann_pages[key] = page
+                is_new[position] = True
+            rows = np.flatnonzero(is_new[row_pages]) if len(row_pages) else []
+            if len(rows):
+                payloads = [(journal_id, pages[row_pages[row]].get('id'), spans[row]) for row in rows]
+                self._ann_index.add(matrix[rows], payloads)
+    
+    def get_global_index(self, refresh: bool = False) -> IVFIndex:
+        """
+        Return the cross-journal ANN index, building or syncing it if needed.
+        
+        Once older than index_ttl, the index is synced from every journal's
+        cached index: new pages are inserted incrementally, and the index is
+        rebuilt only if pages were removed.
+        
+        Args:
+            refresh: Force a full rebuild (default: False)
+            
+        Returns:
+            The IVFIndex over all page encodings
+            
+        Raises:
+            Exception: If journals or pages cannot be retrieved
+        """
+        with self._ann_lock:
+            fresh = time.monotonic() - self._ann_checked_at < self.index_ttl
+            if self._ann_index is not None and not refresh and fresh:
+                return self._ann_index
+        
+        journal_ids = []
+        for journal in self.get_all_journals():
+            journal_id_from_api = journal.get('id', journal.get('journal_id'))
+            if journal_id_from_api:
+                journal_ids.append(journal_id_from_api)
+        journal_indexes = self.get_journal_indexes(journal_ids)
+        
+        snapshots = [(index.journal_id, *index.snapshot()) for index in journal_indexes]
+        current_keys = {
+            (journal_id, page.get('id'))
+            for journal_id, pages, *_ in snapshots
+            for page in pages
+        }
+        with self._ann_lock:
+            if self._ann_index is None or refresh or not set(self._ann_pages) <= current_keys:
+                self._ann_index = IVFIndex(
+                    n_lists=self.ann_n_lists,
+                    n_probe=self.ann_n_probe,
+                    min_train_size=self.ann_min_train_size
+                )
+                self._ann_pages = {}
+                logger.info("Building cross-journal ANN index")
+        
+        for journal_id, pages, matrix, row_pages, spans in snapshots:
+            self._add_to_ann_index(journal_id, pages, matrix, row_pages, spans)
+        
+        with self._ann_lock:
+            self._ann_checked_at = time.monotonic()
+            logger.info(f"Cross-journal ANN index holds {len(self._ann_index)} pages")
+            return self._ann_index
+    
+    def invalidate_journal_index(self, journal_id: Optional[int] = None) -> None:
+        """
+        Drop cached vector indexes so the next search rebuilds them.
+        
+        Args:
+            journal_id: Journal to invalidate (default: None, invalidates all journals)
+        """
+        with self._index_lock:
+            if journal_id is None:
+                self._journal_indexes.clear()
+            else:
+                self._journal_indexes.pop(journal_id, None)
+    
+    def _format_result(
+        self,
+        page: Dict[str, Any],
+        similarity: float,
+        span: Optional[Tuple[int, int]] = None
+    ) -> Dict[str, Any]:
+        """
+        Build a search result dictionary from page metadata.
+        
+        Args:
+            page: Journal page dictionary (without its encoding)
+            similarity: Cosine similarity with the query
+            span: (start, end) of the best-matching passage, None for the whole entry
+            
+        Returns:
+            Search result dictionary
+        """
+        content = page.get('content')
+        passage = content[span[0]:span[1]] if span and content else content
+        return {
+            'page_id': page.get('id'),
+            'journal_id': page.get('journal_id'),
+            'page_number': page.get('page_number'),
+            'content': content,
+            'passage': passage,
+            'mood': page.get('mood'),
+            'entry_type': page.get('entry_type'),
+            'created_at': page.get('created_at'),
+            'updated_at': page.get('updated_at'),
+            'similarity_score': similarity,
+            'span': span
+        }
+    
+    def get_result_vectors(
+        self,
+        results: List[Dict[str, Any]],
+        journal_id: Optional[int] = None
+    ) -> List[Optional[np.ndarray]]:
+        """
+        Look up the normalized embedding of each search result's passage.
+        
+        Vectors come from the journal indexes already in memory, so this
+        makes no API calls; results whose journal isn't loaded get None.
+        
+        Args:
+            results: Results returned by search_similar_entries
+            journal_id: Journal to use for results without a 'journal_id' (default: None)
+            
+        Returns:
+            One vector (or None) per result, in the same order
+        """
+        vectors = []
+        for result in results:
+            with self._index_lock:
+                index = self._journal_indexes.get(result.get('journal_id') or journal_id)
+            try:
+                _, rows, spans = index.page_rows(result['page_id'])
+            except (AttributeError, KeyError):
+                vectors.append(None)
+                continue
+            span = tuple(result['span']) if result.get('span') else None
+            row = next((i for i, row_span in enumerate(spans) if (tuple(row_span) if row_span else None) == span), 0)
+            vectors.append(np.array(rows[row]))
+        return vectors
+    
+    def _hybrid_search(
+        self,
+        index: JournalVectorIndex,
+        query: str,
+        query_vector: np.ndarray,
+        top_k: int,
+        min_similarity: float
+    ) -> List[Dict[str, Any]]:
+        """
+        Fuse BM25 and embedding rankings of one journal with reciprocal-rank fusion.
+        
+        When only a handful of pages contain every query term, the dense
+        scan is restricted to those pages.
+        
+        Args:
+            index: The journal's vector index
+            query: The search query text
+            query_vector: Normalized query embedding
+            top_k: Number of top results to return
+            min_similarity: Minimum similarity of every result, except lexical hits of keyword queries
+            
+        Returns:
+            Search result dictionaries with 'fusion_score' and 'lexical_score'
+        """
+        depth = top_k * 4
+        lexical = index.lexical.search(query, depth, self.lexical_max_query_terms)
+        
+        selective = index.lexical.match_all(query) if self.lexical_prefilter_limit > 0 else set()
+        if 0 < len(selective) <= self.lexical_prefilter_limit:
+            logger.info(f"Lexical prefilter: scoring {len(selective)} of {len(index)} pages densely")
+            dense = index.search(query_vector, depth, min_similarity, positions=selective)
+        else:
+            dense = index.search(query_vector, depth, min_similarity)
+        
+        fusion: Dict[int, float] = {}
+        for ranking in (dense, lexical):
+            for rank, hit in enumerate(ranking):
+                fusion[hit[0]] = fusion.get(hit[0], 0.0) + 1.0 / (self.rrf_k + rank + 1)
+        
+        # Lexical-only hits still need their cosine similarity and best passage
+        dense_hits = {position: (similarity, span) for position, similarity, span in dense}
+        missing = [position for position, _ in lexical if position not in dense_hits]
+        if missing:
+            for position, similarity, span in index.search(query_vector, len(missing), -1.0, positions=missing):
+                dense_hits[position] = (similarity, span)
+        
+        # A long query (e.g. a whole new entry) shares some term with almost every page, so
+        # lexical matches only bypass the similarity floor for short keyword searches
+        keyword_query = len(tokenize(query)) <= self.keyword_query_max_terms
+        ranked = [
+            position for position in sorted(fusion, key=fusion.get, reverse=True)
+            if keyword_query or dense_hits[position][0] >= min_similarity
+        ]
+        
+        lexical_scores = dict(lexical)
+        results = []
+        for position in ranked[:top_k]:
+            similarity, span = dense_hits[position]
+            result = self._format_result(index.pages[position], similarity, span)
+            result['lexical_score'] = lexical_scores.get(position, 0.0)
+            result['fusion_score'] = fusion[position]
+            results.append(result)
+        return results
+    
     def search_similar_entries(
         self,
         query: str,
         journal_id: Optional[int] = None,
         top_k: int = 5,
-        min_similarity: float = 0.0
+        min_similarity: float = 0.0,
+        n_probe: Optional[int] = None,
+        query_vector: Optional[List[float]] = None,
+        hybrid: Optional[bool] = None
     ) -> List[Dict[str, Any]]:
         """
         Search for journal entries similar to the query.
         
+        A single journal is scored exactly with one matrix-vector product
+        against its cached, pre-normalized embedding matrix. Searches across
+        all journals use the approximate IVF index (see get_global_index).
+        
+        Single-journal searches are hybrid by default: a BM25 ranking of the
+        query text is fused with the embedding ranking (reciprocal-rank
+        fusion). min_similarity applies to embedding-only hits; pages that
+        match the query terms lexically are kept regardless.
+        
         Args:
             query: The search query text
             journal_id: Optional journal ID to limit search to a specific journal
             top_k: Number of top results to return (default: 5)
             min_similarity: Minimum similarity threshold (default: 0.0)
+            n_probe: Clusters scanned for cross-journal search (default: None, uses ann_n_probe)
+            query_vector: Precomputed embedding of the query; skips embedding generation (default: None)
+            hybrid: Override hybrid_search for this call (default: None)
             
         Returns:
-            List of dictionaries containing page data and similarity scores, sorted by similarity
+            List of dictionaries containing page data and similarity scores, sorted by similarity.
+            'passage' holds the best-matching passage of chunked entries (the full content otherwise)
             
         Raises:
             ValueError: If query is empty or top_k is invalid
             Exception: If search fails
         """
-        if not query or not query.strip():
+        if query_vector is None and (not query or not query.strip()):
             raise ValueError("Query cannot be empty")
         
         if top_k <= 0:
             raise ValueError("top_k must be greater than 0")
         
         try:
-            # Generate query embedding
-            query_embedding = self.generate_query_embedding(query)
+            # Generate query embedding unless the caller already has it
+            if query_vector is None:
+                query_vector = self.generate_query_embedding(query)
+            query_vector = JournalVectorIndex.normalize(query_vector)
             
-            # Collect all pages
-            all_pages = []
+            results = []
             
             if journal_id is not None:
                 # Search in specific journal
-                pages = self.get_all_journal_pages(journal_id)
-                all_pages.extend(pages)
+                index = self.get_journal_index(journal_id)
+                logger.info(f"Searching through {len(index)} total pages")
+                use_hybrid = self.hybrid_search if hybrid is None else hybrid
+                if use_hybrid and not index.hydrated:
+                    # No content to build BM25 from until the index is hydrated
+                    logger.info(f"Journal {journal_id} index not hydrated yet, searching embeddings only")
+                    use_hybrid = False
+                if use_hybrid and query and query.strip():
+                    results = self._hybrid_search(index, query, query_vector, top_k, min_similarity)
+                else:
+                    hits = index.search(query_vector, top_k, min_similarity)
+                    self._fill_content([index.pages[position] for position, _, _ in hits])
+                    for position, similarity, span in hits:
+                        results.append(self._format_result(index.pages[position], similarity, span))
             else:
                 # Search across all journals
-                journals = self.get_all_journals()
-                for journal in journals:
-                    journal_id_from_api = journal.get('id', journal.get('journal_id'))
-                    if journal_id_from_api:
-                        pages = self.get_all_journal_pages(journal_id_from_api)
-                        all_pages.extend(pages)
-            
-            logger.info(f"Searching through {len(all_pages)} total pages")
+                ann_index = self.get_global_index()
+                logger.info(f"Searching through {len(ann_index)} total pages (approximate)")
+                # Over-fetch since several passages of one page can match; keep each page's best
+                seen = set()
+                hits = []
+                candidates = ann_index.search(query_vector, top_k * 4, min_similarity, n_probe=n_probe)
+                for (page_journal_id, page_id, span), similarity in candidates:
+                    page = self._ann_pages.get((page_journal_id, page_id))
+                    if page is None or (page_journal_id, page_id) in seen:
+                        continue
+                    seen.add((page_journal_id, page_id))
+                    hits.append((page, similarity, span))
+                hits = hits[:top_k]
+                self._fill_content([page for page, _, _ in hits])
+                results = [self._format_result(page, similarity, span) for page, similarity, span in hits]
             
-            # Calculate similarities
-            results = []
-            for page in all_pages:
-                # Check if page has embeddings
-                if not page.get('encoding'):
-                    logger.warning(f"Page {page.get('id')} has no embeddings, skipping")
-                    continue
-                
-                # Calculate similarity
-                similarity = self.cosine_similarity(query_embedding, page['encoding'])
-                
-                # Filter by minimum similarity
-                if similarity >= min_similarity:
-                    results.append({
-                        'page_id': page.get('id'),
-                        'journal_id': page.get('journal_id'),
-                        'page_number': page.get('page_number'),
-                        'content': page.get('content'),
-                        'mood': page.get('mood'),
-                        'entry_type': page.get('entry_type'),
-                        'created_at': page.get('created_at'),
-                        'updated_at': page.get('updated_at'),
-                        'similarity_score': similarity
-                    })
-            
-            # Sort by similarity (highest first)
-            results.sort(key=lambda x: x['similarity_score'], reverse=True)
+            # Sort by fused rank when available, else by similarity (highest first)
+            results.sort(key=lambda x: x.get('fusion_score', x['similarity_score']), reverse=True)
             
             # Return top k results
             top_results = results[:top_k]
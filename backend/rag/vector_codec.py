@@ -0,0 +1,88 @@
+"""
+Vector Codec Module
+
+This module converts embedding vectors to and from a compact text form for
+the journal page API. Vectors are stored as base64 little-endian float32 (or
+float16) behind a short format prefix, e.g. "b64f32:AAAgQQAA...", which is
+about a quarter of the size of the equivalent JSON list of floats. Legacy
+pages that store a JSON list are still decoded.
+
+Usage example:
+    from rag.vector_codec import encode_vector, decode_vector
+
+    payload["text_vector"] = encode_vector(vector, "float16")
+    vector = decode_vector(page["encoding"])
+"""
+
+import base64
+import binascii
+import numpy as np
+from typing import List, Any, Optional, Union
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+VECTOR_FORMATS = {
+    "float32": ("b64f32:", np.dtype("<f4")),
+    "float16": ("b64f16:", np.dtype("<f2")),
+}
+
+
+def encode_vector(vector: Any, vector_format: str = "json") -> Union[List[float], str]:
+    """
+    Encode an embedding for storage.
+
+    Args:
+        vector: The embedding vector
+        vector_format: 'json' (plain list of floats), 'float32' or 'float16' (default: 'json')
+
+    Returns:
+        A list of floats for 'json', otherwise a prefixed base64 string
+
+    Raises:
+        ValueError: If vector_format is unknown
+    """
+    if vector_format == "json":
+        return [float(value) for value in vector]
+    if vector_format not in VECTOR_FORMATS:
+        raise ValueError(f"Unknown vector format: {vector_format}")
+
+    prefix, dtype = VECTOR_FORMATS[vector_format]
+    raw = np.asarray(vector, dtype=dtype).tobytes()
+    return prefix + base64.b64encode(raw).decode("ascii")
+
+
+def decode_vector(value: Any) -> Optional[np.ndarray]:
+    """
+    Decode a stored embedding in any supported format.
+
+    float32 payloads are wrapped with np.frombuffer without copying;
+    float16 payloads are widened to float32.
+
+    Args:
+        value: A list of floats, a prefixed base64 string, or an array
+
+    Returns:
+        1D float32 array, or None if the value is not a decodable vector
+    """
+    if isinstance(value, np.ndarray):
+        return value if value.size else None
+    if isinstance(value, (list, tuple)):
+        return np.asarray(value, dtype=np.float32) if value else None
+    if not isinstance(value, str):
+        return None
+
+    for prefix, dtype in VECTOR_FORMATS.values():
+        if value.startswith(prefix):
+            try:
+                raw = base64.b64decode(value[len(prefix):], validate=True)
+            except (binascii.Error, ValueError) as e:
+                logger.warning(f"Invalid base64 vector payload: {str(e)}")
+                return None
+            if not raw or len(raw) % dtype.itemsize:
+                return None
+            vector = np.frombuffer(raw, dtype=dtype)
+            return vector if dtype == np.float32 else vector.astype(np.float32)
+    return None
@@ -0,0 +1,577 @@
+"""
+Vector Index Module
+
+This module keeps the page encodings of a single journal in memory as one
+pre-normalized, contiguous float32 matrix so that a query can be scored
+against every page with a single matrix-vector product. Long entries may
+contribute one row per passage; a page scores as its best passage.
+
+Usage example:
+    from rag.vector_index import JournalVectorIndex
+
+    index = JournalVectorIndex.from_pages(journal_id=1, pages=pages)
+    query = JournalVectorIndex.normalize(query_embedding)
+    for page, score, span in index.search(query, top_k=5, min_similarity=0.3):
+        print(index.pages[page]['content'], score)
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+import numpy as np
+from typing import List, Dict, Any, Optional, Tuple
+import logging
+
+from rag.vector_codec import decode_vector
+from rag.bm25_index import BM25Index
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Page fields written to snapshot sidecars. Entry text is left out (the API
+# stores it encrypted); a loaded snapshot gets it back from the next listing.
+SNAPSHOT_PAGE_FIELDS = ('id', 'journal_id', 'created_at', 'updated_at')
+
+
+class JournalVectorIndex:
+    """In-process embedding matrix for the pages of one journal."""
+
+    def __init__(self, journal_id: int, initial_capacity: int = 64):
+        """
+        Initialize an empty index.
+
+        Args:
+            journal_id: The ID of the journal this index belongs to
+            initial_capacity: Number of rows to reserve before the first resize (default: 64)
+        """
+        self.journal_id = journal_id
+        self.dimension: Optional[int] = None
+        self.pages: List[Dict[str, Any]] = []
+        self.built_at = time.monotonic()
+        self.checked_at = self.built_at
+        self.etag: Optional[str] = None
+        self.latest_stamp: Optional[str] = None
+        self._page_positions: Dict[Any, int] = {}
+        self._initial_capacity = max(1, initial_capacity)
+        self._buffer: Optional[np.ndarray] = None
+        self._rows = 0
+        self._page_starts: List[int] = []
+        self._starts_array: Optional[np.ndarray] = None
+        self._spans: List[Optional[Tuple[int, int]]] = []
+        self.dirty = False
+        # False for indexes loaded from a snapshot until hydrate() restores page content
+        self.hydrated = True
+        self.lexical = BM25Index()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_pages(
+        cls,
+        journal_id: int,
+        pages: List[Dict[str, Any]],
+        previous: Optional["JournalVectorIndex"] = None
+    ) -> "JournalVectorIndex":
+        """
+        Build an index from journal pages as returned by the API.
+
+        Args:
+            journal_id: The ID of the journal
+            pages: List of journal page dictionaries
+            previous: Index being replaced; its passage vectors are kept for
+                unchanged pages that come back without 'chunk_vectors' (default: None)
+
+        Returns:
+            A populated JournalVectorIndex
+        """
+        if previous is not None:
+            pages = [previous.with_passages(page) for page in pages]
+        index = cls(journal_id, initial_capacity=len(pages) or 64)
+        added = index.add_pages(pages)
+        logger.info(f"Built vector index for journal {journal_id} with {added} pages")
+        return index
+
+    @staticmethod
+    def _sidecar_path(directory: str, journal_id: int) -> str:
+        """Return the path of a journal's snapshot sidecar."""
+        return os.path.join(directory, f"journal_{journal_id}.json")
+
+    def save(self, directory: str) -> None:
+        """
+        Persist the index as a .npy matrix plus a JSON sidecar.
+
+        The matrix is written under a unique name and the sidecar, which
+        points to it, is swapped in last with an atomic rename, so readers
+        never see a matrix and sidecar from different versions. The sidecar
+        keeps only SNAPSHOT_PAGE_FIELDS of each page, never its content.
+
+        Args:
+            directory: Snapshot directory (created if missing)
+        """
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            matrix = self.matrix
+            sidecar = {
+                'journal_id': self.journal_id,
+                'dimension': self.dimension,
+                'rows': self._rows,
+                'etag': self.etag,
+                'latest_stamp': self.latest_stamp,
+                'pages': [
+                    {key: page[key] for key in SNAPSHOT_PAGE_FIELDS if key in page}
+                    for page in self.pages
+                ],
+                'page_starts': list(self._page_starts),
+                'spans': list(self._spans),
+            }
+            self.dirty = False
+
+        vectors_name = f"journal_{self.journal_id}.{uuid.uuid4().hex}.npy"
+        sidecar['vectors_file'] = vectors_name
+        sidecar_path = self._sidecar_path(directory, self.journal_id)
+        previous = self._read_sidecar(sidecar_path)
+
+        temp_path = os.path.join(directory, vectors_name + ".tmp")
+        with open(temp_path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(matrix, dtype=np.float32))
+        os.replace(temp_path, os.path.join(directory, vectors_name))
+
+        temp_path = sidecar_path + f".{uuid.uuid4().hex}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(sidecar, f, default=str)
+        os.replace(temp_path, sidecar_path)
+
+        if previous and previous.get('vectors_file') not in (None, vectors_name):
+            try:
+                # Processes that still map the old file keep their view until they reload
+                os.remove(os.path.join(directory, previous['vectors_file']))
+            except OSError:
+                pass
+        logger.info(f"Saved snapshot of journal {self.journal_id} ({len(sidecar['pages'])} pages)")
+
+    @staticmethod
+    def _read_sidecar(path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @classmethod
+    def load(cls, directory: str, journal_id: int) -> Optional["JournalVectorIndex"]:
+        """
+        Open a saved index with its matrix memory-mapped read-only.
+
+        The mapped pages are shared through the OS page cache by every
+        process that loads the same snapshot. The first append copies the
+        matrix into private memory. Pages come back without content (and so
+        without a BM25 index) until hydrate() is called with a page listing.
+
+        Args:
+            directory: Snapshot directory
+            journal_id: The ID of the journal
+
+        Returns:
+            The loaded index, or None if there is no usable snapshot
+        """
+        sidecar = cls._read_sidecar(cls._sidecar_path(directory, journal_id))
+        if not sidecar or not sidecar.get('vectors_file'):
+            return None
+        try:
+            matrix = np.load(os.path.join(directory, sidecar['vectors_file']), mmap_mode='r')
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not open snapshot of journal {journal_id}: {str(e)}")
+            return None
+        if matrix.ndim != 2 or matrix.shape[0] != sidecar['rows'] or (
+            sidecar['rows'] and matrix.shape[1] != sidecar['dimension']
+        ):
+            logger.warning(f"Snapshot of journal {journal_id} is inconsistent, ignoring it")
+            return None
+
+        index = cls(journal_id)
+        index.dimension = sidecar['dimension']
+        index.etag = sidecar.get('etag')
+        index.latest_stamp = sidecar.get('latest_stamp')
+        index.pages = sidecar['pages']
+        index._page_starts = sidecar['page_starts']
+        index._spans = [tuple(span) if span else None for span in sidecar['spans']]
+        index._rows = sidecar['rows']
+        index._buffer = matrix if sidecar['rows'] else None
+        index._page_positions = {
+            page.get('id'): position
+            for position, page in enumerate(index.pages)
+            if page.get('id') is not None
+        }
+        index.hydrated = False
+        logger.info(f"Loaded snapshot of journal {journal_id} ({len(index.pages)} pages, memory-mapped)")
+        return index
+
+    def hydrate(self, pages: List[Dict[str, Any]]) -> None:
+        """
+        Restore page metadata and content of a snapshot-loaded index from an API listing.
+
+        Rebuilds the BM25 index from the fetched content. Pages missing from
+        the listing keep their snapshot fields (the index is rebuilt anyway,
+        see is_current).
+
+        Args:
+            pages: Full list of journal pages as currently returned by the API
+        """
+        with self._lock:
+            for page in pages:
+                position = self._page_positions.get(page.get('id'))
+                if position is not None:
+                    self.pages[position] = {
+                        key: value for key, value in page.items()
+                        if key not in ('encoding', 'text_vector', 'chunk_vectors')
+                    }
+            self.lexical = BM25Index()
+            for position, page in enumerate(self.pages):
+                self.lexical.add_document(position, page.get('content'))
+            self.hydrated = True
+
+    @staticmethod
+    def normalize(vectors: Any) -> np.ndarray:
+        """
+        Convert vectors to float32 and scale them to unit length.
+
+        Zero vectors are left as zeros so they always score 0.0.
+
+        Args:
+            vectors: A single vector or a 2D array of row vectors
+
+        Returns:
+            Contiguous float32 array with the same shape as the input
+        """
+        array = np.ascontiguousarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(array, axis=-1, keepdims=True)
+        np.divide(array, norms, out=array, where=norms > 0)
+        return array
+
+    @staticmethod
+    def page_stamp(page: Dict[str, Any]) -> Optional[str]:
+        """
+        Return the last-modified timestamp of a page (updated_at, else created_at).
+
+        Args:
+            page: Journal page dictionary
+
+        Returns:
+            ISO timestamp string, or None if the page carries neither field
+        """
+        return page.get('updated_at') or page.get('created_at')
+
+    @staticmethod
+    def page_encoding(page: Dict[str, Any]) -> Optional[Any]:
+        """
+        Return the stored embedding of a page, or None if it has none.
+
+        Reads 'encoding' (falling back to 'text_vector') in either the legacy
+        JSON list format or the compact base64 format (see rag.vector_codec).
+
+        Args:
+            page: Journal page dictionary
+
+        Returns:
+            1D float32 array, or None
+        """
+        for field in ('encoding', 'text_vector'):
+            vector = decode_vector(page.get(field))
+            if vector is not None:
+                return vector
+        return None
+
+    @classmethod
+    def page_vectors(cls, page: Dict[str, Any]) -> Tuple[Optional[np.ndarray], List[Optional[Tuple[int, int]]]]:
+        """
+        Return every vector stored for a page, with the passage each one covers.
+
+        Long entries carry one vector per passage in 'chunk_vectors'
+        ([{"start": 0, "end": 1500, "vector": ...}, ...]); other pages have a
+        single whole-entry vector whose span is None.
+
+        Args:
+            page: Journal page dictionary
+
+        Returns:
+            Tuple of (2D float32 array or None, list of (start, end) spans)
+        """
+        vectors = []
+        spans = []
+        for chunk in page.get('chunk_vectors') or []:
+            vector = decode_vector(chunk.get('vector')) if isinstance(chunk, dict) else None
+            if vector is None or (vectors and len(vector) != len(vectors[0])):
+                continue
+            vectors.append(vector)
+            spans.append((chunk.get('start', 0), chunk.get('end')))
+        if vectors:
+            return np.stack(vectors), spans
+
+        encoding = cls.page_encoding(page)
+        if encoding is None:
+            return None, []
+        return encoding[np.newaxis, :], [None]
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """Normalized vectors; pages with passage vectors span several consecutive rows."""
+        if self._buffer is None:
+            return np.empty((0, self.dimension or 0), dtype=np.float32)
+        return self._buffer[:self._rows]
+
+    def _starts(self) -> np.ndarray:
+        """First matrix row of each page."""
+        if self._starts_array is None:
+            self._starts_array = np.asarray(self._page_starts, dtype=np.int64)
+        return self._starts_array
+
+    def snapshot(self) -> Tuple[List[Dict[str, Any]], np.ndarray, np.ndarray, List[Optional[Tuple[int, int]]]]:
+        """
+        Return a consistent view of the page metadata and their vectors.
+
+        Returns:
+            Tuple of (pages, matrix, row_pages, spans) where row_pages[i] is the
+            index in `pages` of matrix row i and spans[i] is its passage (or None)
+        """
+        with self._lock:
+            starts = self._starts()
+            counts = np.diff(np.append(starts, self._rows))
+            row_pages = np.repeat(np.arange(len(self.pages)), counts)
+            return list(self.pages), self.matrix, row_pages, list(self._spans)
+
+    def __len__(self) -> int:
+        return len(self.pages)
+
+    def __contains__(self, page_id: Any) -> bool:
+        return page_id in self._page_positions
+
+    @property
+    def page_ids(self) -> set:
+        """IDs of the pages currently held by the index."""
+        return set(self._page_positions)
+
+    def page_rows(self, page_id: Any) -> Tuple[Dict[str, Any], np.ndarray, List[Optional[Tuple[int, int]]]]:
+        """
+        Return the metadata, normalized vectors and passage spans stored for one page.
+
+        Args:
+            page_id: ID of an indexed page
+
+        Returns:
+            Tuple of (page metadata, 2D float32 array, list of spans)
+
+        Raises:
+            KeyError: If the page is not in the index
+        """
+        with self._lock:
+            position = self._page_positions[page_id]
+            first = self._page_starts[position]
+            last = self._page_starts[position + 1] if position + 1 < len(self._page_starts) else self._rows
+            return self.pages[position], self._buffer[first:last], self._spans[first:last]
+
+    def with_passages(self, page: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Add the passage vectors held by this index to a listed page that lacks them.
+
+        The pages API doesn't document 'chunk_vectors', so a listing may not
+        return them; the index (and its snapshot) is then their only copy.
+        Pages edited since they were indexed are returned unchanged.
+
+        Args:
+            page: Journal page dictionary from an API listing
+
+        Returns:
+            The page, or a copy of it with 'chunk_vectors' restored
+        """
+        if page.get('chunk_vectors') or page.get('id') not in self._page_positions:
+            return page
+        indexed, rows, spans = self.page_rows(page.get('id'))
+        if all(span is None for span in spans) or self.page_stamp(indexed) != self.page_stamp(page):
+            return page
+        return {
+            **page,
+            'chunk_vectors': [
+                {'start': span[0], 'end': span[1], 'vector': row.tolist()}
+                for row, span in zip(rows, spans)
+            ]
+        }
+
+    def is_current(self, pages: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Compare the index with a fresh page listing from the API.
+
+        Args:
+            pages: Full list of journal pages as currently returned by the API
+
+        Returns:
+            The pages missing from the index if the index can be brought up to
+            date by appending them (an empty list when it is already current),
+            or None if existing pages changed or disappeared and a rebuild is needed
+        """
+        remote_ids = set()
+        missing = []
+        for page in pages:
+            page_id = page.get('id')
+            remote_ids.add(page_id)
+            if page_id in self._page_positions:
+                stamp = self.page_stamp(page)
+                if stamp and self.latest_stamp and stamp > self.latest_stamp:
+                    return None
+            elif self.page_vectors(page)[0] is not None:
+                missing.append(page)
+        if not self._page_positions.keys() <= remote_ids:
+            return None
+        return missing
+
+    def _reserve(self, rows: int) -> None:
+        """Grow the backing buffer geometrically so appends stay amortized O(1)."""
+        needed = self._rows + rows
+        capacity = 0 if self._buffer is None else self._buffer.shape[0]
+        if needed <= capacity and self._buffer.flags.writeable:
+            return
+        new_capacity = max(needed, capacity * 2, self._initial_capacity)
+        new_buffer = np.empty((new_capacity, self.dimension), dtype=np.float32)
+        if self._rows:
+            new_buffer[:self._rows] = self._buffer[:self._rows]
+        self._buffer = new_buffer
+
+    def add_pages(self, pages: List[Dict[str, Any]]) -> int:
+        """
+        Append pages to the index.
+
+        Pages without an encoding, or whose encoding does not match the
+        index dimension, are skipped.
+
+        Args:
+            pages: List of journal page dictionaries
+
+        Returns:
+            Number of pages actually added
+        """
+        blocks = []
+        spans = []
+        metadata = []
+        for page in pages:
+            if page.get('id') is not None and page.get('id') in self._page_positions:
+                continue
+            vectors, page_spans = self.page_vectors(page)
+            if vectors is None:
+                logger.warning(f"Page {page.get('id')} has no embeddings, skipping")
+                continue
+            dimension = self.dimension or vectors.shape[1]
+            if vectors.shape[1] != dimension:
+                logger.warning(
+                    f"Page {page.get('id')} has embedding dimension {vectors.shape[1]}, "
+                    f"expected {dimension}, skipping"
+                )
+                continue
+            self.dimension = dimension
+            blocks.append(vectors)
+            spans.extend(page_spans)
+            metadata.append({
+                key: value for key, value in page.items()
+                if key not in ('encoding', 'text_vector', 'chunk_vectors')
+            })
+
+        if not blocks:
+            return 0
+
+        rows = self.normalize(np.concatenate(blocks))
+        with self._lock:
+            self._reserve(len(rows))
+            self._buffer[self._rows:self._rows + len(rows)] = rows
+            offset = self._rows
+            for block in blocks:
+                self._page_starts.append(offset)
+                offset += len(block)
+            self._starts_array = None
+            self._spans.extend(spans)
+            for page in metadata:
+                if page.get('id') is not None:
+                    self._page_positions[page.get('id')] = len(self.pages)
+                self.lexical.add_document(len(self.pages), page.get('content'))
+                self.pages.append(page)
+            self._rows += len(rows)
+            self.dirty = True
+            for page in metadata:
+                stamp = self.page_stamp(page)
+                if stamp and (self.latest_stamp is None or stamp > self.latest_stamp):
+                    self.latest_stamp = stamp
+        return len(metadata)
+
+    def search(
+        self,
+        query_vector: np.ndarray,
+        top_k: int = 5,
+        min_similarity: float = 0.0,
+        positions: Optional[Any] = None
+    ) -> List[Tuple[int, float, Optional[Tuple[int, int]]]]:
+        """
+        Score pages against a normalized query vector.
+
+        A page with several passage vectors scores as its best passage (max-sim).
+
+        Args:
+            query_vector: Unit-length float32 query vector (see `normalize`)
+            top_k: Number of top results to return (default: 5)
+            min_similarity: Minimum similarity threshold (default: 0.0)
+            positions: Only score these page indexes, e.g. a lexical prefilter (default: None, all pages)
+
+        Returns:
+            List of (page index, similarity, best passage span or None) tuples,
+            sorted by similarity, highest first
+        """
+        with self._lock:
+            rows = self._rows
+            matrix = self.matrix
+            starts = self._starts()
+            spans = self._spans
+        size = len(starts)
+        if size == 0 or top_k <= 0:
+            return []
+        if query_vector.shape[-1] != self.dimension:
+            logger.warning(
+                f"Query dimension {query_vector.shape[-1]} does not match "
+                f"journal {self.journal_id} index dimension {self.dimension}"
+            )
+            return []
+
+        ends = np.append(starts[1:], rows)
+        if positions is None:
+            pages = np.arange(size)
+            row_index = None
+            scores = matrix @ query_vector
+            page_starts = starts
+        else:
+            pages = np.unique(np.asarray(list(positions), dtype=np.int64))
+            if len(pages) == 0:
+                return []
+            counts = ends[pages] - starts[pages]
+            page_starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            # Row numbers of the selected pages, laid out contiguously per page
+            row_index = np.repeat(starts[pages] - page_starts, counts) + np.arange(counts.sum())
+            scores = matrix[row_index] @ query_vector
+
+        single_row = len(scores) == len(pages)
+        page_scores = scores if single_row else np.maximum.reduceat(scores, page_starts)
+        k = min(top_k, len(pages))
+        if k < len(pages):
+            candidates = np.argpartition(-page_scores, k - 1)[:k]
+        else:
+            candidates = np.arange(len(pages))
+        candidates = candidates[np.argsort(-page_scores[candidates], kind='stable')]
+
+        results = []
+        for candidate in candidates:
+            if page_scores[candidate] < min_similarity:
+                continue
+            page = pages[candidate]
+            first = page_starts[candidate]
+            last = first + ends[page] - starts[page]
+            best_row = first + int(np.argmax(scores[first:last]))
+            if row_index is not None:
+                best_row = row_index[best_row]
+            results.append((int(page), float(page_scores[candidate]), spans[best_row]))
+        return results
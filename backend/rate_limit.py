@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter: `rate` tokens per second, bursts of up to
+    `capacity`. acquire() waits (FIFO) for tokens; try_acquire() never waits.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock: asyncio.Lock | None = None
+        self._counters = {"granted": 0, "rejected": 0, "waited": 0, "total_wait_ms": 0.0}
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Takes tokens if they're available right now."""
+        self._refill()
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            self._counters["granted"] += 1
+            return True
+        self._counters["rejected"] += 1
+        return False
+
+    def wait_time(self, tokens: float = 1.0) -> float:
+        """Seconds until tokens are available (0 if they are now). Takes nothing."""
+        self._refill()
+        return max(0.0, (tokens - self._tokens) / self.rate)
+
+    async def acquire(self, tokens: float = 1.0) -> float:
+        """Waits until tokens are available and takes them. Returns the wait in seconds."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        started = time.monotonic()
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+        waited = time.monotonic() - started
+        self._counters["granted"] += 1
+        if waited > 0.001:
+            self._counters["waited"] += 1
+            self._counters["total_wait_ms"] += waited * 1000
+        return waited
+
+    def stats(self) -> dict:
+        self._refill()
+        counters = dict(self._counters)
+        counters["rate"] = self.rate
+        counters["capacity"] = self.capacity
+        counters["available"] = round(self._tokens, 2)
+        return counters
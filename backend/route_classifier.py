@@ -0,0 +1,67 @@
+import re
+
+# Explicit, high-distress phrasing -> the Guide, without asking the LLM
+_DISTRESS = re.compile(
+    r"\b(can'?t|cannot) breathe\b|\bpanic(king| attack)\b|\bhyperventilat\w*|"
+    r"\bheart is (racing|pounding)\b|\bfreaking out\b|\bhaving an? (panic|anxiety) attack\b",
+    re.IGNORECASE,
+)
+
+# Anything that could make an entry actionable: a question, an invocation, a goal,
+# a pattern, a memory lookup or a distress signal. If none match, it's a reflection.
+_ACTIONABLE = re.compile(
+    r"\?|\bclarity\b|"
+    r"\b(why|how|when|what|who|where|which|should|could|would|can|do|does|did|is|are)\b\s+(i|we|my|you)\b|"
+    r"\b(help|advice|plan|goal|figure out|need to|have to|want to|going to|trying to|decide|fix|solve)\b|"
+    r"\b(always|never|every time|keep|again|pattern|habit|remember|last (week|month|year|time))\b|"
+    r"\b(overwhelm\w*|anxious|anxiety|scared|afraid|terrified|hopeless|worthless|desperate|"
+    r"suicid\w*|kill|hurt|die|dying|alone|crying|stress\w*|depress\w*|terrible|awful)\b",
+    re.IGNORECASE,
+)
+
+
+class FastRouteClassifier:
+    """
+    Cheap in-process pre-classifier for the Orchestrator.
+    Confident cases are decided locally: explicit panic/breathing distress
+    goes to the Guide, and short reflections with no actionable signal are
+    NONE. Everything else returns None and goes to the LLM. In shadow mode
+    the LLM is still called and record_shadow() tracks agreement.
+    """
+
+    def __init__(self, max_none_chars: int = 600):
+        # Long entries carry more nuance; leave them to the LLM
+        self.max_none_chars = max_none_chars
+        self._counters = {"local_none": 0, "local_guide": 0, "deferred": 0, "shadow_agree": 0, "shadow_disagree": 0}
+        self._disagreements: dict[str, int] = {}
+
+    def classify(self, text: str) -> str | None:
+        """Returns "NONE" or "Guide" when confident, otherwise None (ask the LLM)."""
+        if _DISTRESS.search(text):
+            self._counters["local_guide"] += 1
+            return "Guide"
+        if len(text) <= self.max_none_chars and not _ACTIONABLE.search(text):
+            self._counters["local_none"] += 1
+            return "NONE"
+        self._counters["deferred"] += 1
+        return None
+
+    def record_shadow(self, local_route: str, llm_route: str) -> bool:
+        """Records whether a local decision matched the LLM's; returns True on agreement."""
+        if local_route == llm_route:
+            self._counters["shadow_agree"] += 1
+            return True
+        self._counters["shadow_disagree"] += 1
+        key = f"{local_route}->{llm_route}"
+        self._disagreements[key] = self._disagreements.get(key, 0) + 1
+        return False
+
+    def stats(self) -> dict:
+        counters = dict(self._counters)
+        decided = counters["local_none"] + counters["local_guide"]
+        total = decided + counters["deferred"]
+        compared = counters["shadow_agree"] + counters["shadow_disagree"]
+        counters["local_ratio"] = decided / total if total else 0.0
+        counters["shadow_agreement"] = counters["shadow_agree"] / compared if compared else 0.0
+        counters["disagreements"] = dict(self._disagreements)
+        return counters
@@ -0,0 +1,93 @@
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+
+class StageGraph:
+    """
+    Small DAG of async stages for one request.
+    Each stage is a coroutine function that receives the results of its
+    dependencies, in order. A stage starts as soon as its dependencies
+    finish, so independent stages run at the same time. Stages that turn
+    out to be unneeded (e.g. speculative prefetches) can be cancelled.
+    """
+
+    def __init__(self, name: str = "pipeline"):
+        self.name = name
+        self._stages: dict[str, tuple[Callable[..., Awaitable], tuple[str, ...]]] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._created = time.perf_counter()
+        self.timings: dict[str, float] = {}
+
+    def add(self, name: str, fn: Callable[..., Awaitable], *deps: str) -> "StageGraph":
+        """Registers a stage. Dependencies must already be registered."""
+        missing = [dep for dep in deps if dep not in self._stages]
+        if missing:
+            raise ValueError(f"Stage '{name}' depends on unknown stages: {missing}")
+        self._stages[name] = (fn, deps)
+        return self
+
+    def start(self, *names: str) -> "StageGraph":
+        """Schedules the given stages (and, transitively, their dependencies)."""
+        for name in names:
+            self._task(name)
+        return self
+
+    async def result(self, name: str):
+        """Awaits a stage's result, starting it if it isn't running yet."""
+        return await self._task(name)
+
+    def cancel(self, name: str) -> None:
+        """Drops a stage's result; its dependencies keep running."""
+        task = self._tasks.get(name)
+        if task and not task.done():
+            task.cancel()
+            self.timings[f"{name}_cancelled"] = self._elapsed_ms()
+
+    def mark(self, label: str) -> None:
+        """Records a milestone (e.g. first token) as an offset from graph creation."""
+        self.timings[f"{label}_at"] = self._elapsed_ms()
+
+    def _task(self, name: str) -> asyncio.Task:
+        if name not in self._tasks:
+            fn, deps = self._stages[name]
+            dep_tasks = [self._task(dep) for dep in deps]
+            task = asyncio.create_task(self._run(name, fn, dep_tasks))
+            task.add_done_callback(self._consume_exception)
+            self._tasks[name] = task
+        return self._tasks[name]
+
+    async def _run(self, name: str, fn: Callable[..., Awaitable], dep_tasks: list):
+        # shield() so cancelling one stage never cancels a shared dependency
+        inputs = [await asyncio.shield(task) for task in dep_tasks]
+        started = time.perf_counter()
+        try:
+            return await fn(*inputs)
+        finally:
+            self.timings[name] = (time.perf_counter() - started) * 1000
+            self.timings[f"{name}_done_at"] = self._elapsed_ms()
+
+    def _elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._created) * 1000
+
+    @staticmethod
+    def _consume_exception(task: asyncio.Task) -> None:
+        # Failures surface through result(); this silences
+        # "exception was never retrieved" for stages nobody awaited.
+        if not task.cancelled():
+            task.exception()
+
+    def report(self) -> str:
+        """One-line summary of stage durations and completion offsets, in ms."""
+        parts = [
+            f"{name}={self.timings[name]:.0f}ms(@{self.timings[f'{name}_done_at']:.0f})"
+            for name in self._stages if name in self.timings
+        ]
+        parts += [
+            f"{key[:-3]}@{value:.0f}" for key, value in self.timings.items()
+            if key.endswith("_at") and not key.endswith("_done_at")
+        ]
+        cancelled = [name for name in self._stages if f"{name}_cancelled" in self.timings]
+        if cancelled:
+            parts.append(f"cancelled={','.join(cancelled)}")
+        return f"{self.name}: " + " ".join(parts)
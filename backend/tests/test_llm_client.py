@@ -0,0 +1,165 @@
+import asyncio
+import time
+
+import pytest
+
+import llm_client
+from fake_llm import FakeGenerativeModel, FakeResponse, FakeUpstreamError
+from llm_client import LLMCallError, ResilientModel
+
+
+class ScriptedModel(FakeGenerativeModel):
+    """FakeGenerativeModel whose n-th request takes delays[n] seconds and raises errors[n] (if set)."""
+
+    def __init__(self, delays, errors=(), **kwargs):
+        super().__init__(**kwargs)
+        self.delays = list(delays)
+        self.errors = list(errors)
+
+    async def generate_content_async(self, contents, stream: bool = False, **kwargs):
+        request = self.requests
+        self.requests += 1
+        await asyncio.sleep(self.delays[min(request, len(self.delays) - 1)])
+        if request < len(self.errors) and self.errors[request] is not None:
+            raise self.errors[request]
+        return self._stream() if stream else FakeResponse(f"reply {request}")
+
+
+def test_deadline_cuts_off_a_slow_call():
+    async def run():
+        client = ResilientModel(FakeGenerativeModel(latency=2.0, jitter=0.0), timeout=0.2, max_retries=0)
+        started = time.monotonic()
+        with pytest.raises(LLMCallError) as error:
+            await client.generate(["x"], name="slow")
+        return time.monotonic() - started, error.value, client.stats()["slow"]
+
+    elapsed, error, stats = asyncio.run(run())
+    assert elapsed < 0.5
+    assert isinstance(error.cause, asyncio.TimeoutError)
+    assert stats["timeouts"] == 1 and stats["failures"] == 1
+
+
+def test_attempt_timeout_retries_a_stuck_attempt():
+    async def run():
+        model = ScriptedModel(delays=[2.0, 0.01])
+        client = ResilientModel(model, timeout=1.0, max_retries=2, backoff_base=0.01)
+        response = await client.generate(["x"], name="stuck", attempt_timeout=0.1)
+        return response, model.requests, client.stats()["stuck"]
+
+    response, requests, stats = asyncio.run(run())
+    assert response.text == "reply 1"
+    assert requests == 2
+    assert stats["retries"] == 1 and stats["timeouts"] == 1
+
+
+def test_transient_errors_are_retried_until_retries_run_out():
+    async def run():
+        model = FakeGenerativeModel(latency=0.0, jitter=0.0, error_rate=1.0, error_code=503)
+        client = ResilientModel(model, max_retries=2, backoff_base=0.001)
+        with pytest.raises(LLMCallError) as error:
+            await client.generate(["x"], name="flaky")
+        return model.requests, error.value
+
+    requests, error = asyncio.run(run())
+    assert requests == 3
+    assert error.attempts == 3
+    assert isinstance(error.cause, FakeUpstreamError)
+
+
+def test_permanent_errors_are_not_retried():
+    async def run():
+        model = FakeGenerativeModel(latency=0.0, jitter=0.0, error_rate=1.0, error_code=400)
+        client = ResilientModel(model, max_retries=2)
+        with pytest.raises(LLMCallError):
+            await client.generate(["x"], name="bad")
+        return model.requests
+
+    assert asyncio.run(run()) == 1
+
+
+def test_backoff_is_full_jitter(monkeypatch):
+    bounds = []
+
+    def uniform(low, high):
+        bounds.append((low, high))
+        return 0.0
+
+    monkeypatch.setattr(llm_client.random, "uniform", uniform)
+
+    async def run():
+        model = ScriptedModel(delays=[0.0], errors=[FakeUpstreamError(503)] * 3)
+        client = ResilientModel(model, max_retries=3, backoff_base=0.25, backoff_max=0.75)
+        return await client.generate(["x"], name="jitter")
+
+    assert asyncio.run(run()).text == "reply 3"
+    # Uniform over [0, min(backoff_max, base * 2 ** attempt)]
+    assert bounds == [(0, 0.5), (0, 0.75), (0, 0.75)]
+
+
+def test_hedge_is_sent_after_p95_and_first_response_wins():
+    async def run():
+        model = ScriptedModel(delays=[0.01] * 20 + [2.0, 0.01])
+        client = ResilientModel(model, timeout=5.0, hedge_delay=10.0, hedge_min_samples=20)
+        for _ in range(20):
+            await client.generate(["x"], name="orchestrator", hedge=True)
+        started = time.monotonic()
+        response = await client.generate(["x"], name="orchestrator", hedge=True)
+        return time.monotonic() - started, response, client.stats()["orchestrator"]
+
+    elapsed, response, stats = asyncio.run(run())
+    # The hedge went out after the ~10ms p95, not after the 10s default delay
+    assert elapsed < 0.5
+    assert response.text == "reply 21"
+    assert stats["hedges"] == 1 and stats["hedge_wins"] == 1
+
+
+def test_no_hedge_when_the_primary_is_fast():
+    async def run():
+        model = FakeGenerativeModel(latency=0.01, jitter=0.0)
+        client = ResilientModel(model, hedge_delay=0.5)
+        await client.generate(["x"], name="orchestrator", hedge=True)
+        return model.requests, client.stats()["orchestrator"]["hedges"]
+
+    assert asyncio.run(run()) == (1, 0)
+
+
+def test_stream_yields_every_chunk():
+    async def run():
+        client = ResilientModel(FakeGenerativeModel(text="one two three", latency=0.0, chunk_delay=0.0))
+        stream = await client.stream(["x"], name="stream")
+        return [chunk.text async for chunk in stream]
+
+    assert asyncio.run(run()) == ["one ", "two ", "three "]
+
+
+def test_mid_stream_errors_are_wrapped_in_llm_call_error():
+    class BrokenStream(FakeGenerativeModel):
+        async def _stream(self):
+            yield FakeResponse("partial ")
+            raise ConnectionResetError("connection reset")
+
+    async def run():
+        client = ResilientModel(BrokenStream(latency=0.0))
+        stream = await client.stream(["x"], name="stream")
+        chunks = []
+        with pytest.raises(LLMCallError) as error:
+            async for chunk in stream:
+                chunks.append(chunk.text)
+        return chunks, error.value, client.stats()["stream"]
+
+    chunks, error, stats = asyncio.run(run())
+    assert chunks == ["partial "]
+    assert isinstance(error.cause, ConnectionResetError)
+    assert stats["stream_failures"] == 1
+
+
+def test_stalled_stream_raises_llm_call_error():
+    async def run():
+        client = ResilientModel(FakeGenerativeModel(text="a b", latency=0.0, chunk_delay=1.0))
+        stream = await client.stream(["x"], name="stream", idle_timeout=0.05)
+        with pytest.raises(LLMCallError):
+            async for _ in stream:
+                pass
+        return client.stats()["stream"]["stream_stalls"]
+
+    assert asyncio.run(run()) == 1
@@ -0,0 +1,34 @@
+import asyncio
+
+from admission import AdmissionController, OverloadedError
+from tts_stream import SentenceAudioStream
+
+
+def test_multi_sentence_reply_keeps_every_sentence_under_per_user_limit():
+    async def run():
+        tts = AdmissionController("tts", max_concurrency=8, per_user_limit=4)
+        sent = []
+
+        async def synthesize(sentence: str):
+            try:
+                async with tts.admit("user-1"):
+                    await asyncio.sleep(0.01)
+                    return sentence.encode("utf-8")
+            except OverloadedError:
+                return None
+
+        async def send(seq: int, sentence: str, audio_bytes: bytes | None):
+            sent.append((seq, audio_bytes))
+
+        stream = SentenceAudioStream(synthesize, send, min_chars=1, max_concurrency=3)
+        for i in range(8):
+            stream.feed(f"Sentence number {i}. ")
+        count = await stream.finish()
+        return count, sent, tts.stats()
+
+    count, sent, stats = asyncio.run(run())
+
+    assert count == 8
+    assert [seq for seq, _ in sent] == list(range(8))
+    assert all(audio_bytes for _, audio_bytes in sent)
+    assert stats["shed_user_limit"] == 0
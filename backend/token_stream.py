@@ -0,0 +1,72 @@
+import asyncio
+from typing import Awaitable, Callable
+
+
+class TokenCoalescer:
+    """
+    Batches streamed model tokens into fewer WebSocket frames.
+    Pending text is flushed once it reaches flush_chars characters or has
+    waited flush_ms milliseconds, whichever comes first. The full reply is
+    accumulated in a list and joined once, instead of repeated `+=`.
+    """
+
+    def __init__(self, send: Callable[[str], Awaitable[None]], flush_ms: float = 40.0, flush_chars: int = 48):
+        self.send = send
+        self.flush_delay = flush_ms / 1000
+        self.flush_chars = flush_chars
+        self.frames = 0
+        self.tokens = 0
+        self._parts: list[str] = []
+        self._pending: list[str] = []
+        self._pending_chars = 0
+        self._timer: asyncio.Task | None = None
+        self._send_lock = asyncio.Lock()
+
+    @property
+    def text(self) -> str:
+        """Everything added so far."""
+        return "".join(self._parts)
+
+    async def add(self, token: str) -> None:
+        """Queues a token, flushing if the size threshold is reached."""
+        if not token:
+            return
+        self.tokens += 1
+        self._parts.append(token)
+        self._pending.append(token)
+        self._pending_chars += len(token)
+        if self._pending_chars >= self.flush_chars or self.flush_delay <= 0:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def flush(self) -> None:
+        """Sends pending text as one frame."""
+        # The timer is only set while it is still sleeping, so cancelling can't interrupt a send
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        payload = "".join(self._pending)
+        self._pending = []
+        self._pending_chars = 0
+        async with self._send_lock:
+            await self.send(payload)
+        self.frames += 1
+
+    async def close(self) -> str:
+        """Flushes the remainder and returns the full text."""
+        await self.flush()
+        return self.text
+
+    def cancel(self) -> None:
+        """Stops the flush timer without sending (e.g. the client disconnected)."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_delay)
+        self._timer = None
+        await self.flush()
@@ -1,6 +1,13 @@
 import os
+import hashlib
+import threading
+from collections import OrderedDict
 from google.cloud import texttospeech
 
+# In-memory audio cache budget, and optional directory for the on-disk tier
+TTS_CACHE_BYTES = int(os.environ.get("TTS_CACHE_BYTES", 32 * 1024 * 1024))
+TTS_CACHE_DIR = os.environ.get("TTS_CACHE_DIR")
+
 def initialize_tts_client():
     try:
         tts_client = texttospeech.TextToSpeechClient()
@@ -12,11 +19,133 @@ def initialize_tts_client():
         return None
 tts_client = initialize_tts_client()
 
+# Voice and encoding settings are fixed, so they're built once instead of per call
+VOICE = texttospeech.VoiceSelectionParams(
+    language_code="en-US",
+    name="en-US-Neural2-C",
+    ssml_gender=texttospeech.SsmlVoiceGender.FEMALE
+)
+
+AUDIO_CONFIG = texttospeech.AudioConfig(
+    audio_encoding=texttospeech.AudioEncoding.MP3,
+    effects_profile_id=["headphone-class-device"]
+)
+
+class TTSAudioCache:
+    """
+    Content-addressed cache of synthesized audio.
+    Keys are a hash of the text plus the voice and encoding settings, so
+    changing the voice never serves stale audio. A byte-budgeted LRU sits in
+    memory; an optional directory keeps audio across restarts and workers.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, disk_dir: str | None = None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def key(text: str, voice=VOICE, audio_config=AUDIO_CONFIG) -> str:
+        settings = "|".join([
+            voice.language_code, voice.name, str(int(voice.ssml_gender)),
+            str(int(audio_config.audio_encoding)), ",".join(audio_config.effects_profile_id),
+            str(audio_config.speaking_rate), str(audio_config.pitch),
+        ])
+        # Whitespace doesn't change the speech, so it doesn't change the key
+        normalized = " ".join(text.split())
+        return hashlib.sha256(f"{settings}\n{normalized}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            audio = self._entries.get(key)
+            if audio is not None:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return audio
+
+        audio = self._read_disk(key)
+        with self._lock:
+            if audio is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["disk_hits"] += 1
+        self._put_memory(key, audio)
+        return audio
+
+    def put(self, key: str, audio: bytes) -> None:
+        self._put_memory(key, audio)
+        self._write_disk(key, audio)
+
+    def stats(self) -> dict:
+        """Hit/miss counters and memory usage."""
+        with self._lock:
+            counters = dict(self._counters)
+            counters["entries"] = len(self._entries)
+            counters["bytes"] = self._bytes
+        lookups = counters["hits"] + counters["disk_hits"] + counters["misses"]
+        counters["max_bytes"] = self.max_bytes
+        counters["hit_ratio"] = (counters["hits"] + counters["disk_hits"]) / lookups if lookups else 0.0
+        return counters
+
+    def _put_memory(self, key: str, audio: bytes) -> None:
+        if len(audio) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = audio
+            self._bytes += len(audio)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self._counters["evictions"] += 1
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.mp3")
+
+    def _read_disk(self, key: str) -> bytes | None:
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            print(f"Warning: Could not read cached TTS audio: {e}")
+            return None
+
+    def _write_disk(self, key: str, audio: bytes) -> None:
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(audio)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Warning: Could not write cached TTS audio: {e}")
+
+tts_cache = TTSAudioCache(max_bytes=TTS_CACHE_BYTES, disk_dir=TTS_CACHE_DIR)
+
 def generate_tts_bytes(text_to_synthesize: str) -> bytes | None:
     """
     Generates audio (MP3) bytes from SIMPLE TEXT.
     This is called from main.py
+    Repeated text is served from tts_cache without calling the API.
     """
+    cache_key = tts_cache.key(text_to_synthesize)
+    cached_audio = tts_cache.get(cache_key)
+    if cached_audio is not None:
+        return cached_audio
+
     if not tts_client:
         print("TTS client is not initialized.")
         return None
@@ -24,24 +153,14 @@ def generate_tts_bytes(text_to_synthesize: str) -> bytes | None:
     try:
         synthesis_input = texttospeech.SynthesisInput(text=text_to_synthesize)
 
-        voice = texttospeech.VoiceSelectionParams(
-            language_code="en-US",
-            name="en-US-Neural2-C",  
-            ssml_gender=texttospeech.SsmlVoiceGender.FEMALE
-        )
-        
-        audio_config = texttospeech.AudioConfig(
-            audio_encoding=texttospeech.AudioEncoding.MP3,
-            effects_profile_id=["headphone-class-device"]
-        )
-
         print(f"Synthesizing speech for: '{text_to_synthesize[:30]}...'")
         response = tts_client.synthesize_speech(
-            input=synthesis_input, voice=voice, audio_config=audio_config
+            input=synthesis_input, voice=VOICE, audio_config=AUDIO_CONFIG
         )
         print(f'✅ Audio generated ({len(response.audio_content)} bytes)')
+        tts_cache.put(cache_key, response.audio_content)
         return response.audio_content
 
     except Exception as e:
         print(f"Error during TTS generation: {e}")
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,90 @@
+import asyncio
+import re
+from typing import Awaitable, Callable
+
+# End of a sentence: terminal punctuation, optional closing quotes/brackets, then whitespace
+_SENTENCE_END = re.compile(r'[.!?]+["\')\]]*\s+|\n+')
+
+
+class SentenceAudioStream:
+    """
+    Incremental TTS for a streamed reply.
+    Tokens are fed in as they arrive and cut at sentence boundaries. Each
+    sentence is synthesized as soon as it completes, at most
+    `max_concurrency` at a time, and the audio is handed to `send` strictly in sentence order, so the
+    first sentence can play while the rest of the reply is generated.
+    """
+
+    def __init__(
+        self,
+        synthesize: Callable[[str], Awaitable[bytes | None]],
+        send: Callable[[int, str, bytes | None], Awaitable[None]],
+        min_chars: int = 40,
+        max_concurrency: int = 2,
+    ):
+        # Sentences shorter than min_chars ("Okay.") are merged with the next one
+        self.synthesize = synthesize
+        self.send = send
+        self.min_chars = min_chars
+        self._buffer = ""
+        self._seq = 0
+        self._pending: asyncio.Queue = asyncio.Queue()
+        self._sender: asyncio.Task | None = None
+        # Bounds the TTS calls one reply has in flight, so a long reply can't use up the user's share
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+    def feed(self, token: str) -> None:
+        """Adds streamed text; schedules synthesis for every completed sentence."""
+        self._buffer += token
+        cut = 0
+        for match in _SENTENCE_END.finditer(self._buffer):
+            if match.end() - cut >= self.min_chars:
+                self._schedule(self._buffer[cut:match.end()])
+                cut = match.end()
+        self._buffer = self._buffer[cut:]
+
+    async def finish(self) -> int:
+        """Synthesizes the trailing text and waits until every chunk is sent. Returns the chunk count."""
+        self._schedule(self._buffer)
+        self._buffer = ""
+        if self._sender is None:
+            return 0
+        await self._pending.put(None)
+        await self._sender
+        return self._seq
+
+    def cancel(self) -> None:
+        """Abandons outstanding synthesis (e.g. the client disconnected)."""
+        if self._sender is not None:
+            self._sender.cancel()
+        while not self._pending.empty():
+            item = self._pending.get_nowait()
+            if item is not None:
+                item[2].cancel()
+
+    def _schedule(self, text: str) -> None:
+        text = text.strip()
+        if not text:
+            return
+        if self._sender is None:
+            self._sender = asyncio.create_task(self._send_in_order())
+        task = asyncio.create_task(self._synthesize(text))
+        self._pending.put_nowait((self._seq, text, task))
+        self._seq += 1
+
+    async def _synthesize(self, text: str) -> bytes | None:
+        async with self._slots:
+            return await self.synthesize(text)
+
+    async def _send_in_order(self) -> None:
+        while True:
+            item = await self._pending.get()
+            if item is None:
+                return
+            seq, text, task = item
+            try:
+                audio_bytes = await task
+            except Exception as e:
+                print(f"TTS failed for sentence {seq}: {e}")
+                audio_bytes = None
+            await self.send(seq, text, audio_bytes)
@@ -0,0 +1,65 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class UpstreamExecutor:
+    """
+    Bounded thread pool for one blocking cloud SDK (embedding, STT, TTS...).
+    Calls are exposed as awaitables so the event loop never blocks, and each
+    upstream gets its own pool so a slow one can't starve the others.
+    """
+
+    def __init__(self, name: str, max_workers: int = 4):
+        self.name = name
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"upstream-{name}")
+        self._lock = threading.Lock()
+        self._counters = {
+            "queued": 0, "running": 0, "completed": 0, "failed": 0,
+            "total_wait_ms": 0.0, "max_wait_ms": 0.0, "total_run_ms": 0.0,
+        }
+
+    async def run(self, fn, *args, **kwargs):
+        """Runs fn(*args, **kwargs) on this upstream's pool and awaits the result."""
+        submitted = time.perf_counter()
+        with self._lock:
+            self._counters["queued"] += 1
+
+        def call():
+            started = time.perf_counter()
+            wait_ms = (started - submitted) * 1000
+            with self._lock:
+                self._counters["queued"] -= 1
+                self._counters["running"] += 1
+                self._counters["total_wait_ms"] += wait_ms
+                self._counters["max_wait_ms"] = max(self._counters["max_wait_ms"], wait_ms)
+            failed = False
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                failed = True
+                raise
+            finally:
+                with self._lock:
+                    self._counters["running"] -= 1
+                    self._counters["completed"] += 1
+                    self._counters["failed"] += failed
+                    self._counters["total_run_ms"] += (time.perf_counter() - started) * 1000
+
+        return await asyncio.get_running_loop().run_in_executor(self._pool, call)
+
+    def stats(self) -> dict:
+        """Queue depth, in-flight calls and mean/max wait and run times."""
+        with self._lock:
+            counters = dict(self._counters)
+        completed = counters["completed"]
+        started = completed + counters["running"]
+        counters["max_workers"] = self.max_workers
+        counters["mean_wait_ms"] = counters.pop("total_wait_ms") / started if started else 0.0
+        counters["mean_run_ms"] = counters.pop("total_run_ms") / completed if completed else 0.0
+        return counters
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
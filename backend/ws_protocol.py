@@ -0,0 +1,54 @@
+import json
+import struct
+import uuid
+
+# WebSocket audio framing.
+# Clients that connect with ?audio=binary get audio as binary frames:
+#
+#   | type (uint8) | seq (uint32, big-endian) | length (uint32, big-endian) | payload |
+#
+# Text frames still carry JSON for tokens and control messages. Clients
+# that don't opt in keep receiving base64 audio inside JSON.
+FRAME_HEADER = struct.Struct("!BII")
+
+FRAME_TYPES = {
+    "AUDIO": 1,         # Whole reply, one clip
+    "AUDIO_CHUNK": 2,   # One sentence of a streamed reply
+}
+
+AUDIO_MODES = ("json", "binary")
+
+
+def pack_frame(message_type: str, seq: int, payload: bytes) -> bytes:
+    """Prefixes payload with the binary frame header."""
+    return FRAME_HEADER.pack(FRAME_TYPES[message_type], seq, len(payload)) + payload
+
+
+def unpack_frame(frame: bytes) -> tuple[str, int, bytes]:
+    """Splits a binary frame into (message type, seq, payload)."""
+    if len(frame) < FRAME_HEADER.size:
+        raise ValueError("Frame is shorter than its header")
+    type_id, seq, length = FRAME_HEADER.unpack_from(frame)
+    payload = frame[FRAME_HEADER.size:]
+    if len(payload) != length:
+        raise ValueError(f"Frame length mismatch: header says {length}, got {len(payload)}")
+    names = {value: name for name, value in FRAME_TYPES.items()}
+    if type_id not in names:
+        raise ValueError(f"Unknown frame type {type_id}")
+    return names[type_id], seq, payload
+
+
+# HTTP replies with binary audio (/v1/transcribe?audio=binary) are
+# multipart/mixed: a JSON part with the message, then an audio/mpeg part.
+# Keeping the text in the body avoids header size limits on long replies.
+def pack_multipart(message: dict, audio: bytes) -> tuple[bytes, str]:
+    """Returns (body, media type) of a multipart/mixed reply."""
+    boundary = uuid.uuid4().hex
+    body = b"".join([
+        f"--{boundary}\r\nContent-Type: application/json\r\n\r\n".encode(),
+        json.dumps(message).encode(),
+        f"\r\n--{boundary}\r\nContent-Type: audio/mpeg\r\nContent-Length: {len(audio)}\r\n\r\n".encode(),
+        audio,
+        f"\r\n--{boundary}--\r\n".encode(),
+    ])
+    return body, f"multipart/mixed; boundary={boundary}"
@@ -10,6 +10,47 @@ let isConnected = false;
 // We get the chat update function from the Zustand store
 const { setChat } = useJournalStore.getState();
 
+// Sentence audio chunks are played back-to-back, in sequence order
+const audioQueue: string[] = [];
+let isPlayingAudio = false;
+
+const playNextAudioChunk = () => {
+  const src = audioQueue.shift();
+  if (!src) {
+    isPlayingAudio = false;
+    return;
+  }
+  isPlayingAudio = true;
+  const audio = new Audio(src);
+  const next = () => {
+    if (src.startsWith('blob:')) {
+      URL.revokeObjectURL(src);
+    }
+    playNextAudioChunk();
+  };
+  audio.onended = next;
+  audio.onerror = next;
+  audio.play().catch(next);
+};
+
+const enqueueAudio = (src: string) => {
+  audioQueue.push(src);
+  if (!isPlayingAudio) {
+    playNextAudioChunk();
+  }
+};
+
+// Binary audio frames (we connect with ?audio=binary):
+// | type (uint8) | seq (uint32 BE) | length (uint32 BE) | mp3 bytes |
+const FRAME_HEADER_SIZE = 9;
+
+const handleAudioFrame = (frame: ArrayBuffer) => {
+  const view = new DataView(frame);
+  const length = view.getUint32(5);
+  const mp3 = frame.slice(FRAME_HEADER_SIZE, FRAME_HEADER_SIZE + length);
+  enqueueAudio(URL.createObjectURL(new Blob([mp3], { type: 'audio/mpeg' })));
+};
+
 const connectSocket = (userId: string) => {
   if (socket && isConnected) {
     console.log('WebSocket already connected.');
@@ -21,8 +62,10 @@ const connectSocket = (userId: string) => {
     return;
   }
 
-  const url = `${GCP_AGENT_WS_URL}/ws/${userId}`;
+  // Ask for binary audio frames; servers without support keep sending base64 JSON
+  const url = `${GCP_AGENT_WS_URL}/ws/${userId}?audio=binary`;
   socket = new WebSocket(url);
+  socket.binaryType = 'arraybuffer';
 
   socket.onopen = () => {
     console.log('WebSocket connected to Agent Service.');
@@ -30,9 +73,13 @@ const connectSocket = (userId: string) => {
   };
 
   socket.onmessage = (event) => {
+    if (event.data instanceof ArrayBuffer) {
+      handleAudioFrame(event.data);
+      return;
+    }
     const message = JSON.parse(event.data);
     
-    // This is where we handle the 3 message types from our server
+    // This is where we handle the message types from our server
     switch (message.type) {
       case 'ACK':
         // Confirmation that a "NONE" route was processed
@@ -59,6 +106,28 @@ const connectSocket = (userId: string) => {
         const audio = new Audio('data:audio/mp3;base64,' + message.payload);
         audio.play();
         break;
+
+      case 'AUDIO_CHUNK':
+        // One spoken sentence, sent while the reply is still streaming.
+        // The server sends chunks in order (message.seq); queue and play them.
+        enqueueAudio('data:audio/mp3;base64,' + message.payload);
+        break;
+
+      case 'PROTOCOL':
+        console.log('Audio frames mode:', message.audio);
+        break;
+
+      case 'AUDIO_END':
+        console.log(`Received ${message.chunks} audio chunks.`);
+        break;
+
+      case 'ERROR':
+        // No code: the agent call failed or timed out; the entry itself was saved.
+        // code 'OVERLOADED': the server shed the request (message.saved tells
+        // whether the entry was stored); retry after message.retry_after seconds.
+        // code 'ENTRY_FAILED': saving or routing failed; resend if !message.saved.
+        console.error('Server error:', message.detail);
+        break;
     }
   };
 
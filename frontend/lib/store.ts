@@ -88,27 +88,48 @@ type JournalState = {
   journal: JournalEntry[];
   moods: MoodEntry[];
   chat: ChatMessage[];
+  journalCursor: string | null; // next_cursor of the oldest loaded page; null once everything is loaded
   fetchJournal: (userId: string) => Promise<void>;
+  fetchOlderJournal: (userId: string) => Promise<void>;
   fetchMoods: (userId: string, journalId: number) => Promise<void>;
   addMood: (journalId: number, mood: number, note?: string) => Promise<void>;
   setChat: (msgs: ChatMessage[]) => void;
   clearChat: () => void;
 };
 
-export const useJournalStore = create<JournalState>((set) => ({
+const JOURNAL_PAGE_SIZE = 50;
+
+export const useJournalStore = create<JournalState>((set, get) => ({
   journal: [],
   moods: [],
   chat: [],
+  journalCursor: null,
 
   fetchJournal: async (userId: string) => {
     try {
-      const response = await gcpApi.get(`/v1/journal/${userId}`);
-      set({ journal: response.entries });
+      // Newest entries only; the archive view calls fetchOlderJournal as the user scrolls back
+      const response = await gcpApi.get(`/v1/journal/${userId}?limit=${JOURNAL_PAGE_SIZE}`);
+      set({ journal: response.entries, journalCursor: response.next_cursor ?? null });
     } catch (e) {
       console.error("Failed to fetch journal:", e);
     }
   },
 
+  fetchOlderJournal: async (userId: string) => {
+    const cursor = get().journalCursor;
+    if (!cursor) return;
+    try {
+      const response = await gcpApi.get(
+        `/v1/journal/${userId}?limit=${JOURNAL_PAGE_SIZE}&cursor=${encodeURIComponent(cursor)}`
+      );
+      // Ignore the reply if the journal was reloaded meanwhile
+      if (get().journalCursor !== cursor) return;
+      set((s) => ({ journal: [...s.journal, ...response.entries], journalCursor: response.next_cursor ?? null }));
+    } catch (e) {
+      console.error("Failed to fetch older journal entries:", e);
+    }
+  },
+
   fetchMoods: async (userId: string, journalId: number) => {
     try {
       // Using the /insights endpoint as a proxy for moods